@@ -29,6 +29,11 @@ SECRET_KEY = 'django-insecure-&9n5__z==iwib%w*lrn#p_-u(&c9^wq%#jpt^&8^c^d0fuz2^t
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# Outbound Stripe API calls (see apis.payments). STRIPE_API_BASE points the
+# client at a local stand-in, e.g. for `manage.py bench_checkout_session`.
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+STRIPE_TIMEOUT = (5, 20)  # connect, read (seconds)
+STRIPE_MAX_NETWORK_RETRIES = 2
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -46,6 +51,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'apis',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -76,6 +82,7 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'apis.middleware.PerfMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -128,6 +135,52 @@ DATABASES = {
 AUTH_USER_MODEL = 'accounts.User'
 
 
+# Cache
+# Local memory by default; point this at a shared backend (Redis, file) when
+# running several workers so catalog invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': '4eyes-cache',
+    }
+}
+
+# Public catalog payloads (hero slides, featured products, categories):
+# seconds kept server-side, and max-age sent to browsers/CDNs.
+CATALOG_CACHE_TIMEOUT = 5 * 60
+CATALOG_CACHE_MAX_AGE = 60
+
+# Seconds a card checkout holds its stock before the sweeper
+# (manage.py release_expired_reservations) gives it back.
+STOCK_RESERVATION_TTL = 30 * 60
+
+# Seconds the active coupon list is cached; saving a coupon clears it.
+COUPON_CACHE_TIMEOUT = 10 * 60
+
+# The analytics dashboard is served from cache for ANALYTICS_CACHE_TTL
+# seconds, then served stale for up to ANALYTICS_CACHE_STALE_TTL more while
+# it is rebuilt in the background.
+ANALYTICS_CACHE_TTL = 60
+ANALYTICS_CACHE_STALE_TTL = 15 * 60
+
+# Threads (each with its own DB connection) running the analytics API's
+# aggregates side by side.
+ANALYTICS_WORKERS = 6
+
+# Request performance tracking (apis.middleware.PerfMiddleware). Requests
+# slower than PERF_SLOW_REQUEST_MS are logged to 'apis.perf' with their
+# PERF_TOP_SQL slowest statements, whose SQL is kept for a
+# PERF_SQL_SAMPLE_RATE fraction of requests (timing and counts are always on).
+# Keeping the SQL costs a heap push per statement, so raise the rate only
+# while chasing a slow endpoint.
+PERF_SLOW_REQUEST_MS = 500
+PERF_TOP_SQL = 5
+PERF_SQL_SAMPLE_RATE = float(os.getenv("PERF_SQL_SAMPLE_RATE", "0.01"))
+PERF_SERVER_TIMING = True
+# Bearer token Prometheus scrapes /metrics with; staff can always view it.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -25,6 +25,9 @@ urlpatterns = [
     path('apis/', include('apis.urls')),
     path('apis/auth/', include('accounts.urls')),
     path('admin-analytics/', admin_views.analytics_dashboard, name='analytics-dashboard'),
+    path('admin-analytics/api/', admin_views.analytics_api, name='analytics-api'),
+    path('admin-export/orders/', admin_views.export_orders, name='export-orders'),
+    path('metrics', admin_views.metrics, name='metrics'),
 
 ]
 
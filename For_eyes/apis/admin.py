@@ -5,12 +5,71 @@ from django.contrib import admin
 
 # apis/admin.py
 from django.contrib import admin
-from .models import Category, Product, HeroSlide, Order, OrderItem, Coupon, Favourite, Address
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from .inventory import with_available_stock
+from .models import Category, Product, HeroSlide, Order, OrderItem, Coupon, Favourite, Address, StockReservation, WebhookEvent
 
 admin.site.register(Category)
-admin.site.register(Product)
 admin.site.register(HeroSlide)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 
 
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ['name', 'sku', 'category', 'price', 'total_stock', 'available', 'stock_stripes']
+    list_select_related = ['category']
+    search_fields = ['name', 'sku']
+
+    def get_queryset(self, request):
+        return with_available_stock(super().get_queryset(request)).annotate(
+            total_stock=F('stock') + Coalesce(Sum('stripes__stock'), 0)
+        )
+
+    def get_readonly_fields(self, request, obj=None):
+        # A striped product's stock lives in its stripes; use set_stock_stripes.
+        if obj is not None and obj.stock_stripes:
+            return ['stock', 'total_stock', 'available']
+        return []
+
+    @admin.display(description='Stock', ordering='total_stock')
+    def total_stock(self, obj):
+        return obj.total_stock
+
+    @admin.display(ordering='available')
+    def available(self, obj):
+        return obj.available
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """
+    Read-only: deleting a hold here would drop it without giving its units
+    back. Holds are released by the sweeper, the webhook or deleting the order.
+    """
+    list_display = ['order', 'product', 'stripe', 'quantity', 'expires_at']
+    list_select_related = ['order', 'product']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'status', 'attempts', 'next_attempt_at', 'received_at']
+    list_filter = ['status', 'type']
+
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ['code', 'discount', 'is_active', 'expires_at', 'used_count', 'max_uses']
+    readonly_fields = ['used_count']
@@ -1,151 +1,86 @@
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.db.models import Sum, Count, Avg, F, Q
-from django.db.models.functions import TruncDate, TruncMonth
 from django.utils import timezone
-from datetime import timedelta
-from .models import Order, Product, OrderItem, Favourite
+from datetime import date, timedelta
+from . import analytics, exports
+from .metrics import registry
+from .cache import cached_with_refresh
+from .rollups import fold_rollups
+import hmac
 import json
 
+DASHBOARD_CACHE_KEY = 'analytics:dashboard'
+GRANULARITIES = ('day', 'week', 'month')
+
+
 @staff_member_required
 def analytics_dashboard(request):
-    # Date ranges
-    today = timezone.now()
-    last_30_days = today - timedelta(days=30)
-    last_60_days = today - timedelta(days=60)
-    last_7_days = today - timedelta(days=7)
-    
-    # Order Analytics
-    all_orders = Order.objects.all()
-    recent_orders = all_orders.filter(created_at__gte=last_30_days)
-    previous_period_orders = all_orders.filter(created_at__gte=last_60_days, created_at__lt=last_30_days)
-    
-    # Calculate percentage changes
-    current_revenue = recent_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    previous_revenue = previous_period_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-    revenue_change = ((current_revenue - previous_revenue) / previous_revenue * 100) if previous_revenue > 0 else 0
-    
-    current_order_count = recent_orders.count()
-    previous_order_count = previous_period_orders.count()
-    order_change = ((current_order_count - previous_order_count) / previous_order_count * 100) if previous_order_count > 0 else 0
-    
-    order_stats = {
-        'total_orders': all_orders.count(),
-        'total_revenue': all_orders.aggregate(total=Sum('total_amount'))['total'] or 0,
-        'average_order_value': all_orders.aggregate(avg=Avg('total_amount'))['avg'] or 0,
-        'orders_last_30_days': current_order_count,
-        'revenue_last_30_days': current_revenue,
-        'pending_orders': all_orders.filter(status='Pending').count(),
-        'confirmed_orders': all_orders.filter(status='Confirmed').count(),
-        'revenue_change': round(revenue_change, 1),
-        'order_change': round(order_change, 1),
-    }
-    
-    # Product Analytics
-    products = Product.objects.all()
-    product_stats = {
-        'total_products': products.count(),
-        'low_stock': products.filter(stock__lte=5, stock__gt=0).count(),
-        'out_of_stock': products.filter(stock=0).count(),
-        'featured_products': products.filter(is_featured=True).count(),
-        'total_inventory_value': products.aggregate(
-            total=Sum(F('price') * F('stock'))
-        )['total'] or 0,
-    }
-    
-    # Best Selling Products
-    best_sellers = OrderItem.objects.values(
-        'product__name', 'product__id'
-    ).annotate(
-        total_sold=Sum('quantity'),
-        revenue=Sum(F('quantity') * F('price'))
-    ).order_by('-total_sold')[:10]
-    
+    context = cached_with_refresh(
+        DASHBOARD_CACHE_KEY, dashboard_context,
+        settings.ANALYTICS_CACHE_TTL, settings.ANALYTICS_CACHE_STALE_TTL,
+    )
+    return render(request, 'admin/analytics_dashboard.html', context)
+
+
+def dashboard_context():
+    # Order history comes from the daily rollups only (see apis.rollups)
+    fold_rollups()
+    today = timezone.localdate()
+
+    order_stats = analytics.order_stats(today)
+    product_stats = analytics.product_stats()
+    best_sellers = analytics.best_sellers(10)
+
     # Daily Sales (Last 30 days) for Chart
-    daily_sales = Order.objects.filter(
-        created_at__gte=last_30_days
-    ).annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        orders=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('date')
-    
-    # Prepare data for revenue chart
+    daily_sales = analytics.daily_sales(today - timedelta(days=29), today)
     revenue_chart_data = {
         'labels': [sale['date'].strftime('%b %d') for sale in daily_sales],
         'data': [float(sale['revenue']) for sale in daily_sales]
     }
-    
+
     # Order Status Distribution for Pie Chart
-    status_distribution = all_orders.values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
+    status_distribution = analytics.status_distribution()
     status_chart_data = {
         'labels': [item['status'] for item in status_distribution],
         'data': [item['count'] for item in status_distribution]
     }
-    
+
     # Payment Method Distribution
-    payment_distribution = all_orders.values('payment_method').annotate(
-        count=Count('id')
-    )
-    
+    payment_distribution = analytics.payment_distribution()
     payment_chart_data = {
-        'labels': [dict(Order.PAYMENT_METHODS).get(item['payment_method'], item['payment_method']) for item in payment_distribution],
+        'labels': [item['label'] for item in payment_distribution],
         'data': [item['count'] for item in payment_distribution]
     }
-    
+
     # Category Performance
-    category_performance = OrderItem.objects.values(
-        'product__category__name'
-    ).annotate(
-        revenue=Sum(F('quantity') * F('price')),
-        units_sold=Sum('quantity')
-    ).order_by('-revenue')[:8]
-    
+    category_performance = analytics.category_performance(8)
     category_chart_data = {
-        'labels': [item['product__category__name'] for item in category_performance],
+        'labels': [item['category__name'] for item in category_performance],
         'data': [float(item['revenue']) for item in category_performance]
     }
-    
+
     # Gender Preference
-    gender_preference = OrderItem.objects.values(
-        'product__gender'
-    ).annotate(
-        count=Sum('quantity')
-    )
-    
-    gender_labels = {'M': 'Men', 'F': 'Women', 'U': 'Unisex'}
+    gender_preference = analytics.gender_preference()
     gender_chart_data = {
-        'labels': [gender_labels.get(item['product__gender'], 'Unknown') for item in gender_preference],
+        'labels': [item['label'] for item in gender_preference],
         'data': [item['count'] for item in gender_preference]
     }
-    
+
     # Top Products for Bar Chart
     top_products_chart = {
         'labels': [item['product__name'][:20] for item in best_sellers[:8]],
         'data': [float(item['revenue']) for item in best_sellers[:8]]
     }
-    
-    # Most Favorited Products
-    most_favorited = Favourite.objects.values(
-        'product__name'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    # Low Stock Alerts
-    low_stock_products = products.filter(stock__lte=5).order_by('stock')[:10]
-    
+
     context = {
         'order_stats': order_stats,
         'product_stats': product_stats,
         'best_sellers': best_sellers,
-        'daily_sales': list(daily_sales),
-        'most_favorited': most_favorited,
-        'low_stock_products': low_stock_products,
+        'daily_sales': daily_sales,
+        'most_favorited': analytics.most_favorited(10),
+        'low_stock_products': analytics.low_stock_products(10),
         
         # Chart data as JSON
         'revenue_chart_data': json.dumps(revenue_chart_data),
@@ -155,5 +90,106 @@ def analytics_dashboard(request):
         'gender_chart_data': json.dumps(gender_chart_data),
         'top_products_chart': json.dumps(top_products_chart),
     }
-    
-    return render(request, 'admin/analytics_dashboard.html', context)
\ No newline at end of file
+    return context
+
+
+def _date_range(request):
+    """The ?from= and ?to= dates, each None when absent; ValueError if malformed."""
+    try:
+        return tuple(
+            date.fromisoformat(request.GET[name]) if request.GET.get(name) else None
+            for name in ('from', 'to')
+        )
+    except ValueError:
+        raise ValueError('from and to must be dates as YYYY-MM-DD')
+
+
+@staff_member_required
+def analytics_api(request):
+    """
+    The dashboard's chart series as JSON for ?from=&to= (ISO dates,
+    inclusive, default the last 30 days) and ?granularity=day|week|month.
+    """
+    try:
+        start, end = _date_range(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        return JsonResponse({'error': 'from must not be after to'}, status=400)
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return JsonResponse({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}, status=400)
+
+    fold_rollups()
+    # Independent aggregates, so total latency is about that of the slowest one
+    results = analytics.gather({
+        'sales': lambda: analytics.sales_series(start, end, granularity),
+        'status': lambda: analytics.status_distribution(start, end),
+        'payment': lambda: analytics.payment_distribution(start, end),
+        'category': lambda: analytics.category_performance(8, start, end),
+        'gender': lambda: analytics.gender_preference(start, end),
+        'top_products': lambda: analytics.best_sellers(8, start, end),
+    })
+
+    return JsonResponse({
+        'from': start,
+        'to': end,
+        'granularity': granularity,
+        'revenue': {
+            'labels': [row['date'].isoformat() for row in results['sales']],
+            'data': [float(row['revenue']) for row in results['sales']],
+            'orders': [row['orders'] for row in results['sales']],
+        },
+        'status': {
+            'labels': [item['status'] for item in results['status']],
+            'data': [item['count'] for item in results['status']],
+        },
+        'payment': {
+            'labels': [item['label'] for item in results['payment']],
+            'data': [item['count'] for item in results['payment']],
+        },
+        'category': {
+            'labels': [item['category__name'] for item in results['category']],
+            'data': [float(item['revenue']) for item in results['category']],
+        },
+        'gender': {
+            'labels': [item['label'] for item in results['gender']],
+            'data': [item['count'] for item in results['gender']],
+        },
+        'top_products': {
+            'labels': [item['product__name'][:20] for item in results['top_products']],
+            'data': [float(item['revenue']) for item in results['top_products']],
+        },
+    })
+
+
+@staff_member_required
+def export_orders(request):
+    """
+    Streams orders with their items as ?format=csv (one row per item) or
+    ndjson (one order per line), optionally only those placed ?from= ?to=.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(exports.FORMATS)}"}, status=400)
+    try:
+        start, end = _date_range(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        exports.export_orders(fmt, start, end), content_type=exports.CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+    return response
+
+
+def metrics(request):
+    """Prometheus scrape target: staff, or `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and hmac.compare_digest(supplied.encode(), token.encode()))):
+        return JsonResponse({'error': 'Not authorized'}, status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
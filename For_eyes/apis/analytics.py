@@ -0,0 +1,166 @@
+"""
+Figures for the admin analytics dashboard. Order history is read only
+from the daily rollups (see apis.rollups), so the cost depends on the
+number of days, products and categories, not on the number of orders.
+"""
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .inventory import with_available_stock
+from .models import DailyCategoryRollup, DailyOrderRollup, DailyProductRollup, Favourite, Order, Product
+
+GENDER_LABELS = {'M': 'Men', 'F': 'Women', 'U': 'Unisex'}
+
+
+def percent_change(current, previous):
+    return round((current - previous) / previous * 100, 1) if previous > 0 else 0
+
+
+def order_stats(today=None):
+    """The headline order figures, in one conditional-aggregation query."""
+    today = today or timezone.localdate()
+    last_30_days = Q(day__gt=today - timedelta(days=30))
+    previous_30_days = Q(day__gt=today - timedelta(days=60), day__lte=today - timedelta(days=30))
+
+    totals = DailyOrderRollup.objects.aggregate(
+        total_orders=Sum('orders'),
+        total_revenue=Sum('revenue'),
+        orders_last_30_days=Sum('orders', filter=last_30_days),
+        revenue_last_30_days=Sum('revenue', filter=last_30_days),
+        previous_orders=Sum('orders', filter=previous_30_days),
+        previous_revenue=Sum('revenue', filter=previous_30_days),
+        pending_orders=Sum('orders', filter=Q(status='Pending')),
+        confirmed_orders=Sum('orders', filter=Q(status='Confirmed')),
+    )
+    totals = {name: value or 0 for name, value in totals.items()}
+    previous_orders, previous_revenue = totals.pop('previous_orders'), totals.pop('previous_revenue')
+
+    return {
+        **totals,
+        'average_order_value': totals['total_revenue'] / totals['total_orders'] if totals['total_orders'] else 0,
+        'revenue_change': percent_change(totals['revenue_last_30_days'], previous_revenue),
+        'order_change': percent_change(totals['orders_last_30_days'], previous_orders),
+    }
+
+
+def product_stats():
+    """Catalog counts and stock buckets, in one query."""
+    stats = with_available_stock(Product.objects.all()).aggregate(
+        total_products=Count('id'),
+        low_stock=Count('id', filter=Q(available__lte=5, available__gt=0)),
+        out_of_stock=Count('id', filter=Q(available=0)),
+        featured_products=Count('id', filter=Q(is_featured=True)),
+        total_inventory_value=Sum(F('price') * F('available')),
+    )
+    stats['total_inventory_value'] = stats['total_inventory_value'] or 0
+    return stats
+
+
+def _in_range(queryset, start=None, end=None):
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lte=end)
+    return queryset
+
+
+def daily_sales(start, end):
+    """[{'date', 'orders', 'revenue'}] for each day in [start, end] that had orders."""
+    return sales_series(start, end, 'day')
+
+
+def sales_series(start, end, granularity='day'):
+    """
+    [{'date', 'orders', 'revenue'}] per day, week or month in [start, end]
+    that had orders; weeks start on Monday and are labelled by that day.
+    """
+    return list(
+        _in_range(DailyOrderRollup.objects.all(), start, end)
+        .values(date=Trunc('day', granularity, output_field=DateField()))
+        .annotate(orders=Sum('orders'), revenue=Sum('revenue')).order_by('date')
+    )
+
+
+def status_distribution(start=None, end=None):
+    return list(
+        _in_range(DailyOrderRollup.objects.all(), start, end).values('status').annotate(count=Sum('orders'))
+        .filter(count__gt=0).order_by('-count')
+    )
+
+
+def payment_distribution(start=None, end=None):
+    labels = dict(Order.PAYMENT_METHODS)
+    return [
+        {'label': labels.get(row['payment_method'], row['payment_method']), 'count': row['count']}
+        for row in _in_range(DailyOrderRollup.objects.all(), start, end)
+        .values('payment_method').annotate(count=Sum('orders'))
+        .filter(count__gt=0).order_by('payment_method')
+    ]
+
+
+def best_sellers(limit=10, start=None, end=None):
+    return list(
+        _in_range(DailyProductRollup.objects.all(), start, end).values('product__name', 'product__id')
+        .annotate(total_sold=Sum('units'), revenue=Sum('revenue'))
+        .filter(total_sold__gt=0).order_by('-total_sold')[:limit]
+    )
+
+
+def category_performance(limit=8, start=None, end=None):
+    return list(
+        _in_range(DailyCategoryRollup.objects.all(), start, end).values('category__name')
+        .annotate(revenue=Sum('revenue'), units_sold=Sum('units'))
+        .filter(units_sold__gt=0).order_by('-revenue')[:limit]
+    )
+
+
+def gender_preference(start=None, end=None):
+    return [
+        {'label': GENDER_LABELS.get(row['product__gender'], 'Unknown'), 'count': row['count']}
+        for row in _in_range(DailyProductRollup.objects.all(), start, end)
+        .values('product__gender').annotate(count=Sum('units'))
+        .filter(count__gt=0).order_by('product__gender')
+    ]
+
+
+def most_favorited(limit=10):
+    return list(
+        Favourite.objects.values('product__name').annotate(count=Count('id')).order_by('-count')[:limit]
+    )
+
+
+def low_stock_products(limit=10):
+    rows = (
+        with_available_stock(Product.objects.all()).filter(available__lte=5)
+        .order_by('available').values_list('name', 'available')[:limit]
+    )
+    return [{'name': name, 'stock': available} for name, available in rows]
+
+
+@functools.cache
+def _executor():
+    return ThreadPoolExecutor(settings.ANALYTICS_WORKERS, thread_name_prefix='analytics')
+
+
+def _run(job):
+    try:
+        return job()
+    finally:
+        connections.close_all()
+
+
+def gather(jobs):
+    """
+    Runs the callables in `jobs` ({name: callable}) concurrently, each on a
+    pool thread with its own database connection, closed when the job ends.
+    Returns {name: result}; the first exception raised is re-raised.
+    """
+    futures = {name: _executor().submit(_run, job) for name, job in jobs.items()}
+    return {name: future.result() for name, future in futures.items()}
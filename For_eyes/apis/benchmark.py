@@ -0,0 +1,271 @@
+"""
+Endpoint benchmarks for `manage.py bench_endpoints`. Every route in
+apis/urls.py and accounts/urls.py has at least one Scenario, which builds
+one request at a time (doing any setup it needs, untimed); run_scenarios
+sends them through the Django test client and records latency, status
+codes and SQL query counts per scenario.
+"""
+import contextlib
+import hashlib
+import hmac
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+import accounts.urls
+
+from . import urls as apis_urls
+from .datagen import BENCH_PASSWORD
+from .models import Address, Category, Favourite, Order, Product
+from .payments import get_stripe_client
+from .stripe_standin import StripeStandIn
+
+WEBHOOK_SECRET = 'whsec_bench'
+URL_PREFIXES = [('apis/', apis_urls), ('apis/auth/', accounts.urls)]
+
+
+@dataclass
+class Scenario:
+    route: str  # the URL pattern, e.g. 'apis/products/<int:pk>/'
+    method: str
+    # (context, i) -> (path, data, extra client kwargs) for the i-th request
+    build: Callable
+    auth: bool = False
+    label: str = ''
+
+    @property
+    def name(self):
+        return f"{self.method} /{self.route}" + (f" [{self.label}]" if self.label else '')
+
+
+@dataclass
+class BenchContext:
+    user: object
+    token: str
+    product_ids: list
+    product: object  # plenty of stock, for place-order
+    category: str
+    card_order_id: int
+    address_id: int
+
+
+def routes():
+    """Every URL pattern of the benchmarked URLconfs, e.g. 'apis/my-orders/'."""
+    return list(dict.fromkeys(
+        prefix + str(pattern.pattern) for prefix, module in URL_PREFIXES for pattern in module.urlpatterns
+    ))
+
+
+def make_context():
+    """Picks the customer, products and orders the scenarios use from the generated data."""
+    user = get_user_model().objects.filter(email='user0@example.com').first()
+    product = Product.objects.order_by('id').first()
+    Product.objects.filter(id=product.id).update(stock=10 ** 9)
+    address = Address.objects.filter(user=user).first() or Address.objects.create(
+        user=user, street='1 Bench Street', city='Lahore', zip_code='54000'
+    )
+    card_order = Order.objects.filter(payment_method='card', is_paid=False).order_by('id').first()
+    # Its checkout session holds the items' stock (see hold_for_checkout)
+    Product.objects.filter(id__in=card_order.items.values('product_id')).update(stock=10 ** 9)
+    return BenchContext(
+        user=user,
+        token=str(RefreshToken.for_user(user).access_token),
+        product_ids=list(Product.objects.order_by('id').values_list('id', flat=True)[:200]),
+        product=product,
+        category=Category.objects.order_by('id').values_list('name', flat=True).first(),
+        card_order_id=card_order.id,
+        address_id=address.id,
+    )
+
+
+def _get(path, **params):
+    return lambda ctx, i: (path, params, {})
+
+
+def _product_id(ctx, i):
+    return ctx.product_ids[i % len(ctx.product_ids)]
+
+
+def _order(ctx, i):
+    return '/apis/place-order/', {
+        'name': 'Bench Customer',
+        'email': 'bench@example.com',
+        'phone': '0300',
+        'address': '1 Bench Street',
+        'payment_method': 'cod',
+        'items': [{'product': ctx.product.id, 'quantity': 1, 'price': str(ctx.product.price)}],
+    }, {}
+
+
+def _webhook(ctx, i):
+    payload = json.dumps({
+        'id': f'evt_bench_{time.time_ns()}',
+        'object': 'event',
+        'type': 'checkout.session.completed',
+        'data': {'object': {'object': 'checkout.session', 'metadata': {'order_id': str(ctx.card_order_id)}}},
+    })
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return '/apis/stripe-webhook/', payload, {'HTTP_STRIPE_SIGNATURE': f't={timestamp},v1={signature}'}
+
+
+def _new_address(ctx, i):
+    address = Address.objects.create(user=ctx.user, street=f'{i} Bench Street', city='Lahore', zip_code='54000')
+    return f'/apis/addresses/{address.id}/', None, {}
+
+
+def _add_favourite(ctx, i):
+    product_id = _product_id(ctx, i)
+    Favourite.objects.filter(user=ctx.user, product_id=product_id).delete()
+    return '/apis/add-to-favourites/', {'product_id': product_id}, {}
+
+
+def _remove_favourite(ctx, i):
+    product_id = _product_id(ctx, i)
+    Favourite.objects.get_or_create(user=ctx.user, product_id=product_id)
+    return f'/apis/remove-from-favourites/{product_id}/', None, {}
+
+
+def scenarios():
+    return [
+        Scenario('apis/home/', 'GET', _get('/apis/home/')),
+        Scenario('apis/hero-slides/', 'GET', _get('/apis/hero-slides/')),
+        Scenario('apis/featured-products/', 'GET', _get('/apis/featured-products/')),
+        Scenario('apis/categories/', 'GET', _get('/apis/categories/')),
+        Scenario('apis/products/<int:pk>/', 'GET', lambda ctx, i: (f'/apis/products/{_product_id(ctx, i)}/', None, {})),
+        Scenario('apis/products/changes/', 'GET', _get('/apis/products/changes/', since='2000-01-01T00:00:00Z')),
+        Scenario('apis/products/batch/', 'GET', lambda ctx, i: (
+            '/apis/products/batch/', {'ids': ','.join(map(str, ctx.product_ids[:20]))}, {}
+        )),
+        Scenario('apis/products/batch/', 'POST', lambda ctx, i: (
+            '/apis/products/batch/', {'ids': ctx.product_ids[:20], 'view': 'detail'}, {}
+        )),
+        Scenario('apis/products/', 'GET', _get('/apis/products/')),
+        Scenario('apis/products/', 'GET', lambda ctx, i: (
+            '/apis/products/', {'category': ctx.category, 'gender': 'M', 'color': 'Black'}, {}
+        ), label='filtered'),
+        Scenario('apis/place-order/', 'POST', _order),
+        Scenario('apis/create-checkout-session/', 'POST', lambda ctx, i: (
+            '/apis/create-checkout-session/', {'order_id': ctx.card_order_id}, {}
+        )),
+        Scenario('apis/stripe-webhook/', 'POST', _webhook),
+        Scenario('apis/search/', 'GET', _get('/apis/search/', q='black aviator')),
+        Scenario('apis/search/suggest/', 'GET', _get('/apis/search/suggest/', q='avi')),
+        Scenario('apis/my-orders/', 'GET', _get('/apis/my-orders/'), auth=True),
+        Scenario('apis/my-orders/', 'GET', _get('/apis/my-orders/', view='summary'), auth=True, label='summary'),
+        Scenario('apis/my-addresses/', 'GET', _get('/apis/my-addresses/'), auth=True),
+        Scenario('apis/my-addresses/', 'POST', lambda ctx, i: ('/apis/my-addresses/', {
+            'type': 'Work', 'street': f'{i} Bench Street', 'city': 'Karachi', 'zip_code': '74000',
+        }, {}), auth=True),
+        Scenario('apis/addresses/<int:pk>/', 'PUT', lambda ctx, i: (
+            f'/apis/addresses/{ctx.address_id}/', {'city': 'Lahore' if i % 2 else 'Multan'}, {}
+        ), auth=True),
+        Scenario('apis/addresses/<int:pk>/', 'DELETE', _new_address, auth=True),
+        Scenario('apis/my-favourites/', 'GET', _get('/apis/my-favourites/'), auth=True),
+        Scenario('apis/favourite-ids/', 'GET', _get('/apis/favourite-ids/'), auth=True),
+        Scenario('apis/add-to-favourites/', 'POST', _add_favourite, auth=True),
+        Scenario('apis/remove-from-favourites/<int:product_id>/', 'DELETE', _remove_favourite, auth=True),
+        Scenario('apis/my-coupons/', 'GET', _get('/apis/my-coupons/'), auth=True),
+        Scenario('apis/profile/', 'GET', _get('/apis/profile/'), auth=True),
+        Scenario('apis/profile/', 'PUT', lambda ctx, i: ('/apis/profile/', {'name': f'Bench {i}'}, {}), auth=True),
+        Scenario('apis/change-password/', 'POST', lambda ctx, i: ('/apis/change-password/', {
+            'current_password': BENCH_PASSWORD, 'new_password': BENCH_PASSWORD,
+        }, {}), auth=True),
+        Scenario('apis/auth/register/', 'POST', lambda ctx, i: ('/apis/auth/register/', {
+            'name': 'Bench', 'email': f'bench-{time.time_ns()}@example.com', 'phone': '0300', 'password': BENCH_PASSWORD,
+        }, {})),
+        Scenario('apis/auth/login/', 'POST', lambda ctx, i: ('/apis/auth/login/', {
+            'email': ctx.user.email, 'password': BENCH_PASSWORD,
+        }, {})),
+    ]
+
+
+@contextlib.contextmanager
+def bench_environment():
+    """Points Stripe at a local stand-in and sets the webhook secret the scenarios sign with."""
+    with StripeStandIn() as standin, override_settings(
+        STRIPE_API_BASE=standin.url, STRIPE_SECRET_KEY='sk_test_bench', STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+    ):
+        get_stripe_client.cache_clear()
+        try:
+            yield
+        finally:
+            get_stripe_client.cache_clear()
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))]
+
+
+def _summary(latencies, queries, statuses):
+    latencies = sorted(latencies)
+    queries = sorted(queries)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / sum(latencies), 1),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': queries[-1],
+        'statuses': {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def run_scenarios(ctx, selected, iterations=50, warmup=5, cold_cache=False, progress=None):
+    """
+    Sends warmup + iterations requests per scenario, one at a time, and
+    returns {scenario name: summary}. Only the request itself is timed;
+    with `cold_cache` the cache is cleared before every request.
+    """
+    client = Client()
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    results = {}
+    for scenario in selected:
+        latencies, query_counts, statuses = [], [], Counter()
+        for i in range(warmup + iterations):
+            path, data, extra = scenario.build(ctx, i)
+            if scenario.auth:
+                extra = {**extra, 'HTTP_AUTHORIZATION': f'Bearer {ctx.token}'}
+            if scenario.method != 'GET' and data is not None and not isinstance(data, str):
+                data = json.dumps(data)
+            if cold_cache:
+                cache.clear()
+
+            queries = 0
+            with connection.execute_wrapper(count_queries):
+                start = time.perf_counter()
+                if scenario.method == 'GET':
+                    response = client.get(path, data, **extra)
+                else:
+                    response = client.generic(
+                        scenario.method, path, data or '', content_type='application/json', **extra
+                    )
+                elapsed = time.perf_counter() - start
+            if i >= warmup:
+                latencies.append(elapsed)
+                query_counts.append(queries)
+                statuses[response.status_code] += 1
+        results[scenario.name] = _summary(latencies, query_counts, statuses)
+        if progress:
+            progress(scenario.name, results[scenario.name])
+    return results
+
@@ -0,0 +1,104 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, time.time_ns, None)
+
+
+def bump_catalog_version():
+    """
+    Invalidates every cached catalog payload at once. A fresh timestamp is
+    used rather than incr() so an evicted counter can never come back as
+    an old version.
+    """
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def cached_catalog_payload(request, name, build):
+    """
+    Returns {'data', 'etag'} for the payload built by `build()`, cached
+    under the current catalog version. Image URLs are absolute, so the
+    host is part of the key.
+    """
+    key = f"catalog:{get_catalog_version()}:{name}:{request.build_absolute_uri('/')}"
+    entry = cache.get(key)
+    if entry is None:
+        data = build()
+        entry = {'data': data, 'etag': make_etag(JSONRenderer().render(data))}
+        cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+    return entry
+
+
+def make_etag(content):
+    return '"%s"' % hashlib.md5(content).hexdigest()
+
+
+def etag_response(request, data, etag, cache_control):
+    """Response with ETag/Cache-Control, or a 304 when If-None-Match matches."""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        return Response(status=304, headers=headers)
+    return Response(data, headers=headers)
+
+
+def catalog_response(request, name, build):
+    """
+    Serves a public catalog payload from the versioned cache. Warm requests
+    make no database queries, and a matching If-None-Match gets a 304.
+    """
+    entry = cached_catalog_payload(request, name, build)
+    return etag_response(
+        request, entry['data'], entry['etag'], f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}'
+    )
+
+
+# Stale-while-revalidate caching for expensive, read-mostly pages such as
+# the analytics dashboard.
+
+# Refreshes run here, off the request thread. One worker is enough: the
+# lock below allows a single refresh per key at a time.
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache-refresh')
+
+# How long a refresh may hold its lock before another request may retry it.
+REFRESH_LOCK_TIMEOUT = 60
+
+
+def _store(key, value, ttl, stale_ttl):
+    cache.set(key, {'value': value, 'fresh_until': time.time() + ttl}, ttl + stale_ttl)
+
+
+def _refresh(key, build, ttl, stale_ttl):
+    try:
+        _store(key, build(), ttl, stale_ttl)
+    finally:
+        cache.delete(f"{key}:refreshing")
+        connections.close_all()
+
+
+def cached_with_refresh(key, build, ttl, stale_ttl):
+    """
+    build() cached under `key`. For `ttl` seconds the cached value is served
+    as is; for `stale_ttl` seconds after that it is still served, while one
+    request (whoever takes the cache.add lock) rebuilds it in the background,
+    so concurrent readers never pile onto the database. Only a cold cache
+    builds in the request.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        value = build()
+        _store(key, value, ttl, stale_ttl)
+        return value
+    if entry['fresh_until'] <= time.time() and cache.add(f"{key}:refreshing", True, REFRESH_LOCK_TIMEOUT):
+        _refresher.submit(_refresh, key, build, ttl, stale_ttl)
+    return entry['value']
@@ -0,0 +1,292 @@
+"""
+Supplier catalog imports for `manage.py import_catalog`. Rows are read
+from CSV or NDJSON as a stream and upserted by SKU, `batch_size` at a time,
+with one INSERT ... ON CONFLICT (sku) DO UPDATE per batch. Image and .glb
+files are copied into media storage on a thread pool while the batch is
+written.
+
+CSV columns are the Product field names plus `category` (by name);
+frame_material and color are '|'-separated and configurations is JSON.
+NDJSON rows use the same keys with native JSON values. image and model
+are paths relative to the media directory given to the import.
+"""
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+from .suggestions import refresh_suggestions
+
+FIELDS = [
+    'name', 'description', 'price', 'stock', 'category_id', 'brand', 'frame_material', 'color',
+    'gender', 'tag', 'is_featured', 'is_AR', 'configurations', 'image', 'model',
+]
+MEDIA_FIELDS = ('image', 'model')
+TRUE = {'1', 'true', 'yes', 'y', 't'}
+# Column bounds, so one out-of-range row can't fail its whole batch's INSERT
+_price_field = Product._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places)
+MAX_STOCK = 2_147_483_647  # PositiveIntegerField is an int4 column
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)  # [(sku, {field: (old, new)})]
+    unchanged: int = 0
+    errors: list = field(default_factory=list)  # [(line, message)]
+    copied: int = 0
+    # [(sku, units)]: stock raised to the units held by open card checkouts
+    clamped: list = field(default_factory=list)
+
+
+def read_rows(path):
+    """
+    Yields (line number, raw dict) from a .csv or .ndjson/.jsonl file. A
+    line that isn't valid JSON yields an ImportRowError in place of the
+    dict, which parse_row raises, so it is rejected like any other bad row.
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        raw = json.loads(text)
+                    except ValueError as e:
+                        raw = ImportRowError(f"invalid JSON: {e}")
+                    yield line, raw
+
+
+def _text(value):
+    return None if value is None else str(value).strip()
+
+
+def _array(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in (value or '').split('|') if item.strip()]
+
+
+def parse_row(raw, categories, media_dir):
+    """
+    The Product values for one raw row, with the category resolved through
+    `categories` ({lowercased name: id}). Raises ImportRowError.
+    """
+    if isinstance(raw, ImportRowError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ImportRowError('row must be a JSON object')
+    sku = _text(raw.get('sku'))
+    if not sku:
+        raise ImportRowError('sku is required')
+    name = _text(raw.get('name'))
+    if not name:
+        raise ImportRowError('name is required')
+    category_id = categories.get((_text(raw.get('category')) or '').lower())
+    if category_id is None:
+        raise ImportRowError(f"unknown category {raw.get('category')!r}")
+    try:
+        price = Decimal(str(raw.get('price'))).quantize(Decimal('0.01'))
+        stock = int(raw.get('stock') or 0)
+    except (InvalidOperation, ValueError, OverflowError):
+        raise ImportRowError('price and stock must be numbers')
+    if not price.is_finite():
+        raise ImportRowError('price and stock must be numbers')
+    if price < 0 or stock < 0:
+        raise ImportRowError('price and stock must not be negative')
+    if price >= MAX_PRICE or stock > MAX_STOCK:
+        raise ImportRowError(f"price must be below {MAX_PRICE} and stock at most {MAX_STOCK}")
+    gender = _text(raw.get('gender')) or 'U'
+    if gender not in dict(Product.GENDER_CHOICES):
+        raise ImportRowError(f"gender must be one of {', '.join(dict(Product.GENDER_CHOICES))}")
+    configurations = raw.get('configurations') or None
+    if isinstance(configurations, str):
+        try:
+            configurations = json.loads(configurations)
+        except ValueError:
+            raise ImportRowError('configurations must be JSON')
+
+    values = {
+        'sku': sku,
+        'name': name,
+        'description': _text(raw.get('description')) or '',
+        'price': price,
+        'stock': stock,
+        'category_id': category_id,
+        'brand': _text(raw.get('brand')) or None,
+        'frame_material': _array(raw.get('frame_material')),
+        'color': _array(raw.get('color')),
+        'gender': gender,
+        'tag': _text(raw.get('tag')) or None,
+        'is_featured': str(raw.get('is_featured', '')).strip().lower() in TRUE,
+        'is_AR': str(raw.get('is_AR', '')).strip().lower() in TRUE,
+        'configurations': configurations,
+    }
+    media = {}
+    for media_field in MEDIA_FIELDS:
+        source = _text(raw.get(media_field))
+        if source:
+            path = os.path.realpath(os.path.join(media_dir, source))
+            if os.path.commonpath([path, os.path.realpath(media_dir)]) != os.path.realpath(media_dir):
+                raise ImportRowError(f"{media_field} must be inside the media directory: {source}")
+            if not os.path.isfile(path):
+                raise ImportRowError(f"{media_field} file not found: {source}")
+            media[media_field] = path
+            values[media_field] = f"products/{sku}/{os.path.basename(source)}"
+        else:
+            values[media_field] = ''
+    _check_lengths(values)
+    return values, media
+
+
+def _check_lengths(values):
+    """Rejects values too long for their column, which would fail the whole batch's INSERT."""
+    for name, value in values.items():
+        model_field = Product._meta.get_field(name)
+        if isinstance(value, list):
+            model_field, items = model_field.base_field, value
+        else:
+            items = [value]
+        limit = model_field.max_length
+        if limit and any(isinstance(item, str) and len(item) > limit for item in items):
+            raise ImportRowError(f"{name} must be at most {limit} characters")
+
+
+def _digest(f):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+        digest.update(chunk)
+    return digest.digest()
+
+
+def copy_media(source, name):
+    """
+    Copies `source` into media storage as `name`, unless an identical file
+    is there already: same size and, since a file can change without
+    changing size, the same SHA-256.
+    """
+    if default_storage.exists(name):
+        if default_storage.size(name) == os.path.getsize(source):
+            with open(source, 'rb') as new, default_storage.open(name, 'rb') as stored:
+                if _digest(new) == _digest(stored):
+                    return False
+        default_storage.delete(name)
+    with open(source, 'rb') as f:
+        default_storage.save(name, File(f))
+    return True
+
+
+def _diff(existing, values):
+    # '' and None (and [] and None) count as the same empty value
+    return {
+        name: (existing[name], values[name])
+        for name in FIELDS
+        if (existing[name] or None) != (values[name] or None)
+        and not (name == 'stock' and existing['stock_stripes'])
+    }
+
+
+def import_catalog(rows, media_dir='.', dry_run=False, batch_size=1000, workers=8):
+    """
+    Upserts (line, raw dict) `rows` by SKU and returns an ImportResult. A
+    dry run resolves and diffs every row against the catalog but writes
+    nothing and copies no files. Unchanged rows are not written, so their
+    updated_at stays put; files are copied only when new or changed. A
+    striped product's stock is left alone (see `manage.py
+    set_stock_stripes`), and no product's stock is set below the units
+    held by open card checkouts (see ImportResult.clamped).
+    """
+    rows = iter(rows)
+    categories = {name.lower(): pk for pk, name in Category.objects.values_list('id', 'name')}
+    result = ImportResult()
+
+    with ThreadPoolExecutor(workers, thread_name_prefix='catalog-media') as pool:
+        while batch := list(islice(rows, batch_size)):
+            parsed = {}
+            for line, raw in batch:
+                try:
+                    values, media = parse_row(raw, categories, media_dir)
+                except ImportRowError as e:
+                    result.errors.append((line, str(e)))
+                    continue
+                parsed[values['sku']] = (values, media)  # a later row for a SKU wins
+
+            existing = {
+                row['sku']: row for row in Product.objects.filter(sku__in=parsed)
+                .values('id', 'sku', 'stock_stripes', 'reserved', *FIELDS)
+            }
+            changed = []
+            for sku, (values, media) in parsed.items():
+                previous = existing.get(sku)
+                held = previous['reserved'] if previous and not previous['stock_stripes'] else 0
+                if values['stock'] < held:
+                    values['stock'] = held
+                    result.clamped.append((sku, held))
+                if sku not in existing:
+                    result.created.append(sku)
+                elif diff := _diff(existing[sku], values):
+                    result.updated.append((sku, diff))
+                else:
+                    result.unchanged += 1
+                    continue
+                changed.append((values, media))
+            if dry_run:
+                continue
+
+            # Every row's files, as a file may change under an unchanged name
+            copies = [
+                pool.submit(copy_media, source, values[name])
+                for values, media in parsed.values() for name, source in media.items()
+            ]
+            if changed:
+                _upsert([values for values, _ in changed], existing)
+            result.copied += sum(future.result() for future in copies)
+
+    if not dry_run and (result.created or result.updated):
+        transaction.on_commit(bump_catalog_version)
+    return result
+
+
+def _upsert(rows, existing):
+    products = []
+    for values in rows:
+        previous = existing.get(values['sku'])
+        if previous and previous['stock_stripes']:
+            values = {**values, 'stock': previous['stock']}
+        products.append(Product(**values))
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=[*FIELDS, 'updated_at'],
+        )
+        # For holds taken since `existing` was read; the upsert now locks these rows
+        Product.objects.filter(
+            sku__in=[product.sku for product in products], stock_stripes=0, stock__lt=F('reserved')
+        ).update(stock=F('reserved'))
+        # bulk_create doesn't return ids for upserts, so look them up
+        refresh_suggestions(
+            product_ids=Product.objects.filter(sku__in=[product.sku for product in products]).values_list('id', flat=True),
+            brands=[product.brand for product in products] + [row['brand'] for row in existing.values()],
+            category_ids={product.category_id for product in products} | {row['category_id'] for row in existing.values()},
+        )
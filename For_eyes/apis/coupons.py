@@ -0,0 +1,98 @@
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Now
+from django.utils import timezone
+
+from .models import Coupon
+
+ACTIVE_COUPONS_KEY = 'coupons:active'
+COUPON_FIELDS = [
+    'id', 'code', 'discount', 'discount_type', 'discount_value', 'min_order',
+    'expires_at', 'is_active', 'max_uses', 'created_at',
+]
+
+
+class CouponError(Exception):
+    pass
+
+
+def active_coupons():
+    """
+    Active, unexpired coupons as dicts, newest first. Cached until a
+    coupon is saved or deleted (see apis.signals); expiry is re-checked on
+    every read, so a cached coupon never outlives its expires_at.
+    """
+    coupons = cache.get(ACTIVE_COUPONS_KEY)
+    if coupons is None:
+        coupons = list(
+            Coupon.objects.filter(is_active=True, expires_at__gte=timezone.now())
+            .order_by('-created_at').values(*COUPON_FIELDS)
+        )
+        cache.set(ACTIVE_COUPONS_KEY, coupons, settings.COUPON_CACHE_TIMEOUT)
+    now = timezone.now()
+    return [coupon for coupon in coupons if coupon['expires_at'] >= now]
+
+
+def invalidate_active_coupons():
+    cache.delete(ACTIVE_COUPONS_KEY)
+
+
+def find_coupon(code):
+    """The active coupon for `code` (case-insensitive), or CouponError."""
+    code = code.strip().upper()
+    for coupon in active_coupons():
+        if coupon['code'].upper() == code:
+            return coupon
+    raise CouponError('Invalid or expired discount code.')
+
+
+def price_coupon(coupon, subtotal):
+    """The discount `coupon` gives on `subtotal`, never more than the subtotal."""
+    if subtotal < coupon['min_order']:
+        raise CouponError(f"This code needs an order of at least {coupon['min_order']}.")
+    if coupon['discount_type'] == 'percentage':
+        discount = subtotal * coupon['discount_value'] / 100
+    else:
+        discount = coupon['discount_value']
+    return min(discount, subtotal).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def redeem_coupon(coupon):
+    """
+    Counts one use of `coupon` with a single conditional
+    UPDATE ... SET used_count = used_count + 1 WHERE used_count < max_uses,
+    so parallel checkouts can never redeem it more than max_uses times.
+    Rolled back with the order if the checkout fails later on.
+    """
+    redeemed = Coupon.objects.filter(
+        Q(max_uses__isnull=True) | Q(used_count__lt=F('max_uses')),
+        id=coupon['id'], is_active=True, expires_at__gte=Now(),
+    ).update(used_count=F('used_count') + 1)
+    if not redeemed:
+        raise CouponError('This discount code has been fully redeemed.')
+
+
+def redeem_code(code):
+    """redeem_coupon for the coupon with exactly this code, e.g. an order's discount_code."""
+    coupon = Coupon.objects.filter(code=code).values('id').first()
+    if coupon is None:
+        raise CouponError('Invalid or expired discount code.')
+    redeem_coupon(coupon)
+
+
+def count_coupon_use(code):
+    """
+    Counts a use of `code` unconditionally, for an order that has already
+    been paid with the discount even though its use had been given back.
+    """
+    Coupon.objects.filter(code=code).update(used_count=F('used_count') + 1)
+
+
+def release_coupon_uses(codes):
+    """Gives back one use of each code in `codes`, e.g. for abandoned card checkouts."""
+    for code, uses in Counter(codes).items():
+        Coupon.objects.filter(code=code).update(used_count=Greatest(F('used_count') - uses, 0))
@@ -0,0 +1,197 @@
+"""
+Synthetic store data for benchmarks. Everything is driven by a seeded
+random.Random so runs are reproducible.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+
+from .models import Address, Category, Coupon, Favourite, Order, OrderItem, Product
+from .rollups import rebuild_rollups
+from .suggestions import rebuild_suggestions
+
+User = get_user_model()
+BENCH_PASSWORD = 'bench-password'
+
+BRANDS = ['Ray-Ban', 'Oakley', 'Persol', 'Prada', 'Gucci', 'Vogue', 'Tom Ford', 'Carrera', 'Police', 'Polaroid']
+STYLES = ['Aviator', 'Wayfarer', 'Round', 'Cat Eye', 'Clubmaster', 'Rimless', 'Square', 'Oversized', 'Sport', 'Hexagonal']
+MATERIALS = ['Metal', 'Plastic', 'Acetate', 'Titanium', 'TR90', 'Wood', 'Carbon Fibre']
+COLORS = ['Black', 'Gold', 'Silver', 'Tortoise', 'Blue', 'Brown', 'Green', 'Red', 'Transparent', 'Pink']
+TAGS = ['New', 'Sale', 'Best Seller', 'Limited', None]
+CATEGORIES = ['Eyeglasses', 'Sunglasses', 'Lenses', 'Sports', 'Accessories']
+FIRST_NAMES = ['Ayesha', 'Omar', 'Sara', 'Ali', 'Fatima', 'Hassan', 'Zainab', 'Bilal', 'Maryam', 'Usman']
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Multan', 'Peshawar']
+
+
+def generate_categories():
+    return [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+
+
+def generate_products(count, rng, batch_size=5_000):
+    """Bulk-inserts `count` products spread over the standard categories."""
+    categories = generate_categories()
+    batch = []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        style = rng.choice(STYLES)
+        materials = rng.sample(MATERIALS, rng.randint(1, 2))
+        colors = rng.sample(COLORS, rng.randint(1, 3))
+        batch.append(Product(
+            name=f"{brand} {style} {i}",
+            description=f"{style} frame in {' and '.join(colors).lower()} {materials[0].lower()}. "
+                        f"Lightweight, durable and made for all-day comfort.",
+            image=f"products/{brand.replace(' ', '_')}_{style.replace(' ', '_')}.jpg" if rng.random() < 0.9 else '',
+            price=Decimal(rng.randint(1500, 40000)) / 100,
+            stock=rng.randint(0, 200),
+            category=rng.choice(categories),
+            brand=brand,
+            frame_material=materials,
+            color=colors,
+            gender=rng.choice('MFU'),
+            tag=rng.choice(TAGS),
+            is_featured=rng.random() < 0.05,
+            is_AR=rng.random() < 0.1,
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+
+
+def generate_users(count, rng, password=BENCH_PASSWORD, batch_size=5_000):
+    """
+    Bulk-inserts `count` customers, user0@example.com and up, all with
+    `password` (hashed once). Returns their ids.
+    """
+    hashed = make_password(password)
+    users = []
+    for i in range(count):
+        name = rng.choice(FIRST_NAMES)
+        users.append(User(
+            email=f"user{i}@example.com",
+            name=f"{name} {i}",
+            phone=f"03{rng.randint(0, 999_999_999):09d}",
+            password=hashed,
+        ))
+    return [user.id for user in User.objects.bulk_create(users, batch_size=batch_size)]
+
+
+def generate_addresses(user_ids, rng, max_per_user=3):
+    """0 to `max_per_user` addresses per user, the first one the default."""
+    Address.objects.bulk_create([
+        Address(
+            user_id=user_id,
+            type=rng.choice(['Home', 'Work', 'Other']),
+            street=f"{rng.randint(1, 500)} Main Street",
+            city=rng.choice(CITIES),
+            zip_code=f"{rng.randint(10000, 99999)}",
+            is_default=n == 0,
+        )
+        for user_id in user_ids
+        for n in range(rng.randint(0, max_per_user))
+    ], batch_size=5_000)
+
+
+def generate_favourites(user_ids, rng, max_per_user=10):
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    Favourite.objects.bulk_create([
+        Favourite(user_id=user_id, product_id=product_id)
+        for user_id in user_ids
+        for product_id in rng.sample(product_ids, min(rng.randint(0, max_per_user), len(product_ids)))
+    ], batch_size=5_000)
+
+
+def generate_coupons(count, rng):
+    """`count` coupons, BENCH0 and up; about one in five has expired."""
+    now = timezone.now()
+    coupons = []
+    for i in range(count):
+        percentage = rng.random() < 0.5
+        value = rng.choice([5, 10, 15, 20, 25]) if percentage else rng.choice([5, 10, 20])
+        coupons.append(Coupon(
+            code=f"BENCH{i}",
+            discount=f"{value}% off" if percentage else f"${value} off",
+            discount_type='percentage' if percentage else 'fixed',
+            discount_value=value,
+            min_order=rng.choice([0, 0, 50, 100]),
+            expires_at=now + timedelta(days=rng.randint(-30, 120) or 1),
+            max_uses=rng.choice([None, 100, 1000]),
+        ))
+    Coupon.objects.bulk_create(coupons)
+
+
+def generate_orders(count, rng, user_ids=(), days=365, batch_size=5_000, max_items=5):
+    """
+    Bulk-inserts `count` orders of 1 to `max_items` lines each over the
+    existing products, placed over the last `days` days. About 70% belong
+    to one of `user_ids` (if given), the rest are guest orders. Stock and
+    the analytics rollups are not touched; see rebuild_rollups.
+    """
+    products = list(Product.objects.values_list('id', 'price'))
+    user_ids = list(user_ids)
+    now = timezone.now()
+    for offset in range(0, count, batch_size):
+        orders, lines, placed = [], [], []
+        for i in range(offset, min(offset + batch_size, count)):
+            name = rng.choice(FIRST_NAMES)
+            picked = [(product, rng.randint(1, 3)) for product in rng.sample(products, rng.randint(1, max_items))]
+            orders.append(Order(
+                user_id=rng.choice(user_ids) if user_ids and rng.random() < 0.7 else None,
+                name=f"{name} {i}",
+                email=f"{name.lower()}{i}@example.com",
+                phone=f"03{rng.randint(0, 999_999_999):09d}",
+                address=f"{rng.randint(1, 500)} Main Street, {rng.choice(CITIES)}",
+                payment_method=rng.choice(['cod', 'card']),
+                total_amount=sum(price * quantity for (_, price), quantity in picked),
+                status=rng.choice(['Pending', 'Confirmed', 'Shipped', 'Delivered', 'Cancelled']),
+            ))
+            lines.append(picked)
+            placed.append(now - timedelta(seconds=rng.randint(0, days * 24 * 60 * 60)))
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.id, product_id=product_id, price=price, quantity=quantity)
+            for order, picked in zip(orders, lines)
+            for (product_id, price), quantity in picked
+        ])
+        # created_at is auto_now_add, so backdate the batch in one statement
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE apis_order o SET created_at = v.created_at "
+                "FROM unnest(%s::bigint[], %s::timestamptz[]) AS v(id, created_at) WHERE o.id = v.id",
+                [[order.id for order in orders], placed],
+            )
+
+
+# Rows per unit of `scale` in generate_dataset
+SCALE = {'users': 200, 'products': 500, 'orders': 1_000, 'coupons': 5}
+
+
+def generate_dataset(scale=1, seed=42):
+    """
+    A whole store at `scale` (see SCALE; fractions work too): users with
+    addresses and favourites, a catalog, coupons and orders, with the
+    search suggestions and rollups rebuilt. Returns the row counts.
+    """
+    rng = random.Random(seed)
+    counts = {name: max(1, round(n * scale)) for name, n in SCALE.items()}
+    generate_products(counts['products'], rng)
+    # bulk_create skips the signals that keep the suggestions current
+    rebuild_suggestions()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE apis_searchsuggestion')
+    user_ids = generate_users(counts['users'], rng)
+    generate_addresses(user_ids, rng)
+    generate_favourites(user_ids, rng)
+    generate_coupons(counts['coupons'], rng)
+    generate_orders(counts['orders'], rng, user_ids=user_ids)
+    rebuild_rollups()
+    return {
+        model._meta.model_name: model.objects.count()
+        for model in (User, Address, Favourite, Coupon, Product, Order, OrderItem)
+    }
@@ -0,0 +1,196 @@
+"""
+Streaming database dumps: one NDJSON file per model plus a manifest,
+written through server-side cursors and restored with PostgreSQL COPY.
+Unlike dumpdata/loaddata, neither side holds more than a chunk of rows in
+memory or goes through Model.save(). Used by `manage.py dump_ndjson` and
+`manage.py restore_ndjson`.
+
+Derived tables (the daily rollups and their pending deltas) are not dumped; restore_ndjson rebuilds
+them, and re-runs the category count reconciliation, since the product
+insert triggers count every restored product on top of the dumped counts.
+The suggestion words aren't dumped either: the triggers on the restored
+suggestions fill them in.
+"""
+import json
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+MANIFEST = 'manifest.json'
+DEFAULT_APPS = ['accounts', 'apis']
+DERIVED_MODELS = {
+    'apis.dailyorderrollup', 'apis.dailyproductrollup', 'apis.dailycategoryrollup',
+    'apis.orderrollupdelta', 'apis.productrollupdelta', 'apis.categoryrollupdelta',
+    'apis.suggestionword',
+}
+
+
+def dump_models(app_labels=DEFAULT_APPS):
+    """
+    The models of `app_labels` (with their many-to-many tables), minus the
+    derived ones, ordered so every foreign key points at an earlier model.
+    """
+    models = [
+        model
+        for label in app_labels
+        for model in apps.get_app_config(label).get_models(include_auto_created=True)
+        if model._meta.label_lower not in DERIVED_MODELS
+    ]
+    # Drop many-to-many tables pointing outside the dump (e.g. User.groups)
+    models = [
+        model for model in models
+        if not model._meta.auto_created
+        or all(field.related_model in models for field in model._meta.concrete_fields if field.is_relation)
+    ]
+
+    ordered, seen = [], set()
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model in models and field.related_model is not model:
+                visit(field.related_model)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
+
+
+def dump(directory, models, chunk_size=5000, progress=None):
+    """
+    Writes <app>.<model>.ndjson (one JSON array of column values per row)
+    for each model and a manifest listing files, columns and row counts.
+    Runs in one REPEATABLE READ transaction (unless called inside one
+    already), so all files see the same snapshot.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        for model in models:
+            fields = model._meta.concrete_fields
+            file_name = f"{model._meta.label_lower}.ndjson"
+            rows = 0
+            with open(directory / file_name, 'w', encoding='utf-8') as f:
+                values = (
+                    model._base_manager.order_by('pk')
+                    .values_list(*(field.attname for field in fields)).iterator(chunk_size=chunk_size)
+                )
+                for row in values:
+                    f.write(json.dumps(row, default=str, ensure_ascii=False))
+                    f.write('\n')
+                    rows += 1
+            manifest.append({
+                'model': model._meta.label_lower,
+                'file': file_name,
+                'columns': [field.column for field in fields],
+                'rows': rows,
+            })
+            if progress:
+                progress(model._meta.label_lower, rows)
+    (directory / MANIFEST).write_text(json.dumps({'models': manifest}, indent=2))
+    return manifest
+
+
+def _array_literal(values):
+    items = (
+        'NULL' if item is None else '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        for item in values
+    )
+    return '{' + ','.join(items) + '}'
+
+
+def _converter(field):
+    """A function turning a JSON-decoded value of `field` into a COPY text-format field."""
+    if field.get_internal_type() == 'JSONField':
+        to_text = json.dumps
+    elif field.get_internal_type() == 'ArrayField':
+        to_text = _array_literal
+    elif field.get_internal_type() == 'BooleanField':
+        to_text = lambda value: 't' if value else 'f'
+    else:
+        to_text = str
+
+    def convert(value):
+        return r'\N' if value is None else _escape(to_text(value))
+    return convert
+
+
+def _escape(text):
+    if '\\' not in text and '\t' not in text and '\n' not in text and '\r' not in text:
+        return text
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class _CopyStream:
+    """A file-like read() over an iterator of text lines, for cursor.copy_expert."""
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line.encode()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _copy_lines(path, fields):
+    converters = [_converter(field) for field in fields]
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield '\t'.join(convert(value) for convert, value in zip(converters, json.loads(line))) + '\n'
+
+
+def restore(directory, truncate=False, progress=None):
+    """
+    Loads a dump() directory with one COPY per model, in one transaction,
+    then resets the id sequences. The target tables must be empty unless
+    `truncate` is set, which empties them (and anything referencing them)
+    first. Returns the models restored.
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST).read_text())['models']
+    models = [apps.get_model(entry['model']) for entry in manifest]
+    tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if truncate:
+            # Run any deferred foreign key checks first; TRUNCATE refuses to
+            # empty a table that still has them pending.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'TRUNCATE {tables} CASCADE')
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        else:
+            not_empty = [model._meta.label_lower for model in models if model._base_manager.exists()]
+            if not_empty:
+                raise ValueError(f"Tables are not empty: {', '.join(not_empty)}")
+
+        for model, entry in zip(models, manifest):
+            fields = {field.column: field for field in model._meta.concrete_fields}
+            columns = ', '.join(connection.ops.quote_name(column) for column in entry['columns'])
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN",
+                _CopyStream(_copy_lines(directory / entry['file'], [fields[c] for c in entry['columns']])),
+                64 * 1024,
+            )
+            if progress:
+                progress(entry['model'], entry['rows'])
+
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+    return models
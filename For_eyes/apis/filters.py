@@ -0,0 +1,116 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+# Facet name -> column it groups on. Array facets are unnested so each
+# material/color gets its own count.
+FACETS = {
+    'category': 'category__name',
+    'brand': 'brand',
+    'gender': 'gender',
+    'frame_material': 'frame_material',
+    'color': 'color',
+}
+ARRAY_FACETS = {'frame_material', 'color'}
+
+
+def get_list(params, name):
+    """Supports both ?brand=A&brand=B and ?brand=A,B."""
+    values = []
+    for raw in params.getlist(name):
+        values += [value.strip() for value in raw.split(',') if value.strip()]
+    return values
+
+
+def get_price(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        return Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: 'Enter a valid number.'})
+
+
+def filter_products(queryset, params, exclude=None):
+    """
+    Applies the facet filters from the query string. `exclude` skips one
+    facet, which is how that facet's own counts are computed.
+    """
+    categories = get_list(params, 'category')
+    if categories and exclude != 'category':
+        match = Q()
+        for name in categories:
+            match |= Q(category__name__iexact=name)
+        queryset = queryset.filter(match)
+
+    for facet in ('brand', 'gender'):
+        values = get_list(params, facet)
+        if values and exclude != facet:
+            queryset = queryset.filter(**{f'{facet}__in': values})
+
+    for facet in ARRAY_FACETS:
+        values = get_list(params, facet)
+        if values and exclude != facet:
+            queryset = queryset.filter(**{f'{facet}__overlap': values})
+
+    if exclude != 'price':
+        min_price = get_price(params, 'min_price')
+        max_price = get_price(params, 'max_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+    return queryset
+
+
+def facet_counts(params):
+    """
+    Counts per facet value for the current filters, where each facet
+    ignores its own filter so unselected options keep their counts.
+    Every facet, plus the price range, comes from one UNION ALL statement.
+
+    Returns {'brand': [{'value': 'Ray-Ban', 'count': 12}, ...], ...,
+             'price': {'min': '10.00', 'max': '250.00'}}.
+    """
+    branches = []
+    sql_params = []
+
+    for facet, column in [*FACETS.items(), ('price', 'price')]:
+        queryset = filter_products(Product.objects.all(), params, exclude=facet)
+        sub, sub_params = queryset.values(value=F(column)).query.sql_with_params()
+        if facet == 'price':
+            branch = f"SELECT %s, MIN(s.value)::text, MAX(s.value)::text, COUNT(*) FROM ({sub}) s"
+        elif facet in ARRAY_FACETS:
+            branch = (
+                f"SELECT %s, v::text, NULL, COUNT(*) "
+                f"FROM ({sub}) s CROSS JOIN LATERAL unnest(s.value) v GROUP BY v"
+            )
+        else:
+            branch = (
+                f"SELECT %s, s.value::text, NULL, COUNT(*) "
+                f"FROM ({sub}) s WHERE s.value IS NOT NULL GROUP BY s.value"
+            )
+        branches.append(branch)
+        sql_params += [facet, *sub_params]
+
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(f'({branch})' for branch in branches), sql_params)
+        rows = cursor.fetchall()
+
+    facets = {facet: [] for facet in FACETS}
+    facets['price'] = {'min': None, 'max': None}
+    for facet, value, max_value, count in rows:
+        if facet == 'price':
+            facets['price'] = {'min': value, 'max': max_value}
+        else:
+            facets[facet].append({'value': value, 'count': count})
+
+    for facet in FACETS:
+        facets[facet].sort(key=lambda item: (-item['count'], item['value']))
+    return facets
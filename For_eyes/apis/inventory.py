@@ -0,0 +1,287 @@
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Now
+from django.utils import timezone
+
+from .coupons import redeem_code, release_coupon_uses
+from .models import Order, Product, StockReservation, StockStripe
+
+
+class _Short(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        names = Product.objects.filter(id__in=product_ids).values_list('name', flat=True)
+        super().__init__(f"Not enough stock for {', '.join(sorted(names))}")
+
+
+def order_quantities(items):
+    """{product_id: total quantity} for items with product_id/quantity keys."""
+    quantities = Counter()
+    for item in items:
+        quantities[item['product_id']] += item['quantity']
+    return dict(quantities)
+
+
+def _per_id(amounts):
+    return Case(*(When(id=pk, then=amount) for pk, amount in amounts.items()))
+
+
+def with_available_stock(queryset):
+    """
+    Annotates products with `available`: stock minus active holds, summed
+    over the stripes of striped products. A plain read: no row locks.
+    """
+    stripes = (
+        StockStripe.objects.filter(product=OuterRef('pk')).values('product')
+        .annotate(available=Sum(F('stock') - F('reserved'))).values('available')
+    )
+    return queryset.annotate(available=Greatest(
+        F('stock') - F('reserved') + Coalesce(Subquery(stripes, output_field=IntegerField()), 0), 0
+    ))
+
+
+def available_stock(product_ids):
+    """{product_id: units that can still be sold}."""
+    return dict(with_available_stock(Product.objects.filter(id__in=product_ids)).values_list('id', 'available'))
+
+
+def _apply(allocations, stock=0, reserved=0):
+    """
+    Adds `stock` and `reserved` (each -1, 0 or 1) times the quantity of
+    every (product_id, stripe_id, quantity) allocation to its stripe, or to
+    the product row when stripe_id is None. One UPDATE per table.
+    """
+    on_products, on_stripes = Counter(), Counter()
+    for product_id, stripe_id, quantity in allocations:
+        if stripe_id is None:
+            on_products[product_id] += quantity
+        else:
+            on_stripes[stripe_id] += quantity
+
+    for model, amounts in ((Product, on_products), (StockStripe, on_stripes)):
+        if not amounts:
+            continue
+        delta = _per_id(amounts)
+        changes = {
+            column: F(column) + delta if sign > 0 else F(column) - delta
+            for column, sign in (('stock', stock), ('reserved', reserved)) if sign
+        }
+        if model is Product:
+            changes['updated_at'] = Now()
+        model.objects.filter(id__in=amounts).update(**changes)
+
+
+TAKE_FROM_STRIPE_SQL = """
+UPDATE apis_stockstripe SET {column} = {column} {op} %s
+WHERE product_id = %s AND "index" = %s AND stock >= reserved + %s
+RETURNING id
+"""
+
+
+def _take_striped(product_id, stripes, quantity, column):
+    """
+    Takes `quantity` from one random stripe that has enough, touching only
+    that stripe's row. If no single stripe has enough, locks all of them
+    and spreads the take across them.
+    """
+    sql = TAKE_FROM_STRIPE_SQL.format(column=column, op='-' if column == 'stock' else '+')
+    with connection.cursor() as cursor:
+        for index in random.sample(range(stripes), stripes):
+            cursor.execute(sql, [quantity, product_id, index, quantity])
+            row = cursor.fetchone()
+            if row:
+                return [(product_id, row[0], quantity)]
+
+    rows = StockStripe.objects.filter(product_id=product_id)
+    allocations = []
+    needed = quantity
+    for stripe_id, stock, reserved in rows.select_for_update().order_by('index').values_list('id', 'stock', 'reserved'):
+        part = min(stock - reserved, needed)
+        if part > 0:
+            allocations.append((product_id, stripe_id, part))
+            needed -= part
+    if needed > 0:
+        raise _Short()
+    _apply(allocations, **{column: -1 if column == 'stock' else 1})
+    return allocations
+
+
+def _take(quantities, column):
+    """
+    Takes `quantities` ({product_id: qty}) out of available stock, either
+    selling it (column='stock') or holding it (column='reserved'), and
+    returns where it came from as (product_id, stripe_id, quantity).
+
+    Unstriped products are covered by one conditional UPDATE guarded by
+    stock - reserved >= qty; the row locks it takes serialize concurrent
+    checkouts, so available stock never goes negative. Striped products
+    take from a single stripe each. All or nothing: if any line falls short
+    the savepoint is rolled back and InsufficientStock is raised.
+    """
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(id=product_id, stock__gte=F('reserved') + quantity)
+    delta = _per_id(quantities)
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(enough, stock_stripes=0).update(
+                updated_at=Now(), **{column: F(column) - delta if column == 'stock' else F(column) + delta}
+            )
+            striped = {}
+            if updated != len(quantities):
+                striped = dict(
+                    Product.objects.filter(id__in=quantities, stock_stripes__gt=0).values_list('id', 'stock_stripes')
+                )
+                if updated != len(quantities) - len(striped):
+                    raise _Short()
+
+            allocations = [(pk, None, quantity) for pk, quantity in quantities.items() if pk not in striped]
+            for product_id in sorted(striped):
+                allocations += _take_striped(product_id, striped[product_id], quantities[product_id], column)
+            return allocations
+    except _Short:
+        # The savepoint is rolled back, so this reads the stock the UPDATE saw.
+        available = available_stock(quantities)
+        short = [product_id for product_id, quantity in quantities.items() if available.get(product_id, 0) < quantity]
+        raise InsufficientStock(short or list(quantities))
+
+
+def decrement_stock(quantities):
+    """Sells `quantities` ({product_id: qty}) straight out of available stock."""
+    if quantities:
+        _take(quantities, 'stock')
+
+
+def reserve_stock(order, quantities, ttl=None):
+    """
+    Holds `quantities` for an unpaid order for `ttl` seconds
+    (settings.STOCK_RESERVATION_TTL by default). The units stay in stock
+    but are no longer available to other checkouts.
+    """
+    if not quantities:
+        return
+    allocations = _take(quantities, 'reserved')
+
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, stripe_id=stripe_id, quantity=quantity, expires_at=expires_at)
+        for product_id, stripe_id, quantity in allocations
+    ])
+
+
+def hold_for_checkout(order, items, expires_at):
+    """
+    Makes sure all of the order's `items` (dicts with product_id and
+    quantity) are held until at least `expires_at`: existing holds are
+    extended, and lines whose hold was already released are reserved
+    again, raising InsufficientStock if the stock has gone meanwhile. An
+    order whose holds were all released had its coupon use given back
+    too, so the use is redeemed again (raising CouponError).
+    """
+    with transaction.atomic():
+        # Waits for a sweeper releasing these rows, then sees them gone
+        held = list(order.reservations.select_for_update().values_list('product_id', 'quantity'))
+        missing = Counter(order_quantities(items))
+        for product_id, quantity in held:
+            missing[product_id] -= quantity
+        reserve_stock(order, {product_id: quantity for product_id, quantity in missing.items() if quantity > 0})
+        order.reservations.update(expires_at=Greatest(F('expires_at'), Value(expires_at)))
+        if not held and order.discount_code:
+            redeem_code(order.discount_code)
+
+
+def _claim(reservations, skip_locked=False):
+    """
+    Locks and deletes the given reservation rows, returning what they held
+    as (product_id, stripe_id, quantity) and the ids of their orders.
+    Whoever deletes a hold owns it, so the webhook and the sweeper can
+    never both act on the same one.
+    """
+    rows = list(
+        reservations.select_for_update(skip_locked=skip_locked)
+        .values_list('id', 'product_id', 'stripe_id', 'quantity', 'order_id')
+    )
+    if rows:
+        StockReservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return [row[1:4] for row in rows], {row[4] for row in rows}
+
+
+def convert_reservations(order):
+    """
+    Turns the order's holds into a sale: the held units leave both stock
+    and reserved. Lines whose hold has already expired are sold from
+    available stock instead, which raises InsufficientStock if they are
+    gone. Must run inside a transaction. Returns whether the order still
+    held any stock.
+    """
+    held, _ = _claim(order.reservations.all())
+    _apply(held, stock=-1, reserved=-1)
+
+    remaining = Counter(order_quantities(order.items.values('product_id', 'quantity')))
+    for product_id, _, quantity in held:
+        remaining[product_id] -= quantity
+    decrement_stock({product_id: quantity for product_id, quantity in remaining.items() if quantity > 0})
+    return bool(held)
+
+
+def release_reservations(reservations):
+    """
+    Gives the held units back to available stock, and the coupon use of
+    each unpaid order left without any hold (see hold_for_checkout).
+    Returns the number of units released.
+    """
+    with transaction.atomic():
+        # Holds a webhook is converting right now are skipped, not waited on.
+        released, order_ids = _claim(reservations, skip_locked=True)
+        _apply(released, reserved=-1)
+        if order_ids:
+            release_coupon_uses(
+                Order.objects.filter(id__in=order_ids, is_paid=False, discount_code__isnull=False)
+                .exclude(reservations__isnull=False).values_list('discount_code', flat=True)
+            )
+    return sum(quantity for _, _, quantity in released)
+
+
+def release_expired_reservations(batch_size=500):
+    """Releases one batch of expired holds, oldest first."""
+    expired = StockReservation.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+    return release_reservations(expired[:batch_size])
+
+
+def set_stock_stripes(product_id, stripes):
+    """
+    Splits a product's available stock evenly over `stripes` StockStripe
+    rows (0 merges it back onto the product row). Units held by existing
+    reservations stay on the product row, where those holds are released.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(id=product_id)
+        rows = StockStripe.objects.select_for_update().filter(product=product)
+        totals = rows.aggregate(stock=Sum('stock'), reserved=Sum('reserved'))
+        stock = product.stock + (totals['stock'] or 0)
+        reserved = product.reserved + (totals['reserved'] or 0)
+
+        StockReservation.objects.filter(product=product).update(stripe=None)
+        rows.delete()
+
+        if stripes:
+            available = max(stock - reserved, 0)
+            StockStripe.objects.bulk_create([
+                StockStripe(product=product, index=index, stock=available // stripes + int(index < available % stripes))
+                for index in range(stripes)
+            ])
+            stock = reserved
+        Product.objects.filter(id=product_id).update(
+            stock=stock, reserved=reserved, stock_stripes=stripes, updated_at=Now()
+        )
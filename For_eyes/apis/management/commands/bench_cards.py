@@ -0,0 +1,54 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from apis.datagen import generate_products
+from apis.models import Product
+from apis.serializers import CARD_FIELDS, ProductCardSerializer, render_product_cards
+
+
+class Command(BaseCommand):
+    help = "Serializes product cards with ProductCardSerializer and the fast values() path, and checks they match."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/apis/products/', HTTP_HOST='127.0.0.1:8000')
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            generate_products(options['products'], random.Random(options['seed']))
+            queryset = Product.objects.order_by('id')
+
+            def serializer_path():
+                return ProductCardSerializer(queryset.all(), many=True, context={'request': request}).data
+
+            def fast_path():
+                return render_product_cards(queryset.values(*CARD_FIELDS), request)
+
+            slow = renderer.render(serializer_path())
+            fast = renderer.render(fast_path())
+            if slow != fast:
+                raise CommandError("Fast card rendering differs from ProductCardSerializer output.")
+            self.stdout.write(f"Outputs identical ({len(fast)} bytes for {options['products']} cards).")
+
+            for label, render in (('ProductCardSerializer', serializer_path), ('values() fast path', fast_path)):
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    render()
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{label:>22}: median {timings[len(timings) // 2]:.1f} ms, "
+                    f"best {timings[0]:.1f} ms over {options['repeat']} runs"
+                )
+
+            transaction.set_rollback(True)
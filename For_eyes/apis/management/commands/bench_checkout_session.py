@@ -0,0 +1,85 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from apis.models import Category, Order, OrderItem, Product
+from apis.payments import get_stripe_client, start_checkout_session
+from apis.stripe_standin import StripeStandIn
+from apis.views import create_checkout_session
+
+
+class Command(BaseCommand):
+    help = (
+        "Times Checkout Session creation against a local Stripe stand-in: a new client per call, "
+        "the pooled client, and repeat requests answered from the stored session."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--items', type=int, default=5, help="Line items per order.")
+        parser.add_argument('--latency-ms', type=float, default=0.0, help="Added to every stand-in response.")
+
+    def handle(self, *args, **options):
+        with StripeStandIn(latency=options['latency_ms'] / 1000) as standin, \
+                override_settings(STRIPE_API_BASE=standin.url, STRIPE_SECRET_KEY='sk_test_local'), \
+                transaction.atomic():
+            orders = self.create_orders(options['orders'], options['items'])
+
+            def fresh_client(order):
+                get_stripe_client.cache_clear()
+                start_checkout_session(order)
+
+            factory = APIRequestFactory()
+
+            def repeat_request(order):
+                request = factory.post('/apis/create-checkout-session/', {'order_id': order.id}, format='json')
+                create_checkout_session(request)
+
+            for label, call in (
+                ('new client per call', fresh_client),
+                ('pooled client', start_checkout_session),
+                ('repeat request', repeat_request),
+            ):
+                if label != 'repeat request':
+                    Order.objects.filter(id__in=[order.id for order in orders]).update(
+                        stripe_session_id=None, stripe_session_url=None, stripe_session_expires_at=None
+                    )
+                    for order in orders:
+                        order.stripe_session_id = None
+                get_stripe_client.cache_clear()
+                requests, connections = standin.requests, standin.connections
+
+                start = time.perf_counter()
+                for order in orders:
+                    call(order)
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{label:>20}: {elapsed * 1000 / len(orders):6.2f} ms/call, "
+                    f"{standin.requests - requests} API requests, {standin.connections - connections} connections"
+                )
+
+            get_stripe_client.cache_clear()
+            transaction.set_rollback(True)
+
+    def create_orders(self, count, items):
+        category = Category.objects.create(name='Checkout benchmark')
+        # Enough stock for every order's hold (see hold_for_checkout)
+        products = Product.objects.bulk_create([
+            Product(name=f'Benchmark frame {i}', description='', price=Decimal('49.99'), stock=count, category=category)
+            for i in range(items)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(name='Bench', email='bench@example.com', phone='0', address='-', payment_method='card',
+                  total_amount=Decimal('49.99') * items, status='Awaiting Payment')
+            for _ in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order in orders for product in products
+        ])
+        return orders
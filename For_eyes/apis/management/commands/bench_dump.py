@@ -0,0 +1,73 @@
+import random
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apis.datagen import generate_orders, generate_products
+from apis.dumps import DEFAULT_APPS, dump, dump_models, restore
+
+
+class Command(BaseCommand):
+    help = (
+        "Times dump_ndjson/restore_ndjson against dumpdata/loaddata on a generated dataset, "
+        "in a scratch copy of the database that is dropped afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--orders', type=int, default=250_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--skip-loaddata', action='store_true',
+                            help="Only time dumpdata on the baseline side (loaddata is the slow part)")
+
+    def handle(self, *args, **options):
+        directory = Path(tempfile.mkdtemp(prefix='bench_dump_'))
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(directory, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory)
+
+    def timed(self, label, function):
+        start = time.perf_counter()
+        function()
+        self.stdout.write(f"  {label:<28} {time.perf_counter() - start:8.1f} s")
+
+    def run(self, directory, options):
+        rng = random.Random(options['seed'])
+        self.stdout.write("Generating data...")
+        with transaction.atomic():
+            generate_products(options['products'], rng)
+            generate_orders(options['orders'], rng)
+        models = dump_models(DEFAULT_APPS)
+        rows = sum(model._base_manager.count() for model in models)
+        self.stdout.write(f"  {rows} rows in {len(models)} tables")
+
+        ndjson, fixture = directory / 'ndjson', directory / 'fixture.json'
+        self.timed('dump_ndjson', lambda: dump(ndjson, models))
+        self.timed('dumpdata --indent=4', lambda: call_command(
+            'dumpdata', *DEFAULT_APPS, '--indent=4', '--output', str(fixture), verbosity=0,
+        ))
+        size = sum(path.stat().st_size for path in ndjson.iterdir())
+        self.stdout.write(f"  sizes: ndjson {size / 1e6:.0f} MB, fixture {fixture.stat().st_size / 1e6:.0f} MB")
+
+        self.timed('restore_ndjson (COPY)', lambda: restore(ndjson, truncate=True))
+        self.timed('  + reconcile and rollups', lambda: (
+            call_command('reconcile_category_counts', stdout=StringIO()),
+            call_command('rebuild_rollups', stdout=StringIO()),
+        ))
+
+        if options['skip_loaddata']:
+            return
+        with connection.cursor() as cursor:
+            tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+            cursor.execute(f'TRUNCATE {tables} CASCADE')
+        self.timed('loaddata', lambda: call_command('loaddata', str(fixture), verbosity=0))
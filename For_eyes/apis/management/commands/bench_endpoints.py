@@ -0,0 +1,84 @@
+import json
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apis.benchmark import bench_environment, make_context, routes, run_scenarios, scenarios
+from apis.datagen import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every route in apis/urls.py and accounts/urls.py through the test client on a "
+        "generated dataset in a scratch database, reporting latency percentiles, throughput and "
+        "SQL query counts, and saving them as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help="Dataset scale (see generate_data).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per scenario first.")
+        parser.add_argument('--cold-cache', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--only', help="Run only scenarios whose name contains this text.")
+        parser.add_argument('--output', '-o', default='bench-endpoints.json')
+        parser.add_argument('--compare', metavar='JSON', help="An earlier --output to show changes against.")
+
+    def handle(self, *args, **options):
+        selected = [s for s in scenarios() if not options['only'] or options['only'] in s.name]
+        missing = set(routes()) - {s.route for s in scenarios()}
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(sorted(missing))}")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['endpoints']
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            start = time.perf_counter()
+            rows = generate_dataset(scale=options['scale'], seed=options['seed'])
+            self.stdout.write(f"Generated {sum(rows.values())} rows in {time.perf_counter() - start:.1f} s.")
+            with bench_environment():
+                results = run_scenarios(
+                    make_context(), selected, iterations=options['iterations'], warmup=options['warmup'],
+                    cold_cache=options['cold_cache'], progress=lambda name, result: self.report(name, result, baseline),
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump({
+                'commit': self.git_commit(),
+                'created_at': timezone.now().isoformat(),
+                'options': {name: options[name] for name in ('scale', 'seed', 'iterations', 'warmup', 'cold_cache')},
+                'rows': rows,
+                'endpoints': results,
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Saved {len(results)} results to {options['output']}."))
+
+    def report(self, name, result, baseline):
+        line = (
+            f"{name:<58} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f}  "
+            f"p99 {result['p99_ms']:8.2f}  {result['throughput_rps']:7.1f}/s  {result['queries_p50']:3} queries"
+        )
+        if baseline and name in baseline:
+            before = baseline[name]
+            line += f"  (p50 {result['p50_ms'] - before['p50_ms']:+.2f} ms, {result['queries_p50'] - before['queries_p50']:+} queries)"
+        errors = sum(n for code, n in result['statuses'].items() if not code.startswith('2'))
+        self.stdout.write(self.style.ERROR(line + f"  {result['statuses']}") if errors else line)
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
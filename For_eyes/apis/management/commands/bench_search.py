@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from apis.datagen import generate_products
+from apis.models import Product
+from apis.search import search_products_queryset
+
+
+def legacy_search_queryset(query):
+    """The icontains OR-chain search_products used before full-text search."""
+    return Product.objects.filter(
+        Q(name__icontains=query) |
+        Q(description__icontains=query) |
+        Q(category__name__icontains=query) |
+        Q(brand__icontains=query) |
+        Q(tag__icontains=query) |
+        Q(frame_material__icontains=query) |
+        Q(color__icontains=query)
+    ).distinct()
+
+
+class Command(BaseCommand):
+    help = "Compares legacy icontains search with ranked full-text search on a generated catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help="Search text to benchmark (repeatable)")
+        parser.add_argument('--keep', action='store_true',
+                            help="Commit the generated catalog instead of rolling it back")
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or ['aviator', 'ray ban', 'titanium black', 'tortoise']
+
+        with transaction.atomic():
+            self.generate(options['products'], options['batch_size'], random.Random(options['seed']))
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE apis_product')
+                cursor.execute('ANALYZE apis_category')
+
+            for query in queries:
+                self.compare(query, options['repeat'])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def generate(self, count, batch_size, rng):
+        self.stdout.write(f"Generating {count} products...")
+        start = time.perf_counter()
+        generate_products(count, rng, batch_size=batch_size)
+        self.stdout.write(f"  done in {time.perf_counter() - start:.1f}s")
+
+    def compare(self, query, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nQuery: {query!r}"))
+        legacy = legacy_search_queryset(query)[:20]
+        ranked = search_products_queryset(query).order_by('-rank', '-id')[:20]
+
+        for label, queryset in (('legacy icontains', legacy), ('full-text', ranked)):
+            self.stdout.write(self.style.HTTP_INFO(f"-- {label}"))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"   median {timings[len(timings) // 2]:.2f} ms, "
+                f"max {timings[-1]:.2f} ms over {repeat} runs"
+            )
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from apis.inventory import available_stock, set_stock_stripes
+from apis.models import Category, Order, Product
+from apis.views import place_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures checkout throughput on one hot product as the stock stripe count varies. "
+        "Each checkout is a COD order through the place-order view (validation, order and item "
+        "inserts, the stock update, the rollup deltas). Writes to the configured database; "
+        "the benchmark orders and product are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stripes', default='0,2,4,8,16', help="Comma-separated stripe counts to compare.")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--checkouts', type=int, default=4000)
+        parser.add_argument(
+            '--hold-ms', type=float, default=20.0,
+            help="Extra work in the same transaction after the order is placed, keeping its row locks.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stripe_counts = [int(value) for value in options['stripes'].split(',')]
+        except ValueError:
+            raise CommandError("--stripes must be a comma-separated list of integers.")
+
+        category, _ = Category.objects.get_or_create(name='Benchmark')
+        product = Product.objects.create(
+            name='Flash sale benchmark', description='', price=1, stock=0, category=category
+        )
+        try:
+            for stripes in stripe_counts:
+                self.run(product, stripes, options)
+        finally:
+            Order.objects.filter(items__product=product).delete()
+            product.delete()
+            if not category.products.exists():
+                category.delete()
+
+    def run(self, product, stripes, options):
+        checkouts = options['checkouts']
+        hold = options['hold_ms'] / 1000
+        Product.objects.filter(id=product.id).update(stock=checkouts, reserved=0)
+        set_stock_stripes(product.id, stripes)
+
+        remaining = [checkouts]
+        lock = threading.Lock()
+        failures = []
+        factory = APIRequestFactory()
+        payload = {
+            'name': 'Bench', 'email': 'bench@example.com', 'phone': '0300', 'address': '1 Bench Street',
+            'payment_method': 'cod', 'items': [{'product': product.id, 'quantity': 1, 'price': str(product.price)}],
+        }
+
+        def buyer():
+            try:
+                while True:
+                    with lock:
+                        if not remaining[0]:
+                            return
+                        remaining[0] -= 1
+                    with transaction.atomic():
+                        response = place_order(factory.post('/apis/place-order/', payload, format='json'))
+                        if response.status_code != 201:
+                            failures.append(1)
+                        elif hold:
+                            with connection.cursor() as cursor:
+                                cursor.execute('SELECT pg_sleep(%s)', [hold])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        left = available_stock([product.id])[product.id]
+        self.stdout.write(
+            f"{stripes:>3} stripes: {checkouts / elapsed:8.0f} checkouts/s "
+            f"({elapsed:.2f} s, {len(failures)} rejected, {left} left over)"
+        )
@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apis.datagen import generate_products
+from apis.suggestions import rebuild_suggestions, suggest
+
+GOAL_P99_MS = 10.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Times search/suggest/ lookups on a generated catalog against the p99 goal "
+        f"of {GOAL_P99_MS:g} ms. The catalog is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=200, help="Timed runs per query")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help="Typed text to benchmark (repeatable)")
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or ['av', 'avi', 'aviater', 'rayban', 'ray ban', 'wayfar', 'clubmster', 'gucci', 'sungl']
+
+        with transaction.atomic():
+            self.stdout.write(f"Generating {options['products']} products...")
+            generate_products(options['products'], random.Random(options['seed']))
+            rebuild_suggestions()
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE apis_searchsuggestion')
+
+            timings = []
+            for query in queries:
+                suggest(query)  # warm up
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    suggest(query)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f"{query!r:>12}: {', '.join(s['term'] for s in suggest(query)[:3])}")
+
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            style = self.style.SUCCESS if p99 < GOAL_P99_MS else self.style.ERROR
+            self.stdout.write(style(
+                f"p50 {p50:.2f} ms, p99 {p99:.2f} ms over {len(timings)} lookups (goal p99 < {GOAL_P99_MS:g} ms)"
+            ))
+            transaction.set_rollback(True)
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apis.exports import FORMATS, export_orders
+
+
+class Command(BaseCommand):
+    help = "Streams orders with their items to a CSV or NDJSON file (or stdout), in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, help="First order date, YYYY-MM-DD.")
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, help="Last order date, YYYY-MM-DD.")
+        parser.add_argument('--output', '-o', help="File to write; stdout if omitted.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = export_orders(options['format'], options['start'], options['end'], options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
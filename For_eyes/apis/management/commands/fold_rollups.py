@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apis.models import OrderRollupDelta
+from apis.rollups import fold_rollups
+
+
+class Command(BaseCommand):
+    help = "Adds the pending order deltas into the daily analytics rollups. Safe to run every minute."
+
+    def handle(self, *args, **options):
+        pending = OrderRollupDelta.objects.count()
+        fold_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Folded {pending} pending order deltas."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.catalog_import import import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Upserts products by supplier SKU from a CSV or NDJSON catalog, copying their "
+        "image and .glb files into media storage. Use --dry-run to see the diff first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="A .csv, .ndjson or .jsonl file.")
+        parser.add_argument('--media-dir', default='.',
+                            help="Directory the rows' image and model paths are relative to.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change; write nothing.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8, help="Threads copying media files.")
+
+    def handle(self, *args, **options):
+        if not options['path'].endswith(('.csv', '.ndjson', '.jsonl')):
+            raise CommandError("The catalog must be a .csv, .ndjson or .jsonl file.")
+        start = time.perf_counter()
+        result = import_catalog(
+            read_rows(options['path']),
+            media_dir=options['media_dir'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+        )
+
+        if options['dry_run'] or options['verbosity'] > 1:
+            for sku in result.created:
+                self.stdout.write(self.style.SUCCESS(f"+ {sku}"))
+            for sku, diff in result.updated:
+                self.stdout.write(self.style.WARNING(f"~ {sku}"))
+                for name, (old, new) in diff.items():
+                    self.stdout.write(f"    {name}: {old!r} -> {new!r}")
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        for sku, held in result.clamped:
+            self.stderr.write(f"{sku}: stock raised to {held}, the units held by open checkouts")
+
+        summary = (
+            f"{len(result.created)} created, {len(result.updated)} updated, "
+            f"{result.unchanged} unchanged, {len(result.errors)} rejected"
+        )
+        if options['dry_run']:
+            self.stdout.write(f"Dry run: {summary}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported: {summary}; {result.copied} media files copied "
+                f"in {time.perf_counter() - start:.1f} s."
+            ))
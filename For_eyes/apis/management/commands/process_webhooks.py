@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apis.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Processes pending Stripe events from the webhook inbox, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--loop', type=float, metavar='SECONDS',
+            help="Keep running, polling the inbox every SECONDS (for a worker process).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = 0
+            while True:
+                taken = process_pending_events(batch_size=options['batch_size'])
+                if not taken:
+                    break
+                processed += taken
+            self.stdout.write(f"Handled {processed} webhook events.")
+
+            if options['loop'] is None:
+                return
+            time.sleep(options['loop'])
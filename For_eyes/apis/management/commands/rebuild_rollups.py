@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apis.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the daily analytics rollups from the full order history, in chunks of orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} order ids")
+
+        rebuild_rollups(chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups in {time.perf_counter() - start:.1f} s."))
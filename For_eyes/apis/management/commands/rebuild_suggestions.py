@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apis.models import SearchSuggestion
+from apis.suggestions import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search/suggest/ table from products and categories (e.g. after bulk imports)."
+
+    def handle(self, *args, **options):
+        rebuild_suggestions()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {SearchSuggestion.objects.count()} search suggestions."
+        ))
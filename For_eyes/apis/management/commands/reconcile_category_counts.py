@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+RECONCILE_SQL = """
+UPDATE apis_category c SET product_count = actual.n
+FROM (
+    SELECT c2.id, count(p.id) AS n
+    FROM apis_category c2 LEFT JOIN apis_product p ON p.category_id = c2.id
+    GROUP BY c2.id
+) actual
+WHERE c.id = actual.id AND c.product_count <> actual.n
+RETURNING c.name, actual.n
+"""
+
+
+class Command(BaseCommand):
+    help = "Recomputes Category.product_count from the products table and fixes any drift."
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Block concurrent product writes so the recount and the triggers agree.
+            cursor.execute('LOCK TABLE apis_product IN SHARE MODE')
+            cursor.execute(RECONCILE_SQL)
+            fixed = cursor.fetchall()
+
+        for name, count in fixed:
+            self.stdout.write(f"  {name}: corrected to {count}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled category counts ({len(fixed)} corrected)."))
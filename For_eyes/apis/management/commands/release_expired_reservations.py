@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apis.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Releases stock held by card checkouts whose reservation has expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--loop', type=float, metavar='SECONDS',
+            help="Keep running, sweeping again every SECONDS (for a worker process).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = 0
+            while True:
+                units = release_expired_reservations(batch_size=options['batch_size'])
+                if not units:
+                    break
+                released += units
+            self.stdout.write(f"Released {released} held units.")
+
+            if options['loop'] is None:
+                return
+            time.sleep(options['loop'])
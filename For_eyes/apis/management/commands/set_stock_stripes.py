@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.inventory import available_stock, set_stock_stripes
+from apis.models import Product
+
+
+class Command(BaseCommand):
+    help = "Splits a product's stock across N counter rows for a flash sale (0 merges it back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_id', type=int)
+        parser.add_argument('stripes', type=int)
+
+    def handle(self, *args, **options):
+        if not 0 <= options['stripes'] <= 256:
+            raise CommandError("stripes must be between 0 and 256.")
+        try:
+            set_stock_stripes(options['product_id'], options['stripes'])
+        except Product.DoesNotExist:
+            raise CommandError(f"Product {options['product_id']} does not exist.")
+
+        available = available_stock([options['product_id']])[options['product_id']]
+        self.stdout.write(self.style.SUCCESS(
+            f"Product {options['product_id']} now uses {options['stripes']} stripes ({available} available)."
+        ))
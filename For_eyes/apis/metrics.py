@@ -0,0 +1,82 @@
+"""
+In-process request metrics, fed by apis.middleware.PerfMiddleware and
+served in the Prometheus text format at /metrics. Each worker process
+keeps its own numbers, so scrape every process (or sum them in queries).
+"""
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Wall time per request.', DURATION_BUCKETS),
+    'http_request_db_seconds': ('Time spent in SQL per request.', DURATION_BUCKETS),
+    'http_request_queries': ('SQL queries per request.', QUERY_BUCKETS),
+    'http_response_size_bytes': ('Response body size (non-streaming responses).', SIZE_BUCKETS),
+}
+
+
+class Registry:
+    """Histograms and a request counter keyed by (view, method) labels, safe across threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.requests = {}
+
+    def observe(self, view, method, status, values):
+        """`values` maps histogram names to this request's observation."""
+        labels = (view, method)
+        with self.lock:
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                # [count per bucket..., +Inf count, sum]
+                series = self.histograms[name].get(labels)
+                if series is None:
+                    series = self.histograms[name][labels] = [0] * (len(buckets) + 1) + [0.0]
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.requests = {}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            requests = dict(self.requests)
+            histograms = {name: {labels: list(series) for labels, series in by_label.items()}
+                          for name, by_label in self.histograms.items()}
+
+        lines = [
+            '# HELP http_requests_total Requests handled, by view, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(requests.items()):
+            lines.append(f'http_requests_total{{{_labels(view, method)},status="{status}"}} {count}')
+
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for (view, method), series in sorted(histograms[name].items()):
+                labels = _labels(view, method)
+                cumulative = 0
+                for bound, count in zip([*buckets, '+Inf'], series):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                # repr(float) round-trips; :g would keep only 6 significant digits
+                lines.append(f'{name}_sum{{{labels}}} {series[-1]}')
+                lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(view, method):
+    view = view.replace('\\', '\\\\').replace('"', '\\"')
+    return f'view="{view}",method="{method}"'
+
+
+registry = Registry()
@@ -0,0 +1,116 @@
+"""
+Per-request performance tracking. PerfMiddleware times every request and
+its SQL, adds a Server-Timing header, feeds the /metrics histograms (see
+apis.metrics) and logs slow requests with their slowest statements.
+"""
+import heapq
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('apis.perf')
+
+# Any other method is counted as OTHER, so clients can't mint label values
+METRIC_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+
+class QueryTimer:
+    """
+    A database execute_wrapper counting queries and their time. With
+    `top` > 0 it also keeps the SQL of the `top` slowest statements.
+    """
+
+    def __init__(self, top=0):
+        self.top = top
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = []  # heap of (seconds, n, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.top:
+                entry = (elapsed, self.count, sql)
+                if len(self.slowest) < self.top:
+                    heapq.heappush(self.slowest, entry)
+                elif elapsed > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+
+    def top_statements(self):
+        return [(seconds, sql) for seconds, _, sql in sorted(self.slowest, reverse=True)]
+
+
+def view_name(request):
+    """The resolved URL name (or view path for unnamed routes), so labels stay bounded."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def method_label(request):
+    return request.method if request.method in METRIC_METHODS else 'OTHER'
+
+
+class PerfMiddleware:
+    """
+    Goes first in MIDDLEWARE so its wall time covers the whole stack.
+    Streaming responses are timed up to the first byte and their size
+    isn't recorded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        capture = settings.PERF_SQL_SAMPLE_RATE > 0 and random.random() < settings.PERF_SQL_SAMPLE_RATE
+        timer = QueryTimer(settings.PERF_TOP_SQL if capture else 0)
+        wrapped = []
+        for alias in connections:
+            connection = connections[alias]
+            connection.execute_wrappers.append(timer)
+            wrapped.append(connection)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            for connection in wrapped:
+                connection.execute_wrappers.remove(timer)
+
+        name = view_name(request)
+        values = {
+            'http_request_duration_seconds': elapsed,
+            'http_request_db_seconds': timer.seconds,
+            'http_request_queries': timer.count,
+        }
+        if not response.streaming:
+            values['http_response_size_bytes'] = len(response.content)
+        registry.observe(name, method_label(request), response.status_code, values)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"'
+            )
+        if elapsed * 1000 >= settings.PERF_SLOW_REQUEST_MS:
+            self.log_slow(request, name, response, elapsed, timer, capture)
+        return response
+
+    def log_slow(self, request, name, response, elapsed, timer, captured):
+        lines = [
+            f"Slow request {request.method} {request.path} ({name}) -> {response.status_code}: "
+            f"{elapsed * 1000:.0f} ms, {timer.count} queries in {timer.seconds * 1000:.0f} ms"
+        ]
+        if captured:
+            lines += [f"  {seconds * 1000:.1f} ms  {sql}" for seconds, sql in timer.top_statements()]
+        elif timer.count:
+            lines.append('  (SQL not sampled for this request)')
+        logger.warning('\n'.join(lines))
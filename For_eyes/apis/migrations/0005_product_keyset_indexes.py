@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0004_product_configurations_product_is_ar_product_model'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='model',
+            field=models.FileField(blank=True, null=True, upload_to='products/'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+    ]
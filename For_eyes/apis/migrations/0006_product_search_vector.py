@@ -0,0 +1,71 @@
+# Generated by Django 4.2 on 2026-10-18 16:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Weights: name (A) > brand, tag, category (B) > frame material, color (C)
+# > description (D). The category trigger touches the products of a renamed
+# category so their documents pick up the new name.
+SEARCH_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION apis_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.brand, '') || ' ' || coalesce(NEW.tag, '') || ' ' ||
+            coalesce((SELECT name FROM apis_category WHERE id = NEW.category_id), '')), 'B') ||
+        setweight(to_tsvector('english', array_to_string(NEW.frame_material, ' ') || ' ' ||
+            array_to_string(NEW.color, ' ')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER apis_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, brand, tag, category_id, frame_material, color, description, search_vector
+    ON apis_product
+    FOR EACH ROW EXECUTE FUNCTION apis_product_search_vector_update();
+
+CREATE OR REPLACE FUNCTION apis_category_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name THEN
+        UPDATE apis_product SET search_vector = NULL WHERE category_id = NEW.id;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER apis_category_search_vector_trigger
+    AFTER UPDATE OF name ON apis_category
+    FOR EACH ROW EXECUTE FUNCTION apis_category_search_vector_update();
+
+UPDATE apis_product SET search_vector = NULL;
+"""
+
+DROP_SEARCH_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS apis_category_search_vector_trigger ON apis_category;
+DROP FUNCTION IF EXISTS apis_category_search_vector_update();
+DROP TRIGGER IF EXISTS apis_product_search_vector_trigger ON apis_product;
+DROP FUNCTION IF EXISTS apis_product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0005_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunSQL(SEARCH_TRIGGER_SQL, DROP_SEARCH_TRIGGER_SQL),
+    ]
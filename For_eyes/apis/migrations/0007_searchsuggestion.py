@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-18 16:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def build_suggestions(apps, schema_editor):
+    # A frozen copy of apis.suggestions as of this migration, so later
+    # changes to that module can't change what this migration does
+    import re
+
+    from django.db.models import Count
+
+    Product = apps.get_model('apis', 'Product')
+    Category = apps.get_model('apis', 'Category')
+    SearchSuggestion = apps.get_model('apis', 'SearchSuggestion')
+
+    def row(kind, key, term, object_id=None, product_count=0):
+        normalized = ' '.join(re.sub(r'[^\w\s]', '', (term or '').lower()).split())
+        return SearchSuggestion(
+            key=f"{kind}:{key}", kind=kind, term=term, normalized=normalized,
+            object_id=object_id, product_count=product_count,
+        )
+
+    rows = [row('product', pk, name, object_id=pk) for pk, name in Product.objects.values_list('id', 'name').iterator()]
+    brand_counts = (
+        Product.objects.exclude(brand__isnull=True).exclude(brand='')
+        .values_list('brand').annotate(n=Count('id'))
+    )
+    rows += [row('brand', brand, brand, product_count=n) for brand, n in brand_counts]
+    categories = Category.objects.annotate(n=Count('products')).values_list('id', 'name', 'n')
+    rows += [row('category', pk, name, object_id=pk, product_count=n) for pk, name, n in categories]
+    SearchSuggestion.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0006_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('brand', 'Brand'), ('category', 'Category')], max_length=10)),
+                ('term', models.CharField(max_length=200)),
+                ('normalized', models.CharField(max_length=200)),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchsuggestion',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized'], name='suggestion_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(build_suggestions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+# Statement-level triggers with transition tables: a bulk insert of 10k
+# products is one grouped UPDATE per category, not 10k row updates.
+PRODUCT_COUNT_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION apis_category_count_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE apis_category c SET product_count = c.product_count + d.n
+    FROM (SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id) d
+    WHERE c.id = d.category_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apis_category_count_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE apis_category c SET product_count = greatest(c.product_count - d.n, 0)
+    FROM (SELECT category_id, count(*) AS n FROM old_rows GROUP BY category_id) d
+    WHERE c.id = d.category_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apis_category_count_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE apis_category c SET product_count = greatest(c.product_count + d.n, 0)
+    FROM (
+        SELECT category_id, sum(n) AS n FROM (
+            SELECT n.category_id, 1 AS n FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE o.category_id <> n.category_id
+            UNION ALL
+            SELECT o.category_id, -1 FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE o.category_id <> n.category_id
+        ) moves GROUP BY category_id
+    ) d
+    WHERE c.id = d.category_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER apis_category_count_insert_trigger
+    AFTER INSERT ON apis_product REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_category_count_insert();
+
+CREATE TRIGGER apis_category_count_delete_trigger
+    AFTER DELETE ON apis_product REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_category_count_delete();
+
+CREATE TRIGGER apis_category_count_update_trigger
+    AFTER UPDATE ON apis_product REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_category_count_update();
+
+UPDATE apis_category c SET product_count = (
+    SELECT count(*) FROM apis_product p WHERE p.category_id = c.id
+);
+"""
+
+DROP_PRODUCT_COUNT_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS apis_category_count_update_trigger ON apis_product;
+DROP TRIGGER IF EXISTS apis_category_count_delete_trigger ON apis_product;
+DROP TRIGGER IF EXISTS apis_category_count_insert_trigger ON apis_product;
+DROP FUNCTION IF EXISTS apis_category_count_update();
+DROP FUNCTION IF EXISTS apis_category_count_delete();
+DROP FUNCTION IF EXISTS apis_category_count_insert();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0009_product_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(PRODUCT_COUNT_TRIGGER_SQL, DROP_PRODUCT_COUNT_TRIGGER_SQL),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0014_order_stripe_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='coupon',
+            name='used_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
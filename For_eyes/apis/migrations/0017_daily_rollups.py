@@ -0,0 +1,76 @@
+# Generated by Django 4.2 on 2026-10-18 17:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+
+def backfill_rollups(apps, schema_editor):
+    from apis.rollups import REBUILD_SQL
+
+    Order = apps.get_model('apis', 'Order')
+    last_id = Order.objects.order_by('-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return
+    params = {'tz': settings.TIME_ZONE, 'start': 0, 'end': last_id}
+    with schema_editor.connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql, params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0016_order_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('payment_method', models.CharField(max_length=10)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='apis.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyorderrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'payment_method'), name='dailyorderrollup_key'),
+        ),
+        migrations.AddField(
+            model_name='dailycategoryrollup',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='apis.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='dailyproductrollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategoryrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='dailycategoryrollup_key'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
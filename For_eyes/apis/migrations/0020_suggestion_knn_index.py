@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 18:24
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0019_rollup_deltas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchsuggestion',
+            name='suggestion_trgm_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchsuggestion',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['normalized'], name='suggestion_trgm_gist_idx', opclasses=['gist_trgm_ops(siglen=64)']),
+        ),
+        migrations.AddIndex(
+            model_name='searchsuggestion',
+            index=models.Index(fields=['kind'], name='suggestion_kind_idx'),
+        ),
+    ]
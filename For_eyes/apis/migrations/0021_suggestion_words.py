@@ -0,0 +1,113 @@
+# Generated by Django 4.2 on 2026-10-18 18:51
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# Statement-level triggers with transition tables, like the category counts
+# in 0010: a bulk insert of suggestions is one grouped upsert of its words.
+# A suggestion counts once for each distinct word in its normalized term.
+SUGGESTION_WORDS_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION apis_suggestion_words_change() RETURNS trigger AS $$
+DECLARE
+    touched text[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        WITH changed AS (
+            UPDATE apis_suggestionword w SET
+                product_uses = greatest(w.product_uses - d.products, 0),
+                other_uses = greatest(w.other_uses - d.others, 0)
+            FROM (
+                SELECT word, count(*) FILTER (WHERE kind = 'product') AS products,
+                       count(*) FILTER (WHERE kind <> 'product') AS others
+                FROM (SELECT DISTINCT o.id, o.kind, t.word FROM old_rows o,
+                      regexp_split_to_table(o.normalized, ' ') AS t(word)) words
+                WHERE word ~ '[^0-9]'
+                GROUP BY word
+            ) d
+            WHERE w.word = d.word
+            RETURNING w.word
+        )
+        SELECT coalesce(array_agg(word), '{}') INTO touched FROM changed;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO apis_suggestionword AS w (word, product_uses, other_uses)
+        SELECT word, count(*) FILTER (WHERE kind = 'product'), count(*) FILTER (WHERE kind <> 'product')
+        FROM (SELECT DISTINCT n.id, n.kind, t.word FROM new_rows n,
+              regexp_split_to_table(n.normalized, ' ') AS t(word)) words
+        WHERE word ~ '[^0-9]'
+        GROUP BY word
+        ORDER BY word
+        ON CONFLICT (word) DO UPDATE SET
+            product_uses = w.product_uses + excluded.product_uses,
+            other_uses = w.other_uses + excluded.other_uses;
+    END IF;
+
+    DELETE FROM apis_suggestionword WHERE word = ANY(touched) AND product_uses = 0 AND other_uses = 0;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apis_suggestion_words_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM apis_suggestionword;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER apis_suggestion_words_insert_trigger
+    AFTER INSERT ON apis_searchsuggestion REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_suggestion_words_change();
+
+CREATE TRIGGER apis_suggestion_words_delete_trigger
+    AFTER DELETE ON apis_searchsuggestion REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_suggestion_words_change();
+
+CREATE TRIGGER apis_suggestion_words_update_trigger
+    AFTER UPDATE ON apis_searchsuggestion REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_suggestion_words_change();
+
+CREATE TRIGGER apis_suggestion_words_truncate_trigger
+    AFTER TRUNCATE ON apis_searchsuggestion
+    FOR EACH STATEMENT EXECUTE FUNCTION apis_suggestion_words_truncate();
+
+INSERT INTO apis_suggestionword (word, product_uses, other_uses)
+SELECT word, count(*) FILTER (WHERE kind = 'product'), count(*) FILTER (WHERE kind <> 'product')
+FROM (SELECT DISTINCT s.id, s.kind, t.word FROM apis_searchsuggestion s,
+      regexp_split_to_table(s.normalized, ' ') AS t(word)) words
+WHERE word ~ '[^0-9]'
+GROUP BY word;
+"""
+
+DROP_SUGGESTION_WORDS_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS apis_suggestion_words_truncate_trigger ON apis_searchsuggestion;
+DROP TRIGGER IF EXISTS apis_suggestion_words_update_trigger ON apis_searchsuggestion;
+DROP TRIGGER IF EXISTS apis_suggestion_words_delete_trigger ON apis_searchsuggestion;
+DROP TRIGGER IF EXISTS apis_suggestion_words_insert_trigger ON apis_searchsuggestion;
+DROP FUNCTION IF EXISTS apis_suggestion_words_truncate();
+DROP FUNCTION IF EXISTS apis_suggestion_words_change();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0020_suggestion_knn_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionWord',
+            fields=[
+                ('word', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('product_uses', models.PositiveIntegerField(default=0, editable=False)),
+                ('other_uses', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='suggestionword',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['word'], name='suggestion_word_trgm_idx', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.RunSQL(SUGGESTION_WORDS_TRIGGER_SQL, DROP_SUGGESTION_WORDS_TRIGGER_SQL),
+    ]
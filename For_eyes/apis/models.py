@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import connection, models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
 from decimal import Decimal
 from django.conf import settings
+from django.utils import timezone
 
 # Create your models here.
 
@@ -16,15 +19,45 @@ class HeroSlide(models.Model):
         return f"{self.title}"
     
 
-class Category(models.Model):
+class DatabaseManagedFieldsMixin(models.Model):
+    """
+    For models with columns only the database writes (conditional UPDATEs,
+    triggers). Saving an instance loaded from the database leaves those
+    columns out of the UPDATE, so a stale in-memory value can never be
+    written back over a concurrent change. New rows insert as usual, and
+    deferred fields stay unwritten, as in a plain save().
+    """
+    db_managed_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.db_managed_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class Category(DatabaseManagedFieldsMixin):
     name = models.CharField(max_length=100, unique=True)  
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Maintained by database triggers on apis_product (see migration 0010);
+    # `manage.py reconcile_category_counts` repairs any drift.
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+
+    db_managed_fields = ('product_count',)
 
     def __str__(self):
         return self.name
 
-class Product(models.Model):
+class Product(DatabaseManagedFieldsMixin):
     GENDER_CHOICES = [
     ('M', 'Men'),
     ('F', 'Women'),
@@ -32,6 +65,8 @@ class Product(models.Model):
     ]
 
     name = models.CharField(max_length=200)
+    # Supplier's SKU; catalog imports (`manage.py import_catalog`) upsert on it.
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     description = models.TextField()
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     model = models.FileField(upload_to='products/', blank=True, null=True)
@@ -40,6 +75,13 @@ class Product(models.Model):
 
     price = models.DecimalField(max_digits=10, decimal_places=2) 
     stock = models.PositiveIntegerField(default=0) 
+    # Units held by unexpired card checkouts (see apis.inventory). Written only
+    # by conditional UPDATEs, so it is never saved from a loaded instance.
+    reserved = models.PositiveIntegerField(default=0, editable=False)
+    # Flash-sale mode: when > 0 the stock lives in this many StockStripe rows
+    # instead, so concurrent checkouts don't all queue on this row.
+    # Changed with `manage.py set_stock_stripes`.
+    stock_stripes = models.PositiveSmallIntegerField(default=0, editable=False)
 
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
 
@@ -53,10 +95,67 @@ class Product(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Weighted full-text document, maintained by a database trigger
+    # (see migration 0006) so bulk writes keep it current too.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    db_managed_fields = ('reserved', 'stock_stripes')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on these (see apis.pagination)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            # Facet filters on the product listing (see apis.filters)
+            GinIndex(fields=['frame_material'], name='product_material_gin_idx'),
+            GinIndex(fields=['color'], name='product_color_gin_idx'),
+            models.Index(fields=['brand'], name='product_brand_idx'),
+            # products/changes/ feed
+            models.Index(fields=['updated_at', 'id'], name='product_updated_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.category.name}"  
 
+    @property
+    def available_stock(self):
+        if hasattr(self, 'available'):
+            return self.available
+        if not self.stock_stripes:
+            return max(self.stock - self.reserved, 0)
+        totals = self.stripes.aggregate(stock=models.Sum('stock'), reserved=models.Sum('reserved'))
+        return max(self.stock + (totals['stock'] or 0) - self.reserved - (totals['reserved'] or 0), 0)
+
+
+class StockStripe(models.Model):
+    """
+    One slice of a striped product's stock. Checkouts take from a random
+    stripe, and the product's stock is the sum over its stripes (see
+    apis.inventory).
+    """
+    product = models.ForeignKey(Product, related_name='stripes', on_delete=models.CASCADE)
+    index = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='stockstripe_product_index_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} stripe {self.index}: {self.stock - self.reserved} available"
+
+class ProductDeletion(models.Model):
+    """Tombstone for a deleted product, so products/changes/ can report it."""
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Product #{self.product_id} deleted at {self.deleted_at}"
+
 class Order(models.Model):
     PAYMENT_METHODS = [
         ('cod', 'Cash on Delivery'),
@@ -73,13 +172,32 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHODS, default='cod')
 
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default="Pending")
 
+    # Stripe Checkout Session for card orders, reused until it expires
+    stripe_session_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_session_url = models.URLField(max_length=1000, blank=True, null=True)
+    stripe_session_expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # my-orders/ pages (see apis.pagination.OrderPagination)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.name}"
 
+    @classmethod
+    def next_id(cls):
+        """Reserves the next primary key, so order_number can be set on insert."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [cls._meta.db_table])
+            return cursor.fetchone()[0]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey('Product', on_delete=models.PROTECT)
@@ -91,6 +209,25 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} (x{self.quantity})"
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for an unpaid card order until `expires_at`. The held units
+    are also counted in Product.reserved; the Stripe webhook turns the hold
+    into a sale and `manage.py release_expired_reservations` gives it back,
+    as does deleting the order (see apis.signals).
+    """
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    # Set when the units are held on a stripe rather than the product row
+    stripe = models.ForeignKey(StockStripe, null=True, blank=True, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order #{self.order_id}"
     
 # models.py
 
@@ -129,7 +266,7 @@ class Favourite(models.Model):
         return f"{self.user.email} - {self.product.name}"
 
 
-class Coupon(models.Model):
+class Coupon(DatabaseManagedFieldsMixin):
     code = models.CharField(max_length=50, unique=True)
     discount = models.CharField(max_length=100)  # e.g., "20% off" or "$10 off"
     discount_type = models.CharField(max_length=20, choices=[('percentage', 'Percentage'), ('fixed', 'Fixed')])
@@ -138,8 +275,176 @@ class Coupon(models.Model):
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     max_uses = models.PositiveIntegerField(null=True, blank=True)
-    used_count = models.PositiveIntegerField(default=0)
+    # Only ever changed by UPDATEs in apis.coupons
+    used_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    db_managed_fields = ('used_count',)
+
+    def __str__(self):
+        return self.code
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of verified Stripe events, keyed by Stripe's event id so a
+    redelivered event is stored once. `manage.py process_webhooks` works
+    through the pending ones (see apis.webhooks).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhookevent_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
+
+
+class SearchSuggestion(models.Model):
+    """
+    Precomputed autocomplete terms (product names, brands, categories).
+    Kept small and matched with pg_trgm, so suggest/ never touches Product.
+    The GiST index serves nearest-first trigram lookups over the many
+    product rows, for words already resolved against SuggestionWord;
+    brands and categories are few and found by kind.
+    """
+    KIND_CHOICES = [
+        ('product', 'Product'),
+        ('brand', 'Brand'),
+        ('category', 'Category'),
+    ]
+
+    key = models.CharField(max_length=255, unique=True)  # e.g. "product:12", "brand:Ray-Ban"
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=200)
+    normalized = models.CharField(max_length=200)  # lowercase, punctuation stripped ("rayban")
+    object_id = models.BigIntegerField(null=True, blank=True)
+    product_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=['normalized'], opclasses=['gist_trgm_ops(siglen=64)'], name='suggestion_trgm_gist_idx'),
+            models.Index(fields=['kind'], name='suggestion_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.term}"
+
+
+class SuggestionWord(models.Model):
+    """
+    Every word of the suggestion terms (all-digit words left out), with how
+    many product and other suggestions use it. A few thousand rows at most,
+    so suggest() resolves typed words here, by prefix or nearest trigram
+    match, before it searches the suggestions themselves.
+    """
+    word = models.CharField(max_length=200, primary_key=True)
+    # Maintained by database triggers on apis_searchsuggestion (see
+    # migration 0021); rebuild_suggestions() repairs any drift.
+    product_uses = models.PositiveIntegerField(default=0, editable=False)
+    other_uses = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=['word'], opclasses=['gist_trgm_ops'], name='suggestion_word_trgm_idx'),
+        ]
+
+    def __str__(self):
+        return self.word
+
+
+class DailyOrderRollup(models.Model):
+    """
+    Orders and revenue per day, status and payment method, kept current by
+    apis.rollups so the analytics dashboard never scans Order.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    payment_method = models.CharField(max_length=10)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'payment_method'], name='dailyorderrollup_key'),
+        ]
+
     def __str__(self):
-        return self.code
\ No newline at end of file
+        return f"{self.day} {self.status}/{self.payment_method}: {self.orders} orders"
+
+
+class DailyProductRollup(models.Model):
+    """Units sold and revenue per day and product (see apis.rollups)."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='dailyproductrollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id}: {self.units} units"
+
+
+class DailyCategoryRollup(models.Model):
+    """Units sold and revenue per day and category, by the product's category at the time of sale."""
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='dailycategoryrollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} category {self.category_id}: {self.units} units"
+
+
+class OrderRollupDelta(models.Model):
+    """
+    A pending change to DailyOrderRollup. Order writes only append these,
+    so checkouts never contend for the shared rollup rows;
+    apis.rollups.fold_rollups adds them in.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    payment_method = models.CharField(max_length=10)
+    orders = models.IntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ProductRollupDelta(models.Model):
+    """A pending change to DailyProductRollup (see OrderRollupDelta)."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    units = models.IntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CategoryRollupDelta(models.Model):
+    """A pending change to DailyCategoryRollup (see OrderRollupDelta)."""
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    units = models.IntegerField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
@@ -0,0 +1,199 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision, which DjangoJSONEncoder truncates."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the last row of the previous page
+    instead of using OFFSET, so deep pages cost the same as the first one.
+
+    Every ordering ends with 'id' as a tie-breaker and all of its fields run
+    in the same direction, which lets Postgres walk a composite
+    (field, id) index. The cursor is an opaque base64 token holding the
+    ordering name and the sort values of the last row (or, for the
+    `previous` link, of the first row, walking the index backwards).
+
+    Example: /apis/products/?ordering=price&page_size=24&cursor=<token>
+    """
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+    default_ordering = '-created_at'
+
+    invalid_cursor_message = 'Invalid cursor'
+    previous_marker = 'prev'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.ordering_name = self.get_ordering_name(request)
+        fields = self.orderings[self.ordering_name]
+        values, backwards = self.decode_cursor(request)
+        if backwards:
+            fields = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in fields)
+
+        queryset = queryset.order_by(*fields)
+        if queryset._fields:
+            # values() rows need the sort columns to build the next cursor.
+            missing = [f.lstrip('-') for f in fields if f.lstrip('-') not in queryset._fields]
+            if missing:
+                queryset = queryset.values(*queryset._fields, *missing)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(fields, values))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells us whether a page exists beyond this one.
+        rows = list(queryset[:self.limit + 1])
+        more = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        if backwards:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, values is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering_name(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        if name in self.orderings:
+            return name
+        return self.default_ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.link(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.link(self.page[0], backwards=True)
+
+    def link(self, row, backwards=False):
+        fields = self.orderings[self.ordering_name]
+        values = [self.get_value(row, field.lstrip('-')) for field in fields]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values, backwards))
+
+    def get_value(self, row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    def seek_filter(self, fields, values):
+        """
+        Rows strictly after `values` in the given ordering, expanded as
+        (f1 > v1) OR (f1 = v1 AND f2 > v2) ... The leading f1 >= v1 keeps
+        the condition sargable as a plain index range.
+        """
+        names = [field.lstrip('-') for field in fields]
+        op = 'lt' if fields[0].startswith('-') else 'gt'
+        lead = 'lte' if op == 'lt' else 'gte'
+
+        condition = Q()
+        for i, name in enumerate(names):
+            equal = {names[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{name}__{op}': values[i]})
+        return Q(**{f'{names[0]}__{lead}': values[0]}) & condition
+
+    def encode_cursor(self, values, backwards=False):
+        cursor = [self.ordering_name, values] + ([self.previous_marker] if backwards else [])
+        payload = json.dumps(cursor, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        """(sort values, backwards) from the cursor parameter, (None, False) without one."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        fields = self.orderings[self.ordering_name]
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            ordering_name, values, *direction = json.loads(base64.urlsafe_b64decode(padded))
+            valid = (
+                ordering_name == self.ordering_name
+                and direction in ([], [self.previous_marker])
+                and isinstance(values, list)
+                and len(values) == len(fields)
+                and all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values)
+            )
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(direction)
+
+
+class SearchPagination(KeysetPagination):
+    """Search results default to relevance, using the `rank` annotation."""
+    page_size = 20
+    orderings = {
+        'relevance': ('-rank', '-id'),
+        **KeysetPagination.orderings,
+    }
+    default_ordering = 'relevance'
+
+
+class ChangesPagination(KeysetPagination):
+    """The products/changes/ feed, oldest change first."""
+    page_size = 100
+    max_page_size = 500
+    orderings = {
+        'updated_at': ('updated_at', 'id'),
+    }
+    default_ordering = 'updated_at'
+
+
+class OrderPagination(KeysetPagination):
+    """my-orders/, newest first; seeks on the (user, created_at, id) index."""
+    page_size = 10
+    max_page_size = 50
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+    }
+    default_ordering = '-created_at'
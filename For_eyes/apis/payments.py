@@ -0,0 +1,132 @@
+import functools
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import stripe
+from django.conf import settings
+from django.utils import timezone
+
+from .inventory import hold_for_checkout
+from .models import Order
+
+# A stored session is handed out again only if it stays open at least this long.
+SESSION_REUSE_MARGIN = timedelta(minutes=5)
+# Stripe accepts session expiries 30 minutes to 24 hours ahead; the extra
+# minute absorbs clock skew.
+SESSION_TTL = timedelta(minutes=31)
+# Stock holds outlive their session by this much, so a payment made at the
+# last moment is still covered when its webhook is processed.
+HOLD_GRACE = timedelta(minutes=10)
+
+
+@functools.cache
+def get_stripe_client():
+    """
+    The process-wide Stripe client. Its RequestsClient keeps a pooled
+    keep-alive session per thread and applies settings.STRIPE_TIMEOUT, so
+    no call pays for a new TLS handshake or waits forever, and no global
+    stripe.api_key is set. Call get_stripe_client.cache_clear() after
+    changing the STRIPE_* settings.
+    """
+    base_addresses = {'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        http_client=stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT),
+        base_addresses=base_addresses,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+    )
+
+
+def open_session(order):
+    """
+    (id, url) of the order's stored Checkout Session if it is still open
+    and the order's stock is still held, else None. `order` carries the
+    earliest expiry of its holds as `holds_until` (None without holds).
+    """
+    reuse_until = timezone.now() + SESSION_REUSE_MARGIN
+    if (
+        order.stripe_session_url
+        and order.stripe_session_expires_at
+        and order.stripe_session_expires_at > reuse_until
+        and order.holds_until is not None
+        and order.holds_until > reuse_until
+    ):
+        return order.stripe_session_id, order.stripe_session_url
+    return None
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+def _line_items(order, items):
+    """
+    One Stripe line per order item, or, for an order with a discount, a
+    single line for its discounted total, so the customer pays what the
+    order says.
+    """
+    if order.discount_amount:
+        summary = ', '.join(f"{item['quantity']} x {item['product__name']}" for item in items)
+        return [{
+            'price_data': {
+                'currency': 'usd',  # change as needed
+                'product_data': {
+                    'name': f"Order {order.order_number}",
+                    'description': f"{summary} ({order.discount_code}: -{order.discount_amount})",
+                },
+                'unit_amount': _cents(order.total_amount),
+            },
+            'quantity': 1,
+        }]
+    return [
+        {
+            'price_data': {
+                'currency': 'usd',  # change as needed
+                'product_data': {
+                    'name': item['product__name'],
+                },
+                'unit_amount': _cents(item['price']),  # cents
+            },
+            'quantity': item['quantity'],
+        }
+        for item in items
+    ]
+
+
+def start_checkout_session(order):
+    """
+    Creates a Checkout Session for the order and stores it on the order.
+    The session expires after SESSION_TTL, and the order's stock holds are
+    extended (or taken again, raising InsufficientStock) to outlast it, so
+    a customer is never sent to pay for stock that is no longer held. The
+    idempotency key is tied to the session it replaces, so concurrent
+    double-clicks get the same session from Stripe while an expired
+    session still gets a fresh one.
+    """
+    items = list(order.items.values('product_id', 'product__name', 'price', 'quantity').order_by('id'))
+    expires_at = timezone.now() + SESSION_TTL
+    hold_for_checkout(order, items, expires_at + HOLD_GRACE)
+
+    line_items = _line_items(order, items)
+
+    session = get_stripe_client().v1.checkout.sessions.create(
+        params={
+            'payment_method_types': ['card'],
+            'line_items': line_items,
+            'mode': 'payment',
+            'success_url': f"http://localhost:5173/payment-success?session_id={{CHECKOUT_SESSION_ID}}&order_id={order.id}",
+            'cancel_url': f"http://localhost:5173/payment-cancel?order_id={order.id}",
+            'metadata': {'order_id': str(order.id)},
+            'expires_at': int(expires_at.timestamp()),
+        },
+        options={'idempotency_key': f"checkout-order-{order.id}-after-{order.stripe_session_id or 'none'}"},
+    )
+
+    order.stripe_session_id = session.id
+    order.stripe_session_url = session.url
+    order.stripe_session_expires_at = datetime.fromtimestamp(session.expires_at, tz=dt_timezone.utc)
+    Order.objects.filter(id=order.id).update(
+        stripe_session_id=order.stripe_session_id,
+        stripe_session_url=order.stripe_session_url,
+        stripe_session_expires_at=order.stripe_session_expires_at,
+    )
+    return session.id, session.url
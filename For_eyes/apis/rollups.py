@@ -0,0 +1,212 @@
+"""
+Daily rollups behind the analytics dashboard. Order writes never touch the
+rollup tables: each one appends its deltas to the *RollupDelta tables
+(plain INSERTs, so concurrent checkouts have no shared row to wait on),
+and fold_rollups adds the pending deltas into the rollups in one short
+transaction of its own. The analytics views fold before they read, and
+`manage.py fold_rollups` can run periodically to keep the backlog small.
+
+New orders are recorded by OrderSerializer.create; status, payment method
+and total changes, and deletions, by the Order signals in apis.signals.
+Anything written around those paths (bulk loads, raw SQL) is picked up by
+`manage.py rebuild_rollups`.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Order, Product
+
+# Advisory lock serialising fold_rollups and rebuild_rollups
+ROLLUP_LOCK = 0x4e011ab
+
+INSERT_ORDERS_SQL = "INSERT INTO apis_orderrollupdelta (day, status, payment_method, orders, revenue) VALUES {values}"
+INSERT_PRODUCTS_SQL = "INSERT INTO apis_productrollupdelta (day, product_id, units, revenue) VALUES {values}"
+INSERT_CATEGORIES_SQL = "INSERT INTO apis_categoryrollupdelta (day, category_id, units, revenue) VALUES {values}"
+
+# Each statement moves every pending delta into the rollups, in key order
+FOLD_SQL = [
+    """
+    WITH moved AS (DELETE FROM apis_orderrollupdelta RETURNING day, status, payment_method, orders, revenue)
+    INSERT INTO apis_dailyorderrollup (day, status, payment_method, orders, revenue)
+    SELECT day, status, payment_method, sum(orders), sum(revenue) FROM moved
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    ON CONFLICT (day, status, payment_method) DO UPDATE SET
+        orders = apis_dailyorderrollup.orders + EXCLUDED.orders,
+        revenue = apis_dailyorderrollup.revenue + EXCLUDED.revenue
+    """,
+    """
+    WITH moved AS (DELETE FROM apis_productrollupdelta RETURNING day, product_id, units, revenue)
+    INSERT INTO apis_dailyproductrollup (day, product_id, units, revenue)
+    SELECT day, product_id, sum(units), sum(revenue) FROM moved
+    GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        units = apis_dailyproductrollup.units + EXCLUDED.units,
+        revenue = apis_dailyproductrollup.revenue + EXCLUDED.revenue
+    """,
+    """
+    WITH moved AS (DELETE FROM apis_categoryrollupdelta RETURNING day, category_id, units, revenue)
+    INSERT INTO apis_dailycategoryrollup (day, category_id, units, revenue)
+    SELECT day, category_id, sum(units), sum(revenue) FROM moved
+    GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (day, category_id) DO UPDATE SET
+        units = apis_dailycategoryrollup.units + EXCLUDED.units,
+        revenue = apis_dailycategoryrollup.revenue + EXCLUDED.revenue
+    """,
+]
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _insert(sql, rows):
+    if not rows:
+        return '', []
+    placeholders = ', '.join('(' + ', '.join(['%s'] * len(rows[0])) + ')' for _ in rows)
+    return sql.format(values=placeholders), [value for row in rows for value in row]
+
+
+def _write(order_rows=(), product_rows=(), category_rows=()):
+    """Appends all the deltas in one round trip."""
+    statements, params = [], []
+    for sql, rows in (
+        (INSERT_ORDERS_SQL, list(order_rows)),
+        (INSERT_PRODUCTS_SQL, list(product_rows)),
+        (INSERT_CATEGORIES_SQL, list(category_rows)),
+    ):
+        statement, statement_params = _insert(sql, rows)
+        if statement:
+            statements.append(statement)
+            params += statement_params
+    if statements:
+        with connection.cursor() as cursor:
+            cursor.execute(';'.join(statements), params)
+
+
+def _item_rows(day, items, categories, sign):
+    """Per-product and per-category deltas for items with product_id/quantity/price."""
+    products, by_category = defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0])
+    for item in items:
+        revenue = item['price'] * item['quantity']
+        for totals in (products[item['product_id']], by_category[categories[item['product_id']]]):
+            totals[0] += sign * item['quantity']
+            totals[1] += sign * revenue
+    return (
+        [(day, product_id, units, revenue) for product_id, (units, revenue) in products.items()],
+        [(day, category_id, units, revenue) for category_id, (units, revenue) in by_category.items()],
+    )
+
+
+def record_new_order(order, items, categories):
+    """
+    Adds a just-placed order. `items` are dicts with product_id, quantity
+    and price, `categories` maps each product id to its category id.
+    """
+    day = order_day(order)
+    product_rows, category_rows = _item_rows(day, items, categories, 1)
+    _write(
+        order_rows=[(day, order.status, order.payment_method, 1, order.total_amount)],
+        product_rows=product_rows,
+        category_rows=category_rows,
+    )
+
+
+def record_order_change(order, previous):
+    """
+    Moves an order between rollup rows after its status, payment method
+    or total changed. `previous` holds the stored values before the save.
+    """
+    day = order_day(order)
+    old = (day, previous['status'], previous['payment_method'], -1, -previous['total_amount'])
+    new = (day, order.status, order.payment_method, 1, order.total_amount)
+    if old[1:3] == new[1:3]:
+        rows = [(day, order.status, order.payment_method, 0, order.total_amount - previous['total_amount'])]
+    else:
+        rows = [old, new]
+    _write(order_rows=rows)
+
+
+def record_deleted_order(order, items):
+    """Takes out an order being deleted, along with its items."""
+    day = order_day(order)
+    categories = dict(
+        Product.objects.filter(id__in={item['product_id'] for item in items}).values_list('id', 'category_id')
+    )
+    product_rows, category_rows = _item_rows(day, items, categories, -1)
+    _write(
+        order_rows=[(day, order.status, order.payment_method, -1, -order.total_amount)],
+        product_rows=product_rows,
+        category_rows=category_rows,
+    )
+
+
+def fold_rollups():
+    """Adds every committed pending delta into the rollups, in one round trip and transaction."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(';'.join(['SELECT pg_advisory_xact_lock(%s)', *FOLD_SQL]), [ROLLUP_LOCK])
+
+
+REBUILD_SQL = [
+    """
+    INSERT INTO apis_dailyorderrollup (day, status, payment_method, orders, revenue)
+    SELECT (o.created_at AT TIME ZONE %(tz)s)::date, o.status, o.payment_method, count(*), sum(o.total_amount)
+    FROM apis_order o
+    WHERE o.id > %(start)s AND o.id <= %(end)s
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, status, payment_method) DO UPDATE SET
+        orders = apis_dailyorderrollup.orders + EXCLUDED.orders,
+        revenue = apis_dailyorderrollup.revenue + EXCLUDED.revenue
+    """,
+    """
+    INSERT INTO apis_dailyproductrollup (day, product_id, units, revenue)
+    SELECT (o.created_at AT TIME ZONE %(tz)s)::date, i.product_id, sum(i.quantity), sum(i.quantity * i.price)
+    FROM apis_orderitem i JOIN apis_order o ON o.id = i.order_id
+    WHERE o.id > %(start)s AND o.id <= %(end)s
+    GROUP BY 1, 2
+    ON CONFLICT (day, product_id) DO UPDATE SET
+        units = apis_dailyproductrollup.units + EXCLUDED.units,
+        revenue = apis_dailyproductrollup.revenue + EXCLUDED.revenue
+    """,
+    """
+    INSERT INTO apis_dailycategoryrollup (day, category_id, units, revenue)
+    SELECT (o.created_at AT TIME ZONE %(tz)s)::date, p.category_id, sum(i.quantity), sum(i.quantity * i.price)
+    FROM apis_orderitem i
+    JOIN apis_order o ON o.id = i.order_id
+    JOIN apis_product p ON p.id = i.product_id
+    WHERE o.id > %(start)s AND o.id <= %(end)s
+    GROUP BY 1, 2
+    ON CONFLICT (day, category_id) DO UPDATE SET
+        units = apis_dailycategoryrollup.units + EXCLUDED.units,
+        revenue = apis_dailycategoryrollup.revenue + EXCLUDED.revenue
+    """,
+]
+
+
+def rebuild_rollups(chunk_size=50_000, progress=None):
+    """
+    Recomputes every rollup from Order and OrderItem, `chunk_size` orders
+    per pass so no single statement sorts the whole history. Runs in one
+    transaction with order writes blocked, so the rollups and the incremental
+    updates can't disagree; readers keep seeing the old rollups until commit.
+    Past sales are attributed to the product's current category.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ROLLUP_LOCK])
+        cursor.execute('LOCK TABLE apis_order, apis_orderitem IN SHARE MODE')
+        # The pending deltas are all for orders the rebuild counts anyway
+        for table in (
+            'apis_dailyorderrollup', 'apis_dailyproductrollup', 'apis_dailycategoryrollup',
+            'apis_orderrollupdelta', 'apis_productrollupdelta', 'apis_categoryrollupdelta',
+        ):
+            cursor.execute(f'DELETE FROM {table}')
+
+        last_id = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        for start in range(0, last_id, chunk_size):
+            params = {'tz': settings.TIME_ZONE, 'start': start, 'end': start + chunk_size}
+            for sql in REBUILD_SQL:
+                cursor.execute(sql, params)
+            if progress:
+                progress(min(start + chunk_size, last_id), last_id)
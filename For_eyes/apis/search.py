@@ -0,0 +1,34 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+from .models import Product
+
+SEARCH_CONFIG = 'english'
+
+
+def build_search_query(text):
+    """
+    Turns free text into a prefix tsquery ("ray ban" -> 'ray:* & ban:*'),
+    so results keep matching while the user is still typing a word.
+    Returns None when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    raw = ' & '.join(f"'{word}':*" for word in words)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_products_queryset(text):
+    """Products matching `text`, annotated with a relevance `rank`."""
+    query = build_search_query(text)
+    if query is None:
+        return Product.objects.none().annotate(rank=Value(0.0, output_field=FloatField()))
+
+    # Cast the float4 rank to float8 so it survives the JSON cursor round trip exactly.
+    return Product.objects.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
@@ -1,5 +1,11 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils.encoding import iri_to_uri
+from .coupons import CouponError, find_coupon, price_coupon, redeem_coupon
+from .inventory import InsufficientStock, decrement_stock, order_quantities, reserve_stock
+from .rollups import record_new_order
 from .models import Product, Category, HeroSlide, Order, OrderItem, Coupon, Favourite, Address
 
 class HeroSlideSerializer(serializers.ModelSerializer):
@@ -13,6 +19,51 @@ class ProductCardSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'price', 'image', 'tag', 'is_AR']
 
+
+# Fast read-only path for product cards. DRF's field machinery dominates
+# list endpoints, so these render plain values() rows into exactly the
+# dicts ProductCardSerializer would produce.
+
+CARD_FIELDS = ProductCardSerializer.Meta.fields
+
+
+def media_url_builder(request, storage):
+    """
+    Returns name -> absolute media URL, matching ImageField output but
+    resolving the scheme and host once instead of per row.
+    """
+    if request is None:
+        return lambda name: storage.url(name) if name else None
+
+    scheme_host = f"{request.scheme}://{request.get_host()}"
+
+    def build(name):
+        if not name:
+            return None
+        location = storage.url(name)
+        if (location.startswith('/') and not location.startswith('//')
+                and '/./' not in location and '/../' not in location):
+            return iri_to_uri(scheme_host + location)
+        return request.build_absolute_uri(location)
+    return build
+
+
+def render_product_cards(rows, request=None, prefix=''):
+    """
+    Renders values() rows as ProductCardSerializer data. `prefix` reads the
+    columns through a relation, e.g. 'product__' for favourites.
+    """
+    price = ProductCardSerializer().fields['price'].to_representation
+    image_url = media_url_builder(request, Product._meta.get_field('image').storage)
+    return [{
+        'id': row[f'{prefix}id'],
+        'name': row[f'{prefix}name'],
+        'price': price(row[f'{prefix}price']),
+        'image': image_url(row[f'{prefix}image']),
+        'tag': row[f'{prefix}tag'],
+        'is_AR': row[f'{prefix}is_AR'],
+    } for row in rows]
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     category = serializers.StringRelatedField()
     stock_status = serializers.SerializerMethodField()
@@ -26,11 +77,15 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_stock_status(self, obj):
-        if obj.stock <= 0:
-            return "Out of stock"
-        elif obj.stock <= 5:
-            return "Low stock"
-        return "In stock"
+        return stock_status(obj.available_stock)
+
+
+def stock_status(stock):
+    if stock <= 0:
+        return "Out of stock"
+    elif stock <= 5:
+        return "Low stock"
+    return "In stock"
 
 class CategorySerializer(serializers.ModelSerializer):
     count = serializers.IntegerField(source='product_count', read_only=True)
@@ -40,10 +95,18 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'image', 'count']
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    # A plain id; OrderSerializer.validate_items checks all of them in one query
+    # instead of one lookup per line.
+    product = serializers.IntegerField(source='product_id')
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity', 'price']
 
+def order_subtotal(items):
+    return sum((item['price'] * item['quantity'] for item in items), Decimal('0'))
+
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
@@ -51,50 +114,80 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             'id', 'name', 'email', 'phone', 'address', 'instructions',
-            'discount_code', 'payment_method', 'items', 'total_amount', 'status', 'created_at'
+            'discount_code', 'payment_method', 'items', 'total_amount', 'discount_amount',
+            'status', 'created_at'
         ]
-        read_only_fields = ['status', 'created_at']
+        read_only_fields = ['status', 'created_at', 'discount_amount']
+
+    def validate_items(self, items):
+        ids = {item['product_id'] for item in items}
+        # product id -> category id, kept for the daily rollups
+        self._categories = dict(Product.objects.filter(id__in=ids).values_list('id', 'category_id'))
+        missing = ids - self._categories.keys()
+        if missing:
+            raise serializers.ValidationError(
+                f'Invalid pk "{min(missing)}" - object does not exist.'
+            )
+        return items
+
+    def validate(self, attrs):
+        # Price the discount code against the active coupons (cached, no query)
+        code = (attrs.get('discount_code') or '').strip()
+        attrs['discount_code'] = code or None
+        if code:
+            try:
+                coupon = find_coupon(code)
+                attrs['discount_amount'] = price_coupon(coupon, order_subtotal(attrs['items']))
+            except CouponError as e:
+                raise serializers.ValidationError({'discount_code': [str(e)]})
+            attrs['discount_code'] = coupon['code']
+            attrs['coupon'] = coupon
+        return attrs
 
     def create(self, validated_data):
+        """
+        Places the order in a fixed number of queries: the order row (with
+        its order_number, from a pre-allocated id), one bulk insert for the
+        items, one conditional stock UPDATE for every line, which sells
+        the stock for COD and puts a timed hold on it for card payments,
+        and one round trip appending the daily rollup deltas.
+        """
         items_data = validated_data.pop('items')
+        coupon = validated_data.pop('coupon', None)
         payment_method = validated_data.get('payment_method', 'cod')
 
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             validated_data['user'] = request.user
 
-        order = Order.objects.create(**validated_data)
-
-        order.order_number = f"ORD-{order.id:06d}"
-
-        total = 0
-        for item in items_data:
-            product = item['product']
-            quantity = item['quantity']
-            price = item['price']
-
-            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=price)
-            total += price * quantity
-
-        order.total_amount = total
-
+        validated_data['total_amount'] = order_subtotal(items_data) - validated_data.get('discount_amount', 0)
+        validated_data['is_paid'] = False
         if payment_method == 'card':
-            order.status = 'Awaiting Payment'
-            order.is_paid = False
+            validated_data['status'] = 'Awaiting Payment'
         else:
             # for COD, confirm immediately and deduct stock
-            order.status = 'Confirmed'
-            order.is_paid = False
-
-            for oi in order.items.all():
-                product = oi.product
-                if product.stock < oi.quantity:
-                    raise serializers.ValidationError(f"Not enough stock for {product.name}")
-                product.stock -= oi.quantity
-                product.save()
-
-
-        order.save()
+            validated_data['status'] = 'Confirmed'
+
+        order_id = Order.next_id()
+        order = Order.objects.create(id=order_id, order_number=f"ORD-{order_id:06d}", **validated_data)
+        OrderItem.objects.bulk_create([OrderItem(order=order, **item) for item in items_data])
+
+        if coupon is not None:
+            try:
+                redeem_coupon(coupon)
+            except CouponError as e:
+                raise serializers.ValidationError({'discount_code': [str(e)]})
+
+        try:
+            if payment_method == 'card':
+                # Released by the webhook on payment or by the sweeper on expiry
+                reserve_stock(order, order_quantities(items_data))
+            else:
+                decrement_stock(order_quantities(items_data))
+        except InsufficientStock as e:
+            raise serializers.ValidationError(str(e))
+
+        record_new_order(order, items_data, self._categories)
         return order
     
 
@@ -122,6 +215,17 @@ class FavouriteSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
+def render_favourites(rows, request=None):
+    """FavouriteSerializer data for values('id', 'created_at', 'product__<card field>'...) rows."""
+    created_at = FavouriteSerializer().fields['created_at'].to_representation
+    cards = render_product_cards(rows, request, prefix='product__')
+    return [{
+        'id': row['id'],
+        'product': card,
+        'created_at': created_at(row['created_at']),
+    } for row, card in zip(rows, cards)]
+
+
 class CouponSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coupon
@@ -148,4 +252,13 @@ class OrderListSerializer(serializers.ModelSerializer):
             'total_amount', 'status', 'payment_method', 'is_paid',
             'created_at', 'items'
         ]
-        read_only_fields = ['created_at']
\ No newline at end of file
+        read_only_fields = ['created_at']
+
+
+class OrderSummarySerializer(OrderListSerializer):
+    """An order without its items, for my-orders/?view=summary."""
+    items = None
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta(OrderListSerializer.Meta):
+        fields = [name for name in OrderListSerializer.Meta.fields if name != 'items'] + ['item_count']
\ No newline at end of file
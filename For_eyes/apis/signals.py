@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .coupons import invalidate_active_coupons
+from .inventory import release_reservations
+from .models import Category, Coupon, HeroSlide, Order, Product, ProductDeletion
+from .rollups import record_deleted_order, record_order_change
+from .suggestions import refresh_suggestions
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_product(sender, instance, raw=False, **kwargs):
+    """Stash the stored brand/category so post_save can refresh what it moved away from."""
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Product.objects.filter(pk=instance.pk).values('brand', 'category_id').first()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None) or {}
+    refresh_suggestions(
+        product_ids=[instance.pk],
+        brands=[instance.brand, previous.get('brand')],
+        category_ids=filter(None, [instance.category_id, previous.get('category_id')]),
+    )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    ProductDeletion.objects.create(product_id=instance.pk)
+    refresh_suggestions(
+        product_ids=[instance.pk],
+        brands=[instance.brand],
+        category_ids=[instance.category_id],
+    )
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_suggestions(category_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    refresh_suggestions(category_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=HeroSlide)
+@receiver(post_delete, sender=HeroSlide)
+def catalog_changed(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, **kwargs):
+    invalidate_active_coupons()
+
+
+ROLLUP_FIELDS = ('status', 'payment_method', 'total_amount')
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_order(sender, instance, raw=False, **kwargs):
+    """Stash the stored status/payment method/total so post_save can move the order in the rollups."""
+    instance._previous = None
+    if not instance._state.adding and not raw:
+        instance._previous = Order.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    # New orders are added by OrderSerializer.create, together with their items.
+    previous = getattr(instance, '_previous', None)
+    if created or raw or previous is None:
+        return
+    if any(previous[field] != getattr(instance, field) for field in ROLLUP_FIELDS):
+        record_order_change(instance, previous)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    record_deleted_order(instance, list(instance.items.values('product_id', 'quantity', 'price')))
+    # The cascade would drop the holds without giving their units back.
+    # Also runs for the orders of a deleted user.
+    release_reservations(instance.reservations.all())
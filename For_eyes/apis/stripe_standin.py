@@ -0,0 +1,108 @@
+"""
+A minimal local stand-in for the Stripe API, enough to create Checkout
+Sessions without network access. Used by the tests and by
+`manage.py bench_checkout_session`.
+"""
+import json
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _amount_total(params):
+    """Sum of unit_amount * quantity over the form-encoded line_items."""
+    total, line = 0, 0
+    while f'line_items[{line}][quantity]' in params:
+        quantity = int(params[f'line_items[{line}][quantity]'][0])
+        total += int(params[f'line_items[{line}][price_data][unit_amount]'][0]) * quantity
+        line += 1
+    return total
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        params = parse_qs(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode())
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path != '/v1/checkout/sessions':
+            return self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+
+        key = self.headers.get('Idempotency-Key')
+        with self.server.lock:
+            self.server.requests += 1
+            if key in self.server.params and self.server.params[key] != params:
+                return self._send(400, {'error': {
+                    'type': 'idempotency_error',
+                    'message': 'Keys for idempotent requests can only be used with the same parameters they were first used with.',
+                }})
+            session = self.server.sessions.get(key)
+            if session is None:
+                session_id = f"cs_test_{uuid.uuid4().hex}"
+                session = {
+                    'id': session_id,
+                    'object': 'checkout.session',
+                    'url': f"https://checkout.stripe.test/c/pay/{session_id}",
+                    'expires_at': int(params['expires_at'][0]) if 'expires_at' in params else int(time.time()) + 24 * 60 * 60,
+                    'amount_total': _amount_total(params),
+                    'status': 'open',
+                }
+                if key:
+                    self.server.sessions[key] = session
+                    self.server.params[key] = params
+        self._send(200, session)
+
+    def _send(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StripeStandIn(ThreadingHTTPServer):
+    """
+    Serves POST /v1/checkout/sessions on 127.0.0.1, replaying the same
+    session for a repeated Idempotency-Key, or answering 400 like Stripe
+    if the key comes back with different parameters. Counts API requests
+    and TCP connections, and can add `latency` seconds to every response.
+
+        with StripeStandIn() as standin:
+            settings.STRIPE_API_BASE = standin.url
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.params = {}  # by Idempotency-Key
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
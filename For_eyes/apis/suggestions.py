@@ -0,0 +1,161 @@
+import re
+
+from django.contrib.postgres.search import TrigramDistance, TrigramWordDistance, TrigramWordSimilarity
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import Category, Product, SearchSuggestion, SuggestionWord
+
+
+def normalize_term(text):
+    """'Ray-Ban Aviator!' -> 'rayban aviator'; what suggestions are matched on."""
+    text = re.sub(r'[^\w\s]', '', (text or '').lower())
+    return ' '.join(text.split())
+
+
+def _row(kind, key, term, object_id=None, product_count=0):
+    return {
+        'key': f"{kind}:{key}",
+        'kind': kind,
+        'term': term,
+        'normalized': normalize_term(term),
+        'object_id': object_id,
+        'product_count': product_count,
+    }
+
+
+def build_suggestion_rows():
+    """Every suggestion row for the current catalog."""
+    rows = [
+        _row('product', pk, name, object_id=pk)
+        for pk, name in Product.objects.values_list('id', 'name').iterator()
+    ]
+    brand_counts = (
+        Product.objects.exclude(brand__isnull=True).exclude(brand='')
+        .values_list('brand').annotate(n=Count('id'))
+    )
+    rows += [_row('brand', brand, brand, product_count=n) for brand, n in brand_counts]
+    categories = Category.objects.annotate(n=Count('products')).values_list('id', 'name', 'n')
+    rows += [_row('category', pk, name, object_id=pk, product_count=n) for pk, name, n in categories]
+    return rows
+
+
+def _upsert(rows):
+    SearchSuggestion.objects.bulk_create(
+        [SearchSuggestion(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=['key'],
+        update_fields=['kind', 'term', 'normalized', 'object_id', 'product_count'],
+    )
+
+
+def refresh_suggestions(product_ids=(), brands=(), category_ids=()):
+    """
+    Incrementally rebuilds the suggestion rows for the given products,
+    brands and categories. Rows whose source is gone are deleted.
+    """
+    product_ids, brands, category_ids = set(product_ids), set(filter(None, brands)), set(category_ids)
+    rows = []
+    stale = []
+
+    if product_ids:
+        found = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'name'))
+        rows += [_row('product', pk, name, object_id=pk) for pk, name in found.items()]
+        stale += [f"product:{pk}" for pk in product_ids - found.keys()]
+
+    if brands:
+        counts = dict(
+            Product.objects.filter(brand__in=brands).values_list('brand').annotate(n=Count('id'))
+        )
+        rows += [_row('brand', brand, brand, product_count=n) for brand, n in counts.items()]
+        stale += [f"brand:{brand}" for brand in brands - counts.keys()]
+
+    if category_ids:
+        found = {
+            pk: (name, n) for pk, name, n in
+            Category.objects.filter(id__in=category_ids)
+            .annotate(n=Count('products')).values_list('id', 'name', 'n')
+        }
+        rows += [_row('category', pk, name, object_id=pk, product_count=n) for pk, (name, n) in found.items()]
+        stale += [f"category:{pk}" for pk in category_ids - found.keys()]
+
+    if rows:
+        _upsert(rows)
+    if stale:
+        SearchSuggestion.objects.filter(key__in=stale).delete()
+
+
+def rebuild_suggestions():
+    """Replaces the whole suggestion table from the catalog."""
+    with transaction.atomic():
+        SearchSuggestion.objects.all().delete()
+        SearchSuggestion.objects.bulk_create(
+            (SearchSuggestion(**row) for row in build_suggestion_rows()), batch_size=2000
+        )
+
+
+def _product_uses(prefix):
+    """The most product suggestions using any word that starts with `prefix`, or None if no word does."""
+    return SuggestionWord.objects.filter(word__startswith=prefix).aggregate(uses=Max('product_uses'))['uses']
+
+
+def resolve_words(words):
+    """
+    Maps typed words onto the suggestion vocabulary (SuggestionWord), one
+    B-tree prefix lookup per word. A word that starts some entry is kept as
+    typed; otherwise it is joined onto the previous word if that starts an
+    entry ("ray ban" -> "rayban"), or replaced by the nearest entry by
+    trigram similarity ("clubmster" -> "clubmaster"). All-digit words and
+    words like nothing known are kept as typed. Returns the words and
+    whether any product suggestion can contain them.
+    """
+    resolved, in_products = [], False
+    for word in words:
+        if word.isdigit():
+            resolved.append(word)
+            in_products = True
+            continue
+        uses = _product_uses(word)
+        if uses is None and resolved and not resolved[-1].isdigit():
+            joined_uses = _product_uses(resolved[-1] + word)
+            if joined_uses is not None:
+                word, uses = resolved.pop() + word, joined_uses
+        if uses is None:
+            nearest = (
+                SuggestionWord.objects.filter(word__trigram_similar=word)
+                .order_by(TrigramDistance('word', word)).values_list('word', 'product_uses').first()
+            )
+            if nearest:
+                word, uses = nearest
+        resolved.append(word)
+        in_products = in_products or bool(uses)
+    return resolved, in_products
+
+
+def suggest(text, limit=8):
+    """
+    Top suggestions for a prefix or misspelled fragment ("rayban", "aviater"),
+    best trigram word similarity first, then the most popular. The typed
+    words are first resolved against the small word vocabulary (see
+    resolve_words), so the suggestion table is only searched for words it
+    contains: any prefix of two or more characters of a contained word is
+    word-similar enough to match, and product rows then come nearest-first
+    off the GiST index after a handful of rows, however many products share
+    the word. Brands and categories are few and all considered. See
+    `manage.py bench_suggest` for timings.
+    """
+    normalized = normalize_term(text)
+    if len(normalized) < 2:
+        return []
+    words, in_products = resolve_words(normalized.split())
+    normalized = ' '.join(words)
+
+    matches = SearchSuggestion.objects.filter(normalized__trigram_word_similar=normalized).annotate(
+        similarity=TrigramWordSimilarity(normalized, 'normalized')
+    ).values('kind', 'term', 'object_id', 'similarity', 'product_count')
+    ranked = matches.filter(kind__in=['brand', 'category'])
+    if in_products:
+        products = matches.filter(kind='product').order_by(TrigramWordDistance(normalized, 'normalized'))[:limit]
+        ranked = products.union(ranked, all=True)
+    ranked = ranked.order_by('-similarity', '-product_count', 'term')[:limit]
+    return [{'kind': row['kind'], 'term': row['term'], 'object_id': row['object_id']} for row in ranked]
@@ -1,3 +1,1674 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from django.conf import settings
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+import stripe
+
+from .admin_views import DASHBOARD_CACHE_KEY, dashboard_context
+from .benchmark import bench_environment, make_context, routes, run_scenarios, scenarios
+from .cache import get_catalog_version
+from .datagen import generate_dataset
+from .filters import facet_counts
+from .inventory import InsufficientStock, available_stock, convert_reservations, set_stock_stripes
+from .metrics import registry
+from .models import Category, Coupon, DailyCategoryRollup, DailyOrderRollup, DailyProductRollup, Favourite, HeroSlide, Order, OrderItem, OrderRollupDelta, Product, SearchSuggestion, StockReservation, StockStripe, SuggestionWord, WebhookEvent
+from .payments import HOLD_GRACE, SESSION_TTL, get_stripe_client
+from .rollups import fold_rollups
+from .serializers import CARD_FIELDS, FavouriteSerializer, ProductCardSerializer, render_favourites, render_product_cards
+from .stripe_standin import StripeStandIn
+from .suggestions import rebuild_suggestions, refresh_suggestions
+from .views import MAX_BATCH_IDS
+from .webhooks import HANDLERS, MAX_ATTEMPTS, NEEDS_REFUND, handle_checkout_completed, process_pending_events, record_event
+
+
+def order_payload(*lines, payment_method='cod'):
+    return {
+        'name': 'Test Customer',
+        'email': 'customer@example.com',
+        'phone': '0300',
+        'address': '1 Test Street',
+        'payment_method': payment_method,
+        'items': [
+            {'product': product.id, 'quantity': quantity, 'price': str(product.price)}
+            for product, quantity in lines
+        ],
+    }
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Frame {i}', description='d', price=[50, 20, 20, 20, 80, 20, 10][i], stock=1, category=category)
+            for i in range(7)
+        ])
+        # Everything but the first two created in the same instant, so ties fall back to id
+        Product.objects.exclude(id__in=[p.id for p in self.products[:2]]).update(created_at=timezone.now())
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, url):
+        """All pages from `url` following `next`, then back again following `previous`."""
+        pages = [self.page(url)]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        back = [pages[-1]]
+        while back[-1]['previous']:
+            back.append(self.page(back[-1]['previous']))
+        ids = lambda page: [row['id'] for row in page['results']]
+        return [ids(page) for page in pages], [ids(page) for page in reversed(back)]
+
+    def test_pages_forwards_and_backwards_with_ties(self):
+        ids = [p.id for p in self.products]
+        by_price = [p.id for p in sorted(self.products, key=lambda p: (p.price, p.id))]
+        for ordering, expected in [
+            ('-created_at', ids[:1:-1] + [ids[1], ids[0]]),
+            ('price', by_price),
+            ('-price', by_price[::-1]),
+        ]:
+            with self.subTest(ordering=ordering):
+                forwards, backwards = self.walk(f'/apis/products/?ordering={ordering}&page_size=2')
+                self.assertEqual(forwards, [expected[i:i + 2] for i in range(0, 7, 2)])
+                self.assertEqual(backwards, forwards)
+
+    def test_first_page_has_no_previous_link_and_last_page_no_next(self):
+        first = self.page('/apis/products/?page_size=4')
+        self.assertIsNone(first['previous'])
+        self.assertIn('facets', first)
+        last = self.page(first['next'])
+        self.assertIsNone(last['next'])
+        self.assertEqual(len(last['results']), 3)
+        # Back to the first page, which again carries the facets
+        self.assertIn('facets', self.page(last['previous']))
+
+    def test_cursor_is_tied_to_its_ordering(self):
+        next_link = self.page('/apis/products/?ordering=price&page_size=2')['next']
+        cursor = parse_qs(urlsplit(next_link).query)['cursor'][0]
+        self.assertEqual(self.client.get(f'/apis/products/?ordering=-price&cursor={cursor}').status_code, 404)
+
+    def test_tampered_cursors_are_not_found(self):
+        def token(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        for cursor in [
+            'not-base64!', token('text'), token(5), token({'a': 1}), token(['-created_at', 5]),
+            token(['-created_at', {'created_at': 1, 'id': 2}]), token(['-created_at', [None, 1]]),
+            token(['-created_at', [True, 1]]), token(['-created_at', ['yesterday', 1]]),
+            token(['-created_at', ['2026-01-01T00:00:00+00:00', 'one']]),
+            token(['-created_at', ['2026-01-01T00:00:00+00:00', 1], 'sideways']),
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'/apis/products/?cursor={cursor}').status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Sunglasses')
+
+    def create(self, name, description='Plain frame'):
+        return Product.objects.create(name=name, description=description, price=100, stock=1, category=self.category)
+
+    def search(self, q, **params):
+        response = self.client.get('/apis/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_empty_queries_return_an_empty_page(self):
+        self.create('Holbrook')
+        for q in ('', '   ', '!!'):
+            with self.subTest(q=q):
+                self.assertEqual(self.search(q), {'next': None, 'previous': None, 'results': []})
+
+    def test_trigger_keeps_the_search_vector_current(self):
+        product = self.create('Holbrook')
+        self.assertEqual([row['id'] for row in self.search('holbr')['results']], [product.id])
+
+        product.name = 'Frogskins'
+        product.save()
+        self.assertEqual(self.search('holbrook')['results'], [])
+        self.assertEqual([row['id'] for row in self.search('frog')['results']], [product.id])
+
+    def test_name_matches_rank_above_description_matches(self):
+        in_description = self.create('Classic frame', 'Shaped like an aviator')
+        in_name = self.create('Aviator')
+        self.assertEqual([row['id'] for row in self.search('aviat')['results']], [in_name.id, in_description.id])
+        self.assertEqual([row['id'] for row in self.search('aviator shaped')['results']], [in_description.id])
+
+    def test_relevance_pages_do_not_overlap(self):
+        for i in range(5):
+            self.create(f'Round {i}')
+            self.create(f'Frame {i}', 'A round frame')
+
+        seen, page = [], self.search('round', page_size=3)
+        while True:
+            seen += [row['id'] for row in page['results']]
+            if not page['next']:
+                break
+            page = self.client.get(page['next']).json()
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        names = dict(Product.objects.values_list('id', 'name'))
+        self.assertTrue(all(names[pk].startswith('Round') for pk in seen[:5]))
+
+
+class SearchSuggestionTests(TestCase):
+    def setUp(self):
+        self.sunglasses = Category.objects.create(name='Sunglasses')
+        for name, brand in [('Ray-Ban Aviator Classic', 'Ray-Ban'), ('Ray-Ban Wayfarer', 'Ray-Ban'), ('Oakley Holbrook', 'Oakley')]:
+            Product.objects.create(name=name, brand=brand, description='d', price=100, stock=1, category=self.sunglasses)
+
+    def suggest(self, q):
+        response = self.client.get('/apis/search/suggest/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(row['kind'], row['term']) for row in response.json()]
+
+    def test_ranks_exact_words_then_popularity_and_tolerates_typos(self):
+        self.assertEqual(self.suggest('rayban')[:3], [
+            ('brand', 'Ray-Ban'), ('product', 'Ray-Ban Aviator Classic'), ('product', 'Ray-Ban Wayfarer'),
+        ])
+        self.assertEqual(self.suggest('aviater'), [('product', 'Ray-Ban Aviator Classic')])
+        self.assertEqual(self.suggest('sungl'), [('category', 'Sunglasses')])
+        self.assertEqual(self.suggest('a'), [])
+
+    def test_resolves_typed_words_against_the_vocabulary(self):
+        self.assertEqual(self.suggest('ray ban')[:2], [('brand', 'Ray-Ban'), ('product', 'Ray-Ban Aviator Classic')])
+        self.assertEqual(self.suggest('ray-ban wayfarr'), [('product', 'Ray-Ban Wayfarer')])
+        self.assertEqual(self.suggest('holbrok'), [('product', 'Oakley Holbrook')])
+        self.assertEqual(self.suggest('xyzzy'), [])
+
+    def test_rows_follow_product_changes(self):
+        holbrook = Product.objects.get(name='Oakley Holbrook')
+        holbrook.name, holbrook.brand = 'Persol Steve McQueen', 'Persol'
+        holbrook.save()
+        self.assertEqual(self.suggest('oakley'), [])
+        self.assertEqual(self.suggest('persol')[0], ('brand', 'Persol'))
+
+        Product.objects.filter(brand='Ray-Ban').first().delete()
+        self.assertEqual(SearchSuggestion.objects.get(kind='brand', term='Ray-Ban').product_count, 1)
+
+    def test_triggers_keep_the_word_counts(self):
+        def words():
+            return {word: (products, others) for word, products, others in SuggestionWord.objects.values_list(
+                'word', 'product_uses', 'other_uses'
+            )}
+
+        self.assertEqual(words(), {
+            'rayban': (2, 1), 'aviator': (1, 0), 'classic': (1, 0), 'wayfarer': (1, 0),
+            'oakley': (1, 1), 'holbrook': (1, 0), 'sunglasses': (0, 1),
+        })
+
+        Product.objects.filter(name='Oakley Holbrook').update(name='Oakley Holbrook 2')
+        refresh_suggestions(product_ids=Product.objects.values_list('id', flat=True), brands=['Oakley'])
+        Product.objects.filter(name='Ray-Ban Wayfarer').delete()
+        expected = {
+            'rayban': (1, 1), 'aviator': (1, 0), 'classic': (1, 0),
+            'oakley': (1, 1), 'holbrook': (1, 0), 'sunglasses': (0, 1),
+        }
+        self.assertEqual(words(), expected)
+
+        rebuild_suggestions()
+        self.assertEqual(words(), expected)
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE apis_searchsuggestion')
+        self.assertEqual(words(), {})
+
+    def test_benchmark_reports_the_latency_goal(self):
+        out = StringIO()
+        call_command('bench_suggest', '--products', '500', '--repeat', '2', '--query', 'aviater', stdout=out)
+        self.assertIn("'aviater': ", out.getvalue())
+        self.assertIn('goal p99 < 10 ms', out.getvalue())
+        self.assertEqual(Product.objects.count(), 3)
+
+
+class ProductCardRenderingTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        Product.objects.bulk_create([
+            Product(name='Aviator', description='d', price='100.00', stock=12, category=category,
+                    image='products/aviator.jpg', tag='New', is_AR=True),
+            Product(name='Round "Gold"', description='d', price='19.99', stock=0, category=category,
+                    image='', tag=None),
+            Product(name='Cafe & Noir', description='d', price='0.50', stock=3, category=category,
+                    image='products/cafe frame (1)+50%.png', tag='Sale'),
+        ])
+        self.user = get_user_model().objects.create_user(email='fan@example.com', password='pw')
+        Favourite.objects.bulk_create([Favourite(user=self.user, product=product) for product in Product.objects.all()])
+
+    def test_fast_path_matches_the_serializer_byte_for_byte(self):
+        renderer = JSONRenderer()
+        products = Product.objects.order_by('id')
+        for request in (APIRequestFactory().get('/apis/products/', HTTP_HOST='testserver:8000'), None):
+            with self.subTest(request=request):
+                self.assertEqual(
+                    renderer.render(render_product_cards(products.values(*CARD_FIELDS), request)),
+                    renderer.render(ProductCardSerializer(products, many=True, context={'request': request}).data),
+                )
+
+    def test_favourites_fast_path_matches_the_serializer(self):
+        request = APIRequestFactory().get('/apis/my-favourites/')
+        favourites = Favourite.objects.filter(user=self.user).order_by('id')
+        rows = favourites.values('id', 'created_at', *[f'product__{field}' for field in CARD_FIELDS])
+        self.assertEqual(
+            JSONRenderer().render(render_favourites(rows, request)),
+            JSONRenderer().render(FavouriteSerializer(favourites, many=True, context={'request': request}).data),
+        )
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.products = [
+            Product.objects.create(name=name, description='d', price='10.00', stock=stock, category=category)
+            for name, stock in [('Aviator', 20), ('Reader', 3), ('Round', 0)]
+        ]
+        self.ids = [product.id for product in self.products]
+
+    def post(self, body):
+        return self.client.post('/apis/products/batch/', body, content_type='application/json')
+
+    def test_get_keeps_the_requested_order_and_lists_missing_ids(self):
+        aviator, reader, round_ = self.ids
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/apis/products/batch/?ids={round_},{aviator},999999,{reader},{aviator}')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([(row['id'], row['stock_status']) for row in body['results']], [
+            (round_, 'Out of stock'), (aviator, 'In stock'), (reader, 'Low stock'),
+        ])
+        self.assertEqual(body['missing'], [999999])
+        self.assertEqual(set(body['results'][0]), set(CARD_FIELDS) | {'stock_status'})
+
+    def test_post_returns_detail_rows(self):
+        response = self.post({'ids': self.ids[::-1], 'view': 'detail'})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([row['id'] for row in results], self.ids[::-1])
+        self.assertEqual((results[0]['category'], results[0]['description']), ('Sunglasses', 'd'))
+
+    def test_bad_ids_and_bodies_are_rejected(self):
+        for response in [
+            self.client.get('/apis/products/batch/?ids=1,two'),
+            self.client.get('/apis/products/batch/?ids=-1'),
+            self.client.get(f'/apis/products/batch/?ids={2 ** 63}'),
+            self.post({'ids': 5}),
+            self.post({'ids': [1, None]}),
+            self.post([1, 2]),
+            self.post('ids'),
+        ]:
+            with self.subTest(request=response.request.get('QUERY_STRING')):
+                self.assertEqual(response.status_code, 400)
+
+    def test_batch_size_is_limited(self):
+        self.assertEqual(self.post({'ids': list(range(1, MAX_BATCH_IDS + 1))}).status_code, 200)
+        response = self.post({'ids': list(range(1, MAX_BATCH_IDS + 2))})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(MAX_BATCH_IDS), response.json()['error'])
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        sunglasses = Category.objects.create(name='Sunglasses')
+        eyeglasses = Category.objects.create(name='Eyeglasses')
+        self.a, self.b, self.c, self.d = Product.objects.bulk_create([
+            Product(name='A', description='d', price='100.00', stock=1, category=sunglasses, brand='Ray-Ban',
+                    gender='M', frame_material=['Metal'], color=['Black', 'Gold']),
+            Product(name='B', description='d', price='50.00', stock=1, category=sunglasses, brand='Oakley',
+                    gender='F', frame_material=['Plastic'], color=['Black']),
+            Product(name='C', description='d', price='80.00', stock=1, category=eyeglasses, brand='Ray-Ban',
+                    gender='U', frame_material=['Metal', 'Acetate'], color=['Blue']),
+            Product(name='D', description='d', price='20.00', stock=1, category=eyeglasses, brand=None,
+                    gender='M', frame_material=[], color=['Black']),
+        ])
+
+    def ids(self, query):
+        response = self.client.get(f'/apis/products/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_filters(self):
+        a, b, c, d = (p.id for p in (self.a, self.b, self.c, self.d))
+        for query, expected in [
+            ('brand=Ray-Ban', {a, c}),
+            ('brand=Oakley&brand=Ray-Ban', {a, b, c}),
+            ('category=sunglasses', {a, b}),
+            ('color=Gold,Blue', {a, c}),
+            ('frame_material=Metal&gender=M', {a}),
+            ('min_price=50&max_price=90', {b, c}),
+            ('category=Sunglasses&color=Black', {a, b}),
+        ]:
+            with self.subTest(query=query):
+                self.assertEqual(self.ids(query), expected)
+        self.assertEqual(self.client.get('/apis/products/?min_price=cheap').status_code, 400)
+
+    def test_counts_without_filters(self):
+        facets = self.client.get('/apis/products/').json()['facets']
+
+        self.assertEqual(facets['category'], [{'value': 'Eyeglasses', 'count': 2}, {'value': 'Sunglasses', 'count': 2}])
+        self.assertEqual(facets['brand'], [{'value': 'Ray-Ban', 'count': 2}, {'value': 'Oakley', 'count': 1}])
+        self.assertEqual(
+            facets['color'],
+            [{'value': 'Black', 'count': 3}, {'value': 'Blue', 'count': 1}, {'value': 'Gold', 'count': 1}],
+        )
+        self.assertEqual(
+            facets['frame_material'],
+            [{'value': 'Metal', 'count': 2}, {'value': 'Acetate', 'count': 1}, {'value': 'Plastic', 'count': 1}],
+        )
+        self.assertEqual(facets['price'], {'min': '20.00', 'max': '100.00'})
+
+    def test_each_facet_ignores_only_its_own_filter(self):
+        query = QueryDict('brand=Ray-Ban&color=Black')
+        with self.assertNumQueries(1):
+            facets = facet_counts(query)
+
+        # Brands among the black frames, colors among the Ray-Bans
+        self.assertEqual(facets['brand'], [{'value': 'Oakley', 'count': 1}, {'value': 'Ray-Ban', 'count': 1}])
+        self.assertEqual(
+            facets['color'],
+            [{'value': 'Black', 'count': 1}, {'value': 'Blue', 'count': 1}, {'value': 'Gold', 'count': 1}],
+        )
+        # Every other facet sees both filters, which leave only A
+        self.assertEqual(facets['gender'], [{'value': 'M', 'count': 1}])
+        self.assertEqual(facets['category'], [{'value': 'Sunglasses', 'count': 1}])
+        self.assertEqual(facets['price'], {'min': '100.00', 'max': '100.00'})
+        self.assertEqual(self.ids('brand=Ray-Ban&color=Black'), {self.a.id})
+
+    def test_no_matches(self):
+        facets = facet_counts(QueryDict('brand=Nobody'))
+        self.assertEqual(facets['gender'], [])
+        self.assertEqual(facets['price'], {'min': None, 'max': None})
+        self.assertEqual(len(facets['brand']), 2)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=5, category=self.category, is_featured=True
+        )
+        HeroSlide.objects.create(title='Summer', subtitle='s', cta='Shop', image='hero_slides/summer.jpg')
+
+    def test_warm_cache_makes_no_queries(self):
+        for url in ('/apis/hero-slides/', '/apis/featured-products/', '/apis/categories/', '/apis/home/'):
+            with self.subTest(url=url):
+                cold = self.client.get(url)
+                with self.assertNumQueries(0):
+                    warm = self.client.get(url)
+                self.assertEqual(warm.status_code, 200)
+                self.assertEqual(warm.json(), cold.json())
+                self.assertEqual(warm['ETag'], cold['ETag'])
+
+    def test_writes_bump_the_catalog_version(self):
+        for url, write in [
+            ('/apis/featured-products/', lambda: Product.objects.get().save()),
+            ('/apis/categories/', lambda: Category.objects.create(name='Eyeglasses')),
+            ('/apis/hero-slides/', lambda: HeroSlide.objects.get().delete()),
+        ]:
+            with self.subTest(url=url):
+                before = self.client.get(url)
+                version = get_catalog_version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                    # Until the write commits, readers must not cache the old rows under a new version
+                    self.assertEqual(get_catalog_version(), version)
+                self.assertNotEqual(get_catalog_version(), version)
+                with CaptureQueriesContext(connection) as queries:
+                    after = self.client.get(url)
+                self.assertTrue(queries, 'a write must invalidate the cached payload')
+                self.assertEqual(after.status_code, 200)
+
+        self.assertEqual(len(self.client.get('/apis/categories/').json()), 2)
+        self.assertEqual(self.client.get('/apis/hero-slides/').json(), [])
+
+    def test_conditional_requests(self):
+        first = self.client.get('/apis/featured-products/')
+        self.assertEqual(first['Cache-Control'], f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}')
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get('/apis/featured-products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertEqual(not_modified.content, b'')
+
+        self.product.name = 'Aviator II'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        changed = self.client.get('/apis/featured-products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.json()[0]['name'], 'Aviator II')
+
+    def test_home_etag_covers_the_user_favourites(self):
+        user = get_user_model().objects.create_user(email='fan@example.com', password='pw')
+        client = APIClient()
+        client.force_authenticate(user)
+        first = client.get('/apis/home/')
+        self.assertEqual(first.json()['favourite_ids'], [])
+        self.assertEqual(client.get('/apis/home/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        Favourite.objects.create(user=user, product=self.product)
+        second = client.get('/apis/home/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['favourite_ids'], [self.product.id])
+
+    def test_changes_feed(self):
+        since = timezone.now()
+        created = Product.objects.create(name='Round', description='d', price='50.00', stock=1, category=self.category)
+        self.product.price = '90.00'
+        self.product.save()
+        deleted = Product.objects.create(name='Gone', description='d', price='5.00', stock=1, category=self.category)
+        deleted_id = deleted.id
+        deleted.delete()
+
+        response = self.client.get('/apis/products/changes/', {'since': since.isoformat(), 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [(row['id'], row['change']) for row in data['results']], [(created.id, 'created')]
+        )
+        self.assertEqual([row['product_id'] for row in data['deleted']], [deleted_id])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual([(row['id'], row['change']) for row in data['results']], [(self.product.id, 'updated')])
+        self.assertNotIn('deleted', data)
+        self.assertIsNone(data['next'])
+
+        self.assertEqual(self.client.get('/apis/products/changes/', {'since': 'yesterday'}).status_code, 400)
+
+
+class DatabaseManagedFieldsTests(TestCase):
+    def setUp(self):
+        self.sunglasses = Category.objects.create(name='Sunglasses')
+        self.eyeglasses = Category.objects.create(name='Eyeglasses')
+
+    def counts(self):
+        return dict(Category.objects.values_list('name', 'product_count'))
+
+    def product(self, category, name='Frame'):
+        return Product(name=name, description='d', price='10.00', stock=1, category=category)
+
+    def test_triggers_count_inserts_moves_and_deletes(self):
+        aviator = self.product(self.sunglasses)
+        aviator.save()
+        self.assertEqual(self.counts(), {'Sunglasses': 1, 'Eyeglasses': 0})
+
+        # One statement-level trigger run for a bulk insert
+        Product.objects.bulk_create([self.product(self.sunglasses) for _ in range(3)] + [self.product(self.eyeglasses)])
+        self.assertEqual(self.counts(), {'Sunglasses': 4, 'Eyeglasses': 1})
+
+        aviator.category = self.eyeglasses
+        aviator.save()
+        self.assertEqual(self.counts(), {'Sunglasses': 3, 'Eyeglasses': 2})
+
+        # A bulk UPDATE moving several rows, and one that touches no category
+        Product.objects.filter(category=self.sunglasses).update(category=self.eyeglasses)
+        Product.objects.update(price='12.00')
+        self.assertEqual(self.counts(), {'Sunglasses': 0, 'Eyeglasses': 5})
+
+        aviator.delete()
+        self.assertEqual(self.counts(), {'Sunglasses': 0, 'Eyeglasses': 4})
+        Product.objects.all().delete()
+        self.assertEqual(self.counts(), {'Sunglasses': 0, 'Eyeglasses': 0})
+
+    def test_saving_a_stale_instance_keeps_the_database_values(self):
+        stale_category = Category.objects.get(name='Sunglasses')
+        product = self.product(self.sunglasses)
+        product.save()
+        stale_product = Product.objects.get(id=product.id)
+        Product.objects.filter(id=product.id).update(reserved=1)
+        coupon = Coupon.objects.create(
+            code='SAVE', discount='$1 off', discount_type='fixed', discount_value=1,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        Coupon.objects.filter(id=coupon.id).update(used_count=5)
+
+        stale_category.description = 'Shades'
+        stale_category.save()
+        stale_product.name = 'Renamed'
+        stale_product.save()
+        coupon.is_active = False
+        coupon.save()
+
+        self.assertEqual(Category.objects.values_list('description', 'product_count').get(name='Sunglasses'), ('Shades', 1))
+        self.assertEqual(Product.objects.values_list('name', 'reserved').get(), ('Renamed', 1))
+        self.assertEqual(Coupon.objects.values_list('is_active', 'used_count').get(), (False, 5))
+
+    def test_new_row_with_an_explicit_pk_is_inserted(self):
+        Category(pk=9999, name='Lenses').save()
+        self.assertEqual(Category.objects.get(pk=9999).name, 'Lenses')
+
+    def test_deferred_fields_are_not_written(self):
+        self.product(self.sunglasses).save()
+        product = Product.objects.only('name').get()
+        product.name = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('"name"', update)
+        self.assertNotIn('"price"', update)
+        self.assertEqual(Product.objects.values_list('name', 'price').get(), ('Renamed', Decimal('10.00')))
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.aviator = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=5, category=category
+        )
+        self.round = Product.objects.create(
+            name='Round', description='d', price='50.00', stock=1, category=category
+        )
+
+    def place(self, payload):
+        return self.client.post('/apis/place-order/', payload, content_type='application/json')
+
+    def test_cod_order_decrements_stock_in_constant_queries(self):
+        # validate ids, reserve id, insert order, bulk insert items, one stock
+        # UPDATE, the rollups, plus the savepoints around them
+        with self.assertNumQueries(10):
+            response = self.place(order_payload((self.aviator, 2), (self.round, 1)))
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.json()['order_id'])
+        self.assertEqual(order.order_number, f"ORD-{order.id:06d}")
+        self.assertEqual(order.status, 'Confirmed')
+        self.assertEqual(str(order.total_amount), '250.00')
+        self.assertEqual(order.items.count(), 2)
+        self.aviator.refresh_from_db()
+        self.round.refresh_from_db()
+        self.assertEqual((self.aviator.stock, self.round.stock), (3, 0))
+
+    def test_short_line_rolls_back_whole_order(self):
+        response = self.place(order_payload((self.aviator, 2), (self.round, 2)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not enough stock for Round', response.json()['error'])
+        self.assertFalse(Order.objects.exists())
+        self.aviator.refresh_from_db()
+        self.assertEqual(self.aviator.stock, 5)
+
+    def test_card_order_holds_stock_until_paid(self):
+        response = self.place(order_payload((self.round, 1), payment_method='card'))
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.status, 'Awaiting Payment')
+        self.round.refresh_from_db()
+        self.assertEqual((self.round.stock, self.round.reserved, self.round.available_stock), (1, 1, 0))
+
+        # The held unit can't be sold to anyone else
+        response = self.place(order_payload((self.round, 1)))
+        self.assertEqual(response.status_code, 400)
+
+        convert_reservations(order)
+        self.round.refresh_from_db()
+        self.assertEqual((self.round.stock, self.round.reserved), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_expired_holds(self):
+        self.place(order_payload((self.aviator, 2), payment_method='card'))
+        self.place(order_payload((self.aviator, 1), payment_method='card'))
+        StockReservation.objects.filter(quantity=2).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        call_command('release_expired_reservations', batch_size=1, stdout=StringIO())
+
+        self.aviator.refresh_from_db()
+        self.assertEqual((self.aviator.stock, self.aviator.reserved), (5, 1))
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+    def test_paying_after_expiry_sells_from_available_stock(self):
+        self.place(order_payload((self.round, 1), payment_method='card'))
+        order = Order.objects.get()
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('release_expired_reservations', stdout=StringIO())
+        self.place(order_payload((self.round, 1)))
+
+        with self.assertRaises(InsufficientStock):
+            convert_reservations(order)
+
+    def test_unknown_product_is_rejected(self):
+        payload = order_payload((self.aviator, 1))
+        payload['items'][0]['product'] = 999999
+
+        response = self.place(payload)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json())
+
+
+class StripedStockTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Viral', description='d', price='10.00', stock=10, category=category
+        )
+        set_stock_stripes(self.product.id, 4)
+
+    def place(self, payload):
+        return self.client.post('/apis/place-order/', payload, content_type='application/json')
+
+    def stripe_stock(self):
+        return list(StockStripe.objects.filter(product=self.product).order_by('index').values_list('stock', flat=True))
+
+    def test_stock_is_split_and_summed(self):
+        self.assertEqual(self.stripe_stock(), [3, 3, 2, 2])
+        self.assertEqual(available_stock([self.product.id]), {self.product.id: 10})
+        response = self.client.get(f'/apis/products/{self.product.id}/')
+        self.assertEqual(response.json()['stock_status'], 'In stock')
+
+    def test_selling_out_invalidates_the_detail_etag(self):
+        url = f'/apis/products/{self.product.id}/'
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.assertEqual(self.place(order_payload((self.product, 10))).status_code, 201)
+
+        # updated_at didn't move, so only the ETag can tell
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        changed = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['stock_status'], 'Out of stock')
+
+    def test_checkout_takes_from_one_stripe(self):
+        before = self.stripe_stock()
+        response = self.place(order_payload((self.product, 2)))
+
+        self.assertEqual(response.status_code, 201)
+        changed = [old - new for old, new in zip(before, self.stripe_stock()) if old != new]
+        self.assertEqual(changed, [2])
+
+    def test_large_checkout_spreads_across_stripes(self):
+        response = self.place(order_payload((self.product, 9), payment_method='card'))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(available_stock([self.product.id]), {self.product.id: 1})
+        self.assertEqual(StockReservation.objects.count(), 4)
+
+        convert_reservations(Order.objects.get())
+        self.assertEqual(sum(self.stripe_stock()), 1)
+        self.assertFalse(StockStripe.objects.filter(reserved__gt=0).exists())
+
+    def test_merging_stripes_restores_product_stock(self):
+        self.place(order_payload((self.product, 3)))
+        set_stock_stripes(self.product.id, 0)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_stripes), (7, 0))
+        self.assertFalse(StockStripe.objects.exists())
+
+
+WEBHOOK_SECRET = 'whsec_test'
+FIXTURES = Path(__file__).resolve().parent / 'fixtures' / 'stripe'
+
+
+def signed_event(name, **values):
+    """A fixture event with placeholders filled in, and its Stripe-Signature header."""
+    payload = (FIXTURES / f'{name}.json').read_text()
+    for key, value in values.items():
+        payload = payload.replace(f'{{{key}}}', str(value))
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return payload, f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=3, category=category
+        )
+        response = self.client.post(
+            '/apis/place-order/', order_payload((self.product, 2), payment_method='card'),
+            content_type='application/json',
+        )
+        self.order = Order.objects.get(id=response.json()['order_id'])
+
+    def deliver(self, payload, signature):
+        return self.client.post(
+            '/apis/stripe-webhook/', payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+        )
+
+    def process(self):
+        call_command('process_webhooks', stdout=StringIO())
+
+    def test_event_is_stored_then_processed_once(self):
+        payload, signature = signed_event('checkout_session_completed', order_id=self.order.id)
+
+        self.assertEqual(self.deliver(payload, signature).status_code, 200)
+        self.assertEqual(self.deliver(payload, signature).status_code, 200)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+        self.assertEqual(WebhookEvent.objects.get().status, 'pending')
+
+        self.process()
+        self.process()
+
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.order.is_paid, self.order.status), (True, 'Confirmed'))
+        self.assertEqual((self.product.stock, self.product.reserved), (1, 0))
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('processed', 1))
+
+    def test_bad_signature_is_rejected(self):
+        payload, signature = signed_event('checkout_session_completed', order_id=self.order.id)
+
+        response = self.deliver(payload.replace('paid', 'unpaid'), signature)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failing_event_is_retried_with_backoff_then_failed(self):
+        payload, signature = signed_event('checkout_session_completed', order_id=999999)
+        self.deliver(payload, signature)
+
+        self.process()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertIn('DoesNotExist', event.last_error)
+
+        # Not due yet, so a second run leaves it alone
+        self.process()
+        self.assertEqual(WebhookEvent.objects.get().attempts, 1)
+
+        for _ in range(MAX_ATTEMPTS):
+            WebhookEvent.objects.update(next_attempt_at=timezone.now())
+            self.process()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('failed', MAX_ATTEMPTS))
+
+    def test_payment_after_the_stock_sold_out_flags_the_order_for_refund(self):
+        StockReservation.objects.update(expires_at=timezone.now())
+        call_command('release_expired_reservations', stdout=StringIO())
+        self.client.post('/apis/place-order/', order_payload((self.product, 2)), content_type='application/json')
+
+        self.deliver(*signed_event('checkout_session_completed', order_id=self.order.id))
+        self.process()
+
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.order.is_paid, self.order.status), (True, NEEDS_REFUND))
+        self.assertEqual((self.product.stock, self.product.reserved), (1, 0))
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+
+
+class OrderDeletionTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=3, category=category
+        )
+        self.user = get_user_model().objects.create_user(email='buyer@example.com', password='pw', name='Buyer')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/apis/place-order/', order_payload((self.product, 2), payment_method='card'), format='json')
+        self.order = Order.objects.get(id=response.json()['order_id'])
+
+    def test_deleting_an_order_releases_its_holds(self):
+        self.assertEqual(available_stock([self.product.id]), {self.product.id: 1})
+
+        self.order.delete()
+
+        self.assertEqual(available_stock([self.product.id]), {self.product.id: 3})
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_deleting_a_user_releases_their_orders_holds(self):
+        self.user.delete()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(available_stock([self.product.id]), {self.product.id: 3})
+
+    def test_holds_are_read_only_in_the_admin(self):
+        self.client.force_login(get_user_model().objects.create_superuser(email='admin@example.com', password='pw'))
+        hold = StockReservation.objects.get()
+
+        self.assertEqual(self.client.get(f'/admin/apis/stockreservation/{hold.id}/delete/').status_code, 403)
+        self.assertEqual(
+            self.client.post('/admin/apis/stockreservation/', {'action': 'delete_selected', '_selected_action': [hold.id]}).status_code,
+            200,
+        )
+        self.assertTrue(StockReservation.objects.exists())
+
+
+class MyOrdersTests(TestCase):
+    def test_pages_load_items_in_one_query(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator', description='d', price='10.00', stock=100, category=category
+        )
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(email='buyer@example.com', password='pw'))
+        for _ in range(12):
+            client.post('/apis/place-order/', order_payload((product, 1), (product, 2)), format='json')
+
+        with self.assertNumQueries(2):
+            first = client.get('/apis/my-orders/').json()
+        second = client.get(first['next']).json()
+
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['items'][0]['product_name'], 'Aviator')
+        ids = [order['id'] for order in first['results'] + second['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 12)
+        self.assertIsNone(second['next'])
+
+        with self.assertNumQueries(1):
+            summary = client.get('/apis/my-orders/?view=summary').json()
+        self.assertEqual(summary['results'][0]['item_count'], 2)
+        self.assertNotIn('items', summary['results'][0])
+
+
+class RollupTests(TestCase):
+    def rollups(self):
+        return {
+            model.__name__: sorted(
+                tuple(row) for row in model.objects.exclude(**{field: 0}).values_list(*columns)
+            )
+            for model, field, columns in (
+                (DailyOrderRollup, 'orders', ('day', 'status', 'payment_method', 'orders', 'revenue')),
+                (DailyProductRollup, 'units', ('day', 'product_id', 'units', 'revenue')),
+                (DailyCategoryRollup, 'units', ('day', 'category_id', 'units', 'revenue')),
+            )
+        }
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        sunglasses = Category.objects.create(name='Sunglasses')
+        eyeglasses = Category.objects.create(name='Eyeglasses')
+        aviator = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=50, category=sunglasses
+        )
+        reader = Product.objects.create(
+            name='Reader', description='d', price='40.00', stock=50, category=eyeglasses
+        )
+        for lines, method in [
+            (((aviator, 1), (reader, 2)), 'cod'),
+            (((aviator, 2),), 'card'),
+            (((reader, 1),), 'card'),
+        ]:
+            self.client.post(
+                '/apis/place-order/', order_payload(*lines, payment_method=method), content_type='application/json'
+            )
+
+        paid, cancelled = Order.objects.filter(payment_method='card').order_by('id')
+        paid.is_paid, paid.status = True, 'Confirmed'
+        paid.save()
+        Order.objects.get(payment_method='cod').delete()
+        cancelled.status = 'Cancelled'
+        cancelled.save()
+
+        # Checkouts and order saves only append deltas
+        self.assertEqual(DailyOrderRollup.objects.count(), 0)
+        self.assertEqual(OrderRollupDelta.objects.count(), 8)
+        fold_rollups()
+        self.assertEqual(OrderRollupDelta.objects.count(), 0)
+
+        incremental = self.rollups()
+        self.assertEqual(
+            [row[1:] for row in incremental['DailyOrderRollup']],
+            [('Cancelled', 'card', 1, Decimal('40.00')), ('Confirmed', 'card', 1, Decimal('200.00'))],
+        )
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_dashboard_reads_rollups(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=50, category=category
+        )
+        self.client.post('/apis/place-order/', order_payload((product, 3)), content_type='application/json')
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', password='pw')
+        self.client.force_login(admin)
+        cache.clear()
+
+        response = self.client.get('/admin-analytics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['order_stats']['total_revenue'], Decimal('300.00'))
+        self.assertEqual(response.context['best_sellers'][0]['total_sold'], 3)
+
+
+class AnalyticsDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Sunglasses')
+        for n in range(3):
+            product = Product.objects.create(
+                name=f'Frame {n}', description='d', price='100.00', stock=n * 4, category=category
+            )
+            if product.stock:
+                self.client.post('/apis/place-order/', order_payload((product, 1)), content_type='application/json')
+        self.client.force_login(get_user_model().objects.create_superuser(email='admin@example.com', password='pw'))
+
+    def test_query_count_and_timing(self):
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            context = dashboard_context()
+        elapsed = time.perf_counter() - start
+
+        # One query per figure: the headline numbers are two conditional aggregates.
+        # Plus folding in the pending rollup deltas, one statement in a savepoint.
+        self.assertEqual(len(queries), 13, [query['sql'] for query in queries])
+        self.assertLess(elapsed, 1.0, f"dashboard took {elapsed * 1000:.1f} ms")
+        self.assertEqual(context['order_stats']['total_orders'], 2)
+        self.assertEqual(context['order_stats']['confirmed_orders'], 2)
+        self.assertEqual(context['order_stats']['revenue_last_30_days'], Decimal('200.00'))
+        self.assertEqual(
+            {key: context['product_stats'][key] for key in ('total_products', 'low_stock', 'out_of_stock')},
+            {'total_products': 3, 'low_stock': 1, 'out_of_stock': 1},
+        )
+
+    def test_warm_cache_skips_the_analytics_queries(self):
+        self.client.get('/admin-analytics/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin-analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'rollup' in query['sql']])
+
+    def test_stale_context_is_served_while_one_refresh_runs(self):
+        self.client.get('/admin-analytics/')
+        entry = cache.get(DASHBOARD_CACHE_KEY)
+        cache.set(DASHBOARD_CACHE_KEY, {**entry, 'fresh_until': 0})
+
+        with mock.patch('apis.cache._refresher') as refresher:
+            responses = [self.client.get('/admin-analytics/') for _ in range(3)]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(responses[-1].context['order_stats']['total_orders'], 2)
+        refresher.submit.assert_called_once()
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        aviator = Product.objects.create(name='Aviator', description='d', price='100.00', stock=50, category=category)
+        reader = Product.objects.create(name='Reader', description='d', price='40.00', stock=50, category=category)
+        self.client.post(
+            '/apis/place-order/', order_payload((aviator, 1), (reader, 2)), content_type='application/json'
+        )
+        self.client.post('/apis/place-order/', order_payload((reader, 1)), content_type='application/json')
+        old = Order.objects.order_by('id').last()
+        Order.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+        self.client.force_login(get_user_model().objects.create_superuser(email='admin@example.com', password='pw'))
+
+    def test_csv_streams_one_row_per_item(self):
+        response = self.client.get('/admin-export/orders/')
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['product_name'], row['quantity']) for row in rows], [
+            ('Aviator', '1'), ('Reader', '2'), ('Reader', '1'),
+        ])
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        Order.objects.update(name='=HYPERLINK("http://evil.example","x")', phone='+923001234567', address='@SUM(A1)')
+        response = self.client.get('/admin-export/orders/')
+
+        row = next(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(
+            (row['name'], row['phone'], row['address'], row['total_amount']),
+            ('\'=HYPERLINK("http://evil.example","x")', "'+923001234567", "'@SUM(A1)", '180.00'),
+        )
+
+    def test_ndjson_nests_items_and_filters_by_date(self):
+        today = timezone.localdate().isoformat()
+        response = self.client.get(f'/admin-export/orders/?format=ndjson&from={today}&to={today}')
+
+        orders = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(orders), 1)
+        self.assertEqual(orders[0]['total_amount'], '180.00')
+        self.assertEqual([item['product_name'] for item in orders[0]['items']], ['Aviator', 'Reader'])
+
+    def test_command_uses_one_query(self):
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command('export_orders', '--format', 'ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class DumpRestoreTests(TestCase):
+    def snapshot(self):
+        tables = {
+            model._meta.label_lower: list(model.objects.order_by('pk').values())
+            for model in (Category, Product, Order, OrderItem)
+        }
+        tables['rollups'] = list(DailyOrderRollup.objects.values_list('day', 'status', 'orders', 'revenue'))
+        return tables
+
+    def test_restore_reproduces_the_dump(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator\t"Gold"', description='line one\nline \\two', price='100.00', stock=50,
+            category=category, color=['Gold', 'Black "matte"'], configurations={'lens': ['polarised', None]},
+        )
+        self.client.post('/apis/place-order/', order_payload((product, 2)), content_type='application/json')
+        fold_rollups()
+        before = self.snapshot()
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('dump_ndjson', directory, stdout=StringIO())
+            call_command('restore_ndjson', directory, '--truncate', stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(Category.objects.get().product_count, 1)
+        # Sequences continue after the restored ids
+        self.assertGreater(Category.objects.create(name='Eyeglasses').id, category.id)
+
+    def test_restore_invalidates_the_cached_catalog(self):
+        cache.clear()
+        Category.objects.create(name='Sunglasses')
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('dump_ndjson', directory, stdout=StringIO())
+            Category.objects.update(name='Eyeglasses')  # no signal, so cached below as is
+            self.assertEqual(self.client.get('/apis/categories/').json()[0]['name'], 'Eyeglasses')
+            call_command('restore_ndjson', directory, '--truncate', stdout=StringIO())
+
+        self.assertEqual(self.client.get('/apis/categories/').json()[0]['name'], 'Sunglasses')
+
+    def test_restore_refuses_non_empty_tables(self):
+        Category.objects.create(name='Sunglasses')
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('dump_ndjson', directory, stdout=StringIO())
+            with self.assertRaises(CommandError):
+                call_command('restore_ndjson', directory, stdout=StringIO())
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Sunglasses')
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        (self.directory / 'supplier').mkdir()
+        (self.directory / 'supplier' / 'aviator.glb').write_bytes(b'glTF')
+        self.media = override_settings(MEDIA_ROOT=str(self.directory / 'media'))
+        self.media.enable()
+        self.addCleanup(self.media.disable)
+
+    def write_csv(self, *rows):
+        path = self.directory / 'catalog.csv'
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['sku', 'name', 'category', 'price', 'stock', 'color', 'configurations', 'model'])
+            writer.writerows(rows)
+        return str(path)
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, '--media-dir', str(self.directory / 'supplier'), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_upserts_by_sku_and_copies_media(self):
+        path = self.write_csv(
+            ['AV-1', 'Aviator', 'sunglasses', '120', '5', 'Gold|Black', '{"lens": "polarised"}', 'aviator.glb'],
+            ['RD-1', 'Reader', 'Sunglasses', '40', '3', '', '', ''],
+            ['XX-1', 'Mystery', 'Lenses', '10', '1', '', '', ''],
+        )
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            out, err = self.run_import(path)
+            self.assertEqual(get_catalog_version(), version)
+        self.assertNotEqual(get_catalog_version(), version)
+
+        self.assertIn('2 created, 0 updated, 0 unchanged, 1 rejected', out)
+        self.assertIn("line 4: unknown category 'Lenses'", err)
+        aviator = Product.objects.get(sku='AV-1')
+        self.assertEqual((aviator.color, aviator.configurations), (['Gold', 'Black'], {'lens': 'polarised'}))
+        self.assertEqual(aviator.model.read(), b'glTF')
+        self.assertEqual(Category.objects.get().product_count, 2)
+
+        path = self.write_csv(
+            ['AV-1', 'Aviator', 'Sunglasses', '99.50', '5', 'Gold|Black', '{"lens": "polarised"}', 'aviator.glb'],
+            ['RD-1', 'Reader', 'Sunglasses', '40', '3', '', '', ''],
+        )
+        out, _ = self.run_import(path, '--dry-run')
+        self.assertIn("price: Decimal('120.00') -> Decimal('99.50')", out)
+        self.assertIn('0 created, 1 updated, 1 unchanged', out)
+        self.assertEqual(Product.objects.get(sku='AV-1').price, Decimal('120.00'))
+
+        self.run_import(path)
+        self.assertEqual(Product.objects.get(sku='AV-1').price, Decimal('99.50'))
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_rejects_bad_rows_without_aborting_the_import(self):
+        path = self.directory / 'catalog.ndjson'
+        path.write_text('\n'.join([
+            '{"sku": "AV-1", "name": "Aviator", "category": "Sunglasses", "price": 120, "stock": 5}',
+            '{"sku": "AV-2", "name": ',
+            json.dumps({'sku': 'X' * 65, 'name': 'Long', 'category': 'Sunglasses', 'price': 1}),
+            json.dumps({'sku': 'AV-3', 'name': 'Aviator', 'category': 'Sunglasses', 'price': 1, 'color': ['C' * 51]}),
+            '[1, 2]',
+        ]))
+        out, err = self.run_import(str(path))
+
+        self.assertIn('1 created, 0 updated, 0 unchanged, 4 rejected', out)
+        self.assertIn('line 2: invalid JSON', err)
+        self.assertIn('line 3: sku must be at most 64 characters', err)
+        self.assertIn('line 4: color must be at most 50 characters', err)
+        self.assertIn('line 5: row must be a JSON object', err)
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['AV-1'])
+
+    def test_rejects_numbers_out_of_range_and_media_outside_the_media_dir(self):
+        (self.directory / 'secret.txt').write_text('secret')
+        path = self.write_csv(
+            ['NAN-1', 'Nan', 'Sunglasses', 'NaN', '1', '', '', ''],
+            ['INF-1', 'Inf', 'Sunglasses', 'Infinity', '1', '', '', ''],
+            ['BIG-1', 'Big', 'Sunglasses', '123456789012', '1', '', '', ''],
+            ['BIG-2', 'Big', 'Sunglasses', '10', '3000000000', '', '', ''],
+            ['UP-1', 'Up', 'Sunglasses', '10', '1', '', '', '../secret.txt'],
+            ['ABS-1', 'Abs', 'Sunglasses', '10', '1', '', '', str(self.directory / 'secret.txt')],
+            ['AV-1', 'Aviator', 'Sunglasses', '99999999.99', '2147483647', '', '', 'aviator.glb'],
+        )
+        out, err = self.run_import(path)
+
+        self.assertIn('1 created, 0 updated, 0 unchanged, 6 rejected', out)
+        for line in (2, 3):
+            self.assertIn(f'line {line}: price and stock must be numbers', err)
+        for line in (4, 5):
+            self.assertIn(f'line {line}: price must be below 100000000 and stock at most 2147483647', err)
+        for line in (6, 7):
+            self.assertIn(f'line {line}: model must be inside the media directory', err)
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['AV-1'])
+
+    def test_never_sets_stock_below_the_units_held_by_checkouts(self):
+        Product.objects.create(sku='AV-1', name='Aviator', price=Decimal('120.00'), stock=5, category=self.category)
+        Product.objects.filter(sku='AV-1').update(reserved=3)
+
+        out, err = self.run_import(self.write_csv(['AV-1', 'Aviator', 'Sunglasses', '120', '1', '', '', '']))
+
+        self.assertIn('AV-1: stock raised to 3', err)
+        self.assertIn('0 created, 1 updated', out)
+        self.assertEqual(Product.objects.get(sku='AV-1').stock, 3)
+
+    def test_recopies_media_that_changed_without_changing_size(self):
+        path = self.write_csv(['AV-1', 'Aviator', 'Sunglasses', '120', '5', '', '', 'aviator.glb'])
+        self.run_import(path)
+        (self.directory / 'supplier' / 'aviator.glb').write_bytes(b'GLTF')
+
+        self.run_import(path)
+
+        self.assertEqual(Product.objects.get(sku='AV-1').model.read(), b'GLTF')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointBenchmarkTests(TestCase):
+    def test_every_route_has_a_scenario(self):
+        self.assertEqual(set(routes()) - {scenario.route for scenario in scenarios()}, set())
+
+    def test_every_scenario_succeeds_on_generated_data(self):
+        counts = generate_dataset(scale=0.05, seed=1)
+        self.assertEqual((counts['product'], counts['order'], counts['user']), (25, 50, 10))
+        self.assertTrue(self.client.get('/apis/search/suggest/', {'q': 'aviator'}).json())
+
+        with bench_environment():
+            results = run_scenarios(make_context(), scenarios(), iterations=2, warmup=0)
+
+        failed = {
+            name: result['statuses'] for name, result in results.items()
+            if set(result['statuses']) - {'200', '201', '204'}
+        }
+        self.assertEqual(failed, {})
+        self.assertEqual(results['GET /apis/my-orders/ [summary]']['requests'], 2)
+
+
+class PerfMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=3, category=category
+        )
+
+    def test_server_timing_and_metrics_by_url_name(self):
+        response = self.client.get(f'/apis/products/{self.product.id}/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN='scrape'):
+            metrics = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('http_requests_total{view="product-detail",method="GET",status="200"} 1', metrics)
+        self.assertIn('http_request_duration_seconds_count{view="product-detail",method="GET"} 1', metrics)
+        self.assertIn(
+            f'http_response_size_bytes_bucket{{view="product-detail",method="GET",le="+Inf"}} 1', metrics
+        )
+        self.assertRegex(metrics, r'http_request_queries_sum\{view="product-detail",method="GET"\} [1-9]')
+
+    def test_sums_keep_full_precision(self):
+        for size in (1234567, 1):
+            registry.observe('product-detail', 'GET', 200, {'http_response_size_bytes': size})
+        registry.observe('product-detail', 'GET', 200, {'http_request_duration_seconds': 0.1234567891})
+        metrics = registry.render()
+        self.assertIn('http_response_size_bytes_sum{view="product-detail",method="GET"} 1234568.0\n', metrics)
+        self.assertIn('http_request_duration_seconds_sum{view="product-detail",method="GET"} 0.1234567891\n', metrics)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('PROPFIND', 'XYZZY'):
+            self.client.generic(method, f'/apis/products/{self.product.id}/')
+        with override_settings(METRICS_TOKEN='scrape'):
+            metrics = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('http_requests_total{view="product-detail",method="OTHER",status="405"} 2', metrics)
+        self.assertNotIn('PROPFIND', metrics)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0, PERF_TOP_SQL=2, PERF_SQL_SAMPLE_RATE=1)
+    def test_slow_requests_are_logged_with_their_slowest_sql(self):
+        with self.assertLogs('apis.perf', 'WARNING') as logs:
+            self.client.get(f'/apis/products/{self.product.id}/')
+        self.assertIn('(product-detail) -> 200', logs.output[0])
+        statements = logs.output[0].splitlines()[1:]
+        self.assertEqual(len(statements), 2)
+        self.assertIn('SELECT', statements[0])
+
+        with override_settings(PERF_SQL_SAMPLE_RATE=0), self.assertLogs('apis.perf', 'WARNING') as logs:
+            self.client.get(f'/apis/products/{self.product.id}/')
+        self.assertIn('SQL not sampled', logs.output[0])
+
+
+class CheckoutSessionTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=3, category=category
+        )
+        response = self.client.post(
+            '/apis/place-order/', order_payload((product, 1), payment_method='card'),
+            content_type='application/json',
+        )
+        self.order_id = response.json()['order_id']
+
+        self.standin = StripeStandIn().__enter__()
+        self.addCleanup(self.standin.__exit__)
+        settings_override = override_settings(STRIPE_API_BASE=self.standin.url, STRIPE_SECRET_KEY='sk_test_local')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_stripe_client.cache_clear()
+        self.addCleanup(get_stripe_client.cache_clear)
+
+    def start(self):
+        return self.client.post(
+            '/apis/create-checkout-session/', {'order_id': self.order_id}, content_type='application/json'
+        )
+
+    def test_repeat_requests_reuse_the_open_session(self):
+        # load the order, then in a savepoint: lock the order, load its items
+        # with product names, lock and extend the holds (in a savepoint),
+        # store the session
+        with self.assertNumQueries(10):
+            first = self.start()
+        with self.assertNumQueries(1):
+            second = self.start()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['url'], second.json()['url'])
+        self.assertEqual(self.standin.requests, 1)
+        order = Order.objects.get(id=self.order_id)
+        self.assertTrue(first.json()['url'].endswith(order.stripe_session_id))
+
+    def test_expired_session_is_replaced(self):
+        first = self.start()
+        Order.objects.filter(id=self.order_id).update(stripe_session_expires_at=timezone.now())
+
+        second = self.start()
+
+        self.assertNotEqual(first.json()['url'], second.json()['url'])
+        self.assertEqual(self.standin.requests, 2)
+
+    def test_session_expiry_is_covered_by_the_stock_hold(self):
+        self.start()
+
+        order = Order.objects.get(id=self.order_id)
+        hold = StockReservation.objects.get(order_id=self.order_id)
+        self.assertAlmostEqual(
+            order.stripe_session_expires_at - timezone.now(), SESSION_TTL, delta=timedelta(seconds=5)
+        )
+        self.assertGreaterEqual(hold.expires_at, order.stripe_session_expires_at + HOLD_GRACE)
+
+    def test_released_hold_is_taken_again_before_a_new_session(self):
+        first = self.start()
+        StockReservation.objects.update(expires_at=timezone.now())
+        call_command('release_expired_reservations', stdout=StringIO())
+
+        second = self.start()
+
+        self.assertNotEqual(first.json()['url'], second.json()['url'])
+        self.assertEqual(StockReservation.objects.get(order_id=self.order_id).quantity, 1)
+        self.assertEqual(Product.objects.values_list('reserved', flat=True).get(), 1)
+
+    def test_cash_on_delivery_orders_get_no_session(self):
+        product = Product.objects.get()
+        order_id = self.client.post(
+            '/apis/place-order/', order_payload((product, 1)), content_type='application/json'
+        ).json()['order_id']
+
+        response = self.client.post(
+            '/apis/create-checkout-session/', {'order_id': order_id}, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockReservation.objects.filter(order_id=order_id).exists())
+        self.assertEqual(self.standin.requests, 0)
+
+    def test_standin_rejects_a_replayed_key_with_other_params(self):
+        client = get_stripe_client()
+        params = {'mode': 'payment', 'expires_at': int(time.time()) + 3600}
+        client.v1.checkout.sessions.create(params=params, options={'idempotency_key': 'k'})
+        with self.assertRaises(stripe.IdempotencyError):
+            client.v1.checkout.sessions.create(params={**params, 'expires_at': params['expires_at'] + 1}, options={'idempotency_key': 'k'})
+
+    def test_no_session_when_the_released_stock_has_sold(self):
+        StockReservation.objects.update(expires_at=timezone.now())
+        call_command('release_expired_reservations', stdout=StringIO())
+        Product.objects.update(stock=0)
+
+        response = self.start()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.standin.requests, 0)
+
+
+class CouponTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Sunglasses')
+        self.product = Product.objects.create(
+            name='Aviator', description='d', price='80.00', stock=10, category=category
+        )
+        self.coupon = Coupon.objects.create(
+            code='SUMMER20', discount='20% off', discount_type='percentage', discount_value=20,
+            min_order=100, expires_at=timezone.now() + timedelta(days=1), max_uses=1,
+        )
+
+    def place(self, code, quantity=2, payment_method='cod'):
+        payload = order_payload((self.product, quantity), payment_method=payment_method)
+        payload['discount_code'] = code
+        return self.client.post('/apis/place-order/', payload, content_type='application/json')
+
+    def test_discount_is_applied_and_redeemed(self):
+        response = self.place('summer20')
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual((order.discount_code, str(order.discount_amount), str(order.total_amount)),
+                         ('SUMMER20', '32.00', '128.00'))
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+        response = self.place('SUMMER20')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fully redeemed', response.json()['error'])
+
+    def test_min_order_and_expiry_are_enforced(self):
+        response = self.place('SUMMER20', quantity=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at least 100', response.json()['discount_code'][0])
+
+        Coupon.objects.create(
+            code='OLD', discount='$5 off', discount_type='fixed', discount_value=5,
+            expires_at=timezone.now() - timedelta(days=1),
+        )
+        response = self.place('OLD')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_active_coupons_are_cached_until_a_coupon_is_saved(self):
+        user = get_user_model().objects.create_user(email='buyer@example.com', password='pw', name='Buyer')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get('/apis/my-coupons/')
+        with self.assertNumQueries(0):
+            codes = [coupon['code'] for coupon in client.get('/apis/my-coupons/').json()]
+        self.assertEqual(codes, ['SUMMER20'])
+
+        self.coupon.is_active = False
+        self.coupon.save()
+        self.assertEqual(client.get('/apis/my-coupons/').json(), [])
+
+    def start_card_checkout(self, order_id):
+        standin = StripeStandIn().__enter__()
+        self.addCleanup(standin.__exit__)
+        with override_settings(STRIPE_API_BASE=standin.url, STRIPE_SECRET_KEY='sk_test_local'):
+            get_stripe_client.cache_clear()
+            self.addCleanup(get_stripe_client.cache_clear)
+            response = self.client.post(
+                '/apis/create-checkout-session/', {'order_id': order_id}, content_type='application/json'
+            )
+        return response, standin
+
+    def test_card_checkout_charges_the_discounted_total(self):
+        order_id = self.place('SUMMER20', payment_method='card').json()['order_id']
+
+        response, standin = self.start_card_checkout(order_id)
+
+        self.assertEqual(response.status_code, 200)
+        [session] = standin.sessions.values()
+        self.assertEqual(session['amount_total'], 12800)
+
+    def test_abandoned_card_checkout_gives_its_coupon_use_back(self):
+        order_id = self.place('SUMMER20', payment_method='card').json()['order_id']
+        StockReservation.objects.update(expires_at=timezone.now())
+
+        call_command('release_expired_reservations', stdout=StringIO())
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+        # Someone else takes the last use, so the abandoned order can't resume with it
+        self.assertEqual(self.place('SUMMER20').status_code, 201)
+        response, _ = self.start_card_checkout(order_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('fully redeemed', response.json()['error'])
+        self.assertEqual(Product.objects.values_list('reserved', flat=True).get(), 0)
+
+    def test_payment_after_the_release_counts_the_use_again(self):
+        order_id = self.place('SUMMER20', payment_method='card').json()['order_id']
+        StockReservation.objects.update(expires_at=timezone.now())
+        call_command('release_expired_reservations', stdout=StringIO())
+
+        handle_checkout_completed({'metadata': {'order_id': str(order_id)}})
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertTrue(Order.objects.get(id=order_id).is_paid)
+
+
+class AnalyticsApiTests(TransactionTestCase):
+    # Transactional, as the aggregates run on their own connections in pool threads.
+    def setUp(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=50, category=category, gender='M'
+        )
+        for day, status, method, orders in [
+            ('2026-01-05', 'Confirmed', 'cod', 2),
+            ('2026-01-20', 'Cancelled', 'card', 1),
+            ('2026-02-03', 'Confirmed', 'card', 3),
+        ]:
+            DailyOrderRollup.objects.create(
+                day=day, status=status, payment_method=method, orders=orders, revenue=orders * 100
+            )
+            DailyProductRollup.objects.create(day=day, product=product, units=orders, revenue=orders * 100)
+            DailyCategoryRollup.objects.create(day=day, category=category, units=orders, revenue=orders * 100)
+        self.client.force_login(get_user_model().objects.create_superuser(email='admin@example.com', password='pw'))
+
+    def test_series_for_a_range_by_month(self):
+        response = self.client.get('/admin-analytics/api/?from=2026-01-10&to=2026-02-28&granularity=month')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['revenue'], {'labels': ['2026-01-01', '2026-02-01'], 'data': [100.0, 300.0], 'orders': [1, 3]})
+        self.assertEqual(data['status'], {'labels': ['Confirmed', 'Cancelled'], 'data': [3, 1]})
+        self.assertEqual(data['gender'], {'labels': ['Men'], 'data': [4]})
+        self.assertEqual(data['top_products'], {'labels': ['Aviator'], 'data': [400.0]})
+
+    def test_bad_parameters(self):
+        for query in ('granularity=year', 'from=yesterday', 'from=2026-02-01&to=2026-01-01'):
+            self.assertEqual(self.client.get(f'/admin-analytics/api/?{query}').status_code, 400)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/admin-analytics/api/').status_code, 302)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_last_units_are_never_oversold(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Limited Drop', description='d', price='10.00', stock=5, category=category
+        )
+        buyers = 20
+        barrier = threading.Barrier(buyers)
+        statuses = []
+
+        def buy():
+            try:
+                barrier.wait()
+                response = self.client_class().post(
+                    '/apis/place-order/', order_payload((product, 1)), content_type='application/json'
+                )
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(statuses.count(201), 5)
+        self.assertEqual(statuses.count(400), buyers - 5)
+        self.assertEqual(Order.objects.count(), 5)
+
+    def test_concurrent_clicks_create_one_checkout_session(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(name='Aviator', description='d', price='100.00', stock=5, category=category)
+        order_id = self.client.post(
+            '/apis/place-order/', order_payload((product, 1), payment_method='card'), content_type='application/json'
+        ).json()['order_id']
+        clicks = 4
+        barrier = threading.Barrier(clicks)
+        responses = []
+
+        def click():
+            try:
+                barrier.wait()
+                responses.append(self.client_class().post(
+                    '/apis/create-checkout-session/', {'order_id': order_id}, content_type='application/json'
+                ))
+            finally:
+                connection.close()
+
+        with StripeStandIn(latency=0.2) as standin, \
+                override_settings(STRIPE_API_BASE=standin.url, STRIPE_SECRET_KEY='sk_test_local'):
+            get_stripe_client.cache_clear()
+            self.addCleanup(get_stripe_client.cache_clear)
+            threads = [threading.Thread(target=click) for _ in range(clicks)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [200] * clicks)
+        self.assertEqual(len({response.json()['url'] for response in responses}), 1)
+        self.assertEqual(standin.requests, 1)
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+
+    def test_each_webhook_event_commits_before_the_next_runs(self):
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Aviator', description='d', price='100.00', stock=5, category=category
+        )
+        for _ in range(2):
+            order_id = self.client.post(
+                '/apis/place-order/', order_payload((product, 1), payment_method='card'),
+                content_type='application/json',
+            ).json()['order_id']
+            payload = signed_event('checkout_session_completed', order_id=order_id)[0]
+            record_event(payload.replace('evt_test_checkout_completed', f'evt_test_{order_id}'))
+
+        seen = []
+
+        def product_row_is_free():
+            try:
+                with transaction.atomic():
+                    Product.objects.select_for_update(nowait=True).get(id=product.id)
+                seen.append(WebhookEvent.objects.filter(status='processed').count())
+            except DatabaseError:
+                seen.append(None)
+            finally:
+                connection.close()
+
+        def handler(session):
+            thread = threading.Thread(target=product_row_is_free)
+            thread.start()
+            thread.join()
+            handle_checkout_completed(session)
+
+        with mock.patch.dict(HANDLERS, {'checkout.session.completed': handler}):
+            self.assertEqual(process_pending_events(), 2)
+        # The first event's stock update was committed before the second began
+        self.assertEqual(seen, [0, 1])
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.reserved), (3, 0))
+
+    def test_coupon_is_never_redeemed_past_max_uses(self):
+        cache.clear()
+        category = Category.objects.create(name='Sunglasses')
+        product = Product.objects.create(
+            name='Classic', description='d', price='10.00', stock=1000, category=category
+        )
+        coupon = Coupon.objects.create(
+            code='LAUNCH', discount='$1 off', discount_type='fixed', discount_value=1,
+            expires_at=timezone.now() + timedelta(days=1), max_uses=100,
+        )
+        payload = order_payload((product, 1))
+        payload['discount_code'] = 'LAUNCH'
+
+        def checkout(_):
+            try:
+                response = self.client_class().post('/apis/place-order/', payload, content_type='application/json')
+                return response.status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(checkout, range(130)))
+
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 100)
+        self.assertEqual(statuses.count(201), 100)
+        self.assertEqual(Order.objects.filter(discount_code='LAUNCH').count(), 100)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 900)
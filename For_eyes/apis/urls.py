@@ -2,16 +2,20 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('home/', views.home, name='home'),
     path('hero-slides/', views.hero_slides, name='hero-slides'),
     path('featured-products/', views.featured_products, name='featured-products'),
     path('categories/', views.category_list, name='category-list'),
     path('products/<int:pk>/', views.product_detail, name='product-detail'),
+    path('products/changes/', views.product_changes, name='product-changes'),
+    path('products/batch/', views.product_batch, name='product-batch'),
     path('products/', views.product_list, name='product-list'),
     path('place-order/', views.place_order, name='place-order'),
     path('place-order/', views.place_order),
     path('create-checkout-session/', views.create_checkout_session),
     path('stripe-webhook/', views.stripe_webhook),
     path('search/', views.search_products, name='search_products'),
+    path('search/suggest/', views.search_suggestions, name='search-suggestions'),
     path('my-orders/', views.my_orders, name='my-orders'),
     path('my-addresses/', views.my_addresses, name='my-addresses'),
     path('addresses/<int:pk>/', views.address_detail, name='address-detail'),
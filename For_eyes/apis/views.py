@@ -1,71 +1,238 @@
 from rest_framework import status
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Count, Min, Prefetch
 from rest_framework.decorators import api_view
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.http import HttpResponse
-from rest_framework.decorators import api_view, permission_classes
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 import stripe
-from django.db.models import Q
 from rest_framework.permissions import AllowAny
 
 
-from .models import Product , Category, HeroSlide, Order, Address, Favourite, Coupon
-from .serializers import ProductCardSerializer,CategorySerializer, HeroSlideSerializer, ProductDetailSerializer, OrderSerializer, AddressSerializer, FavouriteSerializer, CouponSerializer, OrderListSerializer, UserSerializer
+from .models import Product , Category, HeroSlide, Order, OrderItem, Address, Favourite, Coupon, ProductDeletion
+from .cache import cached_catalog_payload, catalog_response, etag_response, make_etag
+from .coupons import CouponError, active_coupons
+from .filters import facet_counts, filter_products
+from .inventory import InsufficientStock, with_available_stock
+from .payments import open_session, start_checkout_session
+from .pagination import ChangesPagination, KeysetPagination, OrderPagination, SearchPagination
+from .search import search_products_queryset
+from .suggestions import suggest
+from .webhooks import record_event
+from .serializers import CARD_FIELDS, render_favourites, render_product_cards, stock_status
+from .serializers import ProductCardSerializer,CategorySerializer, HeroSlideSerializer, ProductDetailSerializer, OrderSerializer, AddressSerializer, FavouriteSerializer, CouponSerializer, OrderListSerializer, OrderSummarySerializer, UserSerializer
 
 # Create your views here.
 
+# Public catalog endpoints are served from the versioned cache in apis.cache.
+# They skip authentication so a warm request makes no database queries.
+
+def hero_slides_payload(request):
+    slides = HeroSlide.objects.all()
+    return list(HeroSlideSerializer(slides, many=True, context={'request': request}).data)
+
+
+def featured_products_payload(request):
+    products = Product.objects.filter(is_featured=True).values(*CARD_FIELDS)
+    return render_product_cards(products, request)
+
+
+def categories_payload(request):
+    categories = Category.objects.all()
+    return list(CategorySerializer(categories, many=True, context={'request': request}).data)
+
+
+CATALOG_SECTIONS = {
+    'hero_slides': hero_slides_payload,
+    'featured_products': featured_products_payload,
+    'categories': categories_payload,
+}
+
+
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def hero_slides(request):
-    slides = HeroSlide.objects.all()
-    serializer = HeroSlideSerializer(slides, many=True, context={'request': request})
-    return Response(serializer.data)
+    return catalog_response(request, 'hero_slides', lambda: hero_slides_payload(request))
 
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def featured_products(request):
-    products = Product.objects.filter(is_featured=True)
-    serializer = ProductCardSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
+    return catalog_response(request, 'featured_products', lambda: featured_products_payload(request))
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def category_list(request):
+    return catalog_response(request, 'categories', lambda: categories_payload(request))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def home(request):
+    """
+    Everything the Home page needs in one round trip: hero slides, featured
+    products and categories from the shared catalog cache, plus the user's
+    favourite product ids when logged in (null otherwise).
+    """
+    data = {}
+    etags = []
+    for name, build in CATALOG_SECTIONS.items():
+        entry = cached_catalog_payload(request, name, lambda build=build: build(request))
+        data[name] = entry['data']
+        etags.append(entry['etag'])
+
+    data['favourite_ids'] = None
+    if request.user.is_authenticated:
+        data['favourite_ids'] = list(
+            Favourite.objects.filter(user=request.user).values_list('product_id', flat=True)
+        )
+        etags.append(str(data['favourite_ids']))
+
+    return etag_response(request, data, make_etag(' '.join(etags).encode()), 'private, no-cache')
+
 
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def product_detail(request, pk):
-    try:
-        product = Product.objects.get(pk=pk)
-    except Product.DoesNotExist:
+    """
+    Product detail with conditional GET: a matching If-None-Match is
+    answered from updated_at and the stock level alone, without loading or
+    serializing the row. Checkouts on striped products don't touch
+    updated_at, hence the stock status in the ETag. There's no
+    Last-Modified, as updated_at alone would answer If-Modified-Since with
+    a stale 304 after such a checkout.
+    """
+    current = with_available_stock(Product.objects.filter(pk=pk)).values_list('updated_at', 'available').first()
+    if current is None:
         return Response({'error': 'Product not found'}, status=404)
-
+    updated_at, available = current
+
+    headers = {
+        'ETag': f'"{pk}-{int(updated_at.timestamp() * 1_000_000)}-{stock_status(available)[0]}"',
+        'Cache-Control': 'public, no-cache',
+    }
+    not_modified = get_conditional_response(request, etag=headers['ETag'])
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    product = with_available_stock(Product.objects.select_related('category')).get(pk=pk)
     serializer = ProductDetailSerializer(product, context={'request': request})
-    return Response(serializer.data)
+    return Response(serializer.data, headers=headers)
+
+
+MAX_BATCH_IDS = 300
+MAX_PRODUCT_ID = 2 ** 63 - 1  # bigint primary keys
+
+
+@api_view(['GET', 'POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def product_batch(request):
+    """
+    Refreshes many products at once for the cart and favourites, in the
+    requested order and with current stock_status, using one id__in query.
+    GET /apis/products/batch/?ids=3,1,2&view=card
+    POST /apis/products/batch/ {"ids": [3, 1, 2], "view": "detail"}
+    Ids that no longer exist are listed under `missing`.
+    """
+    params = request.data if request.method == 'POST' else request.GET
+    if not isinstance(params, dict):
+        return Response({'error': 'Expected a JSON object'}, status=status.HTTP_400_BAD_REQUEST)
+    raw_ids = params.get('ids', [])
+    if isinstance(raw_ids, str):
+        raw_ids = [value for value in raw_ids.split(',') if value.strip()]
+    try:
+        ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except (TypeError, ValueError):
+        return Response({'error': 'ids must be a list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(0 < pk <= MAX_PRODUCT_ID for pk in ids):
+        return Response({'error': 'ids must be a list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > MAX_BATCH_IDS:
+        return Response({'error': f'At most {MAX_BATCH_IDS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if params.get('view', 'card') == 'detail':
+        products = with_available_stock(Product.objects.filter(id__in=ids).select_related('category'))
+        found = {
+            item['id']: item for item in
+            ProductDetailSerializer(products, many=True, context={'request': request}).data
+        }
+    else:
+        rows = list(with_available_stock(Product.objects.filter(id__in=ids)).values(*CARD_FIELDS, 'available'))
+        found = {}
+        for row, card in zip(rows, render_product_cards(rows, request)):
+            card['stock_status'] = stock_status(row['available'])
+            found[card['id']] = card
+
+    return Response({
+        'results': [found[pk] for pk in ids if pk in found],
+        'missing': [pk for pk in ids if pk not in found],
+    })
 
 
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
-def category_list(request):
-    categories = Category.objects.annotate(product_count=Count('products'))
-    serializer = CategorySerializer(categories, many=True, context={'request': request})
-    return Response(serializer.data)
+def product_changes(request):
+    """
+    Products created, updated or deleted after `since` (ISO 8601), oldest
+    change first, so clients and edge caches can refresh incrementally.
+    Example: /apis/products/changes/?since=2025-11-25T14:56:00Z
+    Deletions are listed on the first page only.
+    """
+    since = parse_datetime(request.GET.get('since', ''))
+    if since is None:
+        return Response({'error': 'since must be an ISO 8601 timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+
+    products = Product.objects.filter(updated_at__gt=since).values('id', 'created_at', 'updated_at')
+
+    paginator = ChangesPagination()
+    page = paginator.paginate_queryset(products, request)
+    changes = [{
+        'id': row['id'],
+        'change': 'created' if row['created_at'] > since else 'updated',
+        'updated_at': row['updated_at'],
+    } for row in page]
+    response = paginator.get_paginated_response(changes)
+
+    if not paginator.has_previous:
+        response.data['deleted'] = list(
+            ProductDeletion.objects.filter(deleted_at__gt=since)
+            .order_by('deleted_at').values('product_id', 'deleted_at')
+        )
+    return response
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_list(request):
     """
-    Returns products filtered by category name (if given).
-    Example: /api/products/?category=Eyeglasses
+    Returns one page of products matching the facet filters.
+    Example: /api/products/?category=Eyeglasses&brand=Ray-Ban,Oakley&color=Black
+             &gender=M&min_price=20&max_price=150&ordering=price&page_size=24
+    Follow the `next` (or `previous`) link to fetch the adjacent page. The first page
+    also carries per-facet counts for the current filters.
     """
-    category_name = request.GET.get('category', None)
-    products = Product.objects.all()
-
-    if category_name:
-        products = products.filter(category__name__iexact=category_name)
+    products = filter_products(Product.objects.all(), request.GET)
 
-    serializer = ProductCardSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(products.values(*CARD_FIELDS), request)
+    response = paginator.get_paginated_response(render_product_cards(page, request))
+    if not paginator.has_previous:
+        response.data['facets'] = facet_counts(request.GET)
+    return response
 
 
 @api_view(['POST'])
@@ -91,36 +258,44 @@ def place_order(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def create_checkout_session(request):
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+    """
+    Returns the Stripe Checkout URL for a card order. Repeat requests
+    (double-clicks, reloads) get the order's existing open session back
+    without calling Stripe. A new session is created under a lock on the
+    order row, so concurrent clicks don't send Stripe the same idempotency
+    key with different parameters: the later one waits and gets the
+    session the first one stored.
+    """
     order_id = request.data.get('order_id')
+    fields = [
+        'id', 'order_number', 'payment_method', 'is_paid', 'discount_code', 'discount_amount', 'total_amount',
+        'stripe_session_id', 'stripe_session_url', 'stripe_session_expires_at',
+    ]
     try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
+        order = Order.objects.only(*fields).annotate(holds_until=Min('reservations__expires_at')).get(id=order_id)
+    except (Order.DoesNotExist, ValueError, TypeError):
         return Response({"error": "Invalid order id"}, status=404)
+    if order.payment_method != 'card':
+        return Response({"error": "Order is not paid by card"}, status=status.HTTP_400_BAD_REQUEST)
+    if order.is_paid:
+        return Response({"error": "Order is already paid"}, status=status.HTTP_400_BAD_REQUEST)
 
-    line_items = []
-    for item in order.items.all():
-        line_items.append({
-            'price_data': {
-                'currency': 'usd',  # change as needed
-                'product_data': {
-                    'name': item.product.name,
-                },
-                'unit_amount': int(item.price * 100),  # cents
-            },
-            'quantity': item.quantity,
-        })
+    existing = open_session(order)
+    if existing is not None:
+        return Response({'url': existing[1]}, status=200)
 
     try:
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            success_url=f"http://localhost:5173/payment-success?session_id={{CHECKOUT_SESSION_ID}}&order_id={order.id}",
-            cancel_url=f"http://localhost:5173/payment-cancel?order_id={order.id}",
-            metadata={'order_id': str(order.id)},
-        )
-        return Response({'url': checkout_session.url}, status=200)
+        with transaction.atomic():
+            locked = Order.objects.select_for_update().only(*fields).get(id=order.id)
+            if locked.is_paid:
+                return Response({"error": "Order is already paid"}, status=status.HTTP_400_BAD_REQUEST)
+            if locked.stripe_session_id != order.stripe_session_id:
+                # A concurrent request created a session while this one waited
+                return Response({'url': locked.stripe_session_url}, status=200)
+            _, url = start_checkout_session(locked)
+        return Response({'url': url}, status=200)
+    except (InsufficientStock, CouponError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -129,51 +304,25 @@ def create_checkout_session(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def stripe_webhook(request):
+    """
+    Verifies the Stripe signature, stores the event in the inbox and
+    acknowledges it straight away; `manage.py process_webhooks` does the
+    work. Redelivered events are stored once.
+    """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
-    stripe.api_key = settings.STRIPE_SECRET_KEY
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, endpoint_secret
         )
     except ValueError:
         return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError:
+    except stripe.SignatureVerificationError:
         return HttpResponse(status=400)
 
-    # Handle the checkout.session.completed event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        order_id = session.get('metadata', {}).get('order_id')
-        try:
-            order = Order.objects.get(id=order_id)
-        except Order.DoesNotExist:
-            return HttpResponse(status=404)
-
-        # Idempotency: if already paid, ignore
-        if not order.is_paid:
-            # Mark paid
-            order.is_paid = True
-            order.status = 'Confirmed'
-
-            # Deduct stock now (ensure availability)
-            with transaction.atomic():
-                for oi in order.items.select_for_update():
-                    product = oi.product
-                    if product.stock < oi.quantity:
-                        # If stock insufficient, you must decide policy:
-                        # - refund, or
-                        # - mark order as 'Failed' and notify admin
-                        order.status = 'Failed - Insufficient stock'
-                        order.save()
-                        # Optionally initiate refund here
-                        return HttpResponse(status=200)
-                    product.stock -= oi.quantity
-                    product.save()
-                order.save()
-
+    record_event(payload)
     return HttpResponse(status=200)
 
 @api_view(['GET'])
@@ -181,28 +330,51 @@ def stripe_webhook(request):
 def search_products(request):
     query = request.GET.get('q', '').strip()
     if not query:
-        return Response([])
-
-    products = Product.objects.filter(
-        Q(name__icontains=query) |
-        Q(description__icontains=query) |
-        Q(category__name__icontains=query) |
-        Q(brand__icontains=query) |
-        Q(tag__icontains=query) |
-        Q(frame_material__icontains=query) |
-        Q(color__icontains=query)
-    ).distinct()[:20]
-
-    serializer = ProductCardSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
+        return Response({'next': None, 'previous': None, 'results': []})
+
+    # Ranked full-text match on the trigger-maintained search_vector
+    products = search_products_queryset(query)
+
+    paginator = SearchPagination()
+    page = paginator.paginate_queryset(products.values(*CARD_FIELDS, 'rank'), request)
+    return paginator.get_paginated_response(render_product_cards(page, request))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_suggestions(request):
+    """
+    Lightweight autocomplete over product names, brands and categories.
+    Example: /apis/search/suggest/?q=aviater&limit=8
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    return Response(suggest(request.GET.get('q', ''), limit=limit))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_orders(request):
-    """Get all orders for the authenticated user"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    serializer = OrderListSerializer(orders, many=True, context={'request': request})
-    return Response(serializer.data)
+    """
+    The authenticated user's orders, newest first, a page at a time:
+    /apis/my-orders/?page_size=10&cursor=<token>
+    Items (with product name and image) come from one extra query per
+    page; ?view=summary leaves them out and adds item_count instead.
+    """
+    fields = [name for name in OrderListSerializer.Meta.fields if name != 'items']
+    orders = Order.objects.filter(user=request.user).only(*fields)
+    paginator = OrderPagination()
+
+    if request.GET.get('view') == 'summary':
+        page = paginator.paginate_queryset(orders.annotate(item_count=Count('items')), request)
+        return paginator.get_paginated_response(OrderSummarySerializer(page, many=True).data)
+
+    items = OrderItem.objects.select_related('product').only(
+        'id', 'order_id', 'product_id', 'quantity', 'price', 'product__name', 'product__image'
+    )
+    page = paginator.paginate_queryset(orders.prefetch_related(Prefetch('items', queryset=items)), request)
+    serializer = OrderListSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET', 'POST'])
@@ -247,9 +419,10 @@ def address_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def my_favourites(request):
     """Get all favourites for the authenticated user"""
-    favourites = Favourite.objects.filter(user=request.user).select_related('product')
-    serializer = FavouriteSerializer(favourites, many=True, context={'request': request})
-    return Response(serializer.data)
+    favourites = Favourite.objects.filter(user=request.user).values(
+        'id', 'created_at', *(f'product__{field}' for field in CARD_FIELDS)
+    )
+    return Response(render_favourites(list(favourites), request))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -297,12 +470,7 @@ def remove_from_favourites(request, product_id):
 @permission_classes([IsAuthenticated])
 def my_coupons(request):
     """Get all active coupons for the user"""
-    from django.utils import timezone
-    coupons = Coupon.objects.filter(
-        is_active=True,
-        expires_at__gte=timezone.now()
-    ).order_by('-created_at')
-    serializer = CouponSerializer(coupons, many=True)
+    serializer = CouponSerializer(active_coupons(), many=True)
     return Response(serializer.data)
 
 
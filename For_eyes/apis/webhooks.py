@@ -0,0 +1,110 @@
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .coupons import count_coupon_use
+from .inventory import InsufficientStock, convert_reservations, release_reservations
+from .models import Order, WebhookEvent
+
+MAX_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 60 * 60
+# Status of a paid order whose stock was gone (fits Order.status' 20 chars)
+NEEDS_REFUND = 'Needs Refund'
+
+
+def record_event(payload):
+    """
+    Stores a verified event (the raw request body) in the inbox. A
+    redelivery of an event id already stored is ignored, in one INSERT.
+    """
+    event = json.loads(payload)
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def handle_checkout_completed(session):
+    order = Order.objects.get(id=session.get('metadata', {}).get('order_id'))
+
+    # Idempotency: if already paid, ignore
+    if order.is_paid:
+        return
+    order.is_paid = True
+    order.status = 'Confirmed'
+
+    # Turn the checkout's stock hold into a sale. This updates the product
+    # (or stripe) rows, whose locks are held until the event's transaction
+    # commits, so process_pending_events commits every event on its own.
+    try:
+        with transaction.atomic():
+            held = convert_reservations(order)
+            if not held and order.discount_code:
+                # Its holds were released and the coupon use given back,
+                # but the customer has paid the discounted total.
+                count_coupon_use(order.discount_code)
+    except InsufficientStock:
+        # The hold expired and the stock was sold meanwhile:
+        # flag the order so an admin can refund it.
+        order.status = NEEDS_REFUND
+        release_reservations(order.reservations.all())
+    order.save()
+
+
+HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+}
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30 s, 1 min, 2 min, ... capped at 6 hours."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def _due_event(now):
+    """Locks the oldest due event no other worker holds, or returns None."""
+    return (
+        WebhookEvent.objects.select_for_update(skip_locked=True)
+        .filter(status='pending', next_attempt_at__lte=now)
+        .order_by('received_at').first()
+    )
+
+
+def process_pending_events(batch_size=100):
+    """
+    Handles up to `batch_size` due inbox events, oldest first, and returns
+    how many were taken. Each event is claimed with SKIP LOCKED and its
+    effects commit in its own transaction, together with marking it
+    processed, so an event is applied exactly once and the stock rows it
+    touches are locked only while that one event runs. A failing event is
+    retried with backoff and marked failed after MAX_ATTEMPTS.
+    """
+    now = timezone.now()
+    taken = 0
+    while taken < batch_size:
+        with transaction.atomic():
+            event = _due_event(now)
+            if event is None:
+                break
+            taken += 1
+            handler = HANDLERS.get(event.type)
+            try:
+                with transaction.atomic():
+                    if handler is not None:
+                        handler(event.payload['data']['object'])
+            except Exception as e:
+                event.attempts += 1
+                event.last_error = f"{type(e).__name__}: {e}"
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                else:
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+            else:
+                event.attempts += 1
+                event.status = 'processed'
+                event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'processed_at'])
+    return taken
@@ -8,17 +8,12 @@ django.setup()
 
 # Now import Django stuff
 from django.core.management import call_command
-from io import StringIO
 
 # Force UTF-8
 sys.stdout.reconfigure(encoding='utf-8')
 
-# Capture output
-out = StringIO()
-call_command('dumpdata', '--natural-foreign', '--natural-primary', '--indent=4', stdout=out)
-
-# Write to file with UTF-8
+# Stream straight into the UTF-8 file rather than building the dump in memory
 with open('data_dump.json', 'w', encoding='utf-8') as f:
-    f.write(out.getvalue())
+    call_command('dumpdata', '--natural-foreign', '--natural-primary', '--indent=4', stdout=f)
 
 print("✅ Data dumped successfully with UTF-8 encoding!")
\ No newline at end of file
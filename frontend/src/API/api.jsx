@@ -137,13 +137,23 @@ export const getFeaturedProducts = () => API.get('featured-products/');
 // Categories
 export const getCategories = () => API.get('categories/');
 
-// All products (optionally filtered by category)
-export const getProducts = (category) =>
-  API.get('products/', { params: category ? { category } : {} });
+// Home page bundle: hero slides, featured products, categories (+ favourite ids when logged in)
+export const getHomeBundle = () => API.get('home/');
+
+// Products (optionally filtered by category and facets, e.g. { brand: 'Ray-Ban', color: 'Black,Gold' })
+// The first page also returns `facets` with per-value counts.
+export const getProducts = (category, filters = {}) =>
+  API.get('products/', { params: category ? { ...filters, category } : filters });
+
+// Next page of products (absolute `next` link from a paginated response)
+export const getProductsPage = (nextUrl) => API.get(nextUrl);
 
 // Product detail
 export const getProductDetail = (id) => API.get(`products/${id}/`);
 
+// Refresh many products (cart, favourites) in one request; view is 'card' or 'detail'
+export const getProductsBatch = (ids, view = 'card') => API.post('products/batch/', { ids, view });
+
 // Place order
 export const placeOrder = (orderData) => API.post('place-order/', orderData);
 
@@ -154,6 +164,9 @@ export const createCheckoutSession = (orderId) =>
 // Search products
 export const searchProducts = (query) => API.get('search/', { params: { q: query } });
 
+// Autocomplete suggestions (product names, brands, categories)
+export const getSearchSuggestions = (query) => API.get('search/suggest/', { params: { q: query } });
+
 // ---- PROFILE API FUNCTIONS ---- //
 
 // User Profile - Get profile
@@ -168,7 +181,8 @@ export const changePassword = (passwordData) => API.post('change-password/', pas
 // ---- ORDERS API FUNCTIONS ---- //
 
 // Get user's orders
-export const getMyOrders = () => API.get('my-orders/');
+// Pass the previous page's `next` URL to load more
+export const getMyOrders = (nextUrl) => API.get(nextUrl || 'my-orders/');
 
 // ---- ADDRESS API FUNCTIONS ---- //
 
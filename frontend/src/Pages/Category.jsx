@@ -5,12 +5,14 @@ import NavigationBar from "../assets/Components/NavigationBar";
 import Footer from "../assets/Components/Footer";
 import ProductCard from "../assets/Components/ProductCard";
 
-import { getProducts } from "../API/api";
+import { getProducts, getProductsPage } from "../API/api";
 
 const CategoryPage = () => {
   const { name } = useParams();
   const [openSections, setOpenSections] = useState({});
   const [products, setProducts] = useState([]); // 🔹 dynamic product list
+  const [nextPage, setNextPage] = useState(null); // cursor link for the next page
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
 
@@ -54,7 +56,8 @@ const CategoryPage = () => {
         
         // Call backend API
         const response = await getProducts(categoryName);
-        setProducts(response.data);
+        setProducts(response.data.results || []);
+        setNextPage(response.data.next || null);
 
       } catch (err) {
         console.error("Error fetching products:", err);
@@ -67,6 +70,21 @@ const CategoryPage = () => {
     fetchProducts();
   }, [name]);
 
+  // Fetch the next page using the cursor link returned by the backend
+  const loadMore = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const response = await getProductsPage(nextPage);
+      setProducts((prev) => [...prev, ...(response.data.results || [])]);
+      setNextPage(response.data.next || null);
+    } catch (err) {
+      console.error("Error fetching more products:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const categories = {
     "View All": ["view-all"],
     Eyeglasses: [
@@ -165,11 +183,24 @@ const CategoryPage = () => {
                 </div>
               </div>
             ) : products.length > 0 ? (
-              <div className="grid md:grid-cols-3 lg:grid-cols-4 gap-6">
-                {products.map((product) => (
-                  <ProductCard key={product.id} product={product} />
-                ))}
-              </div>
+              <>
+                <div className="grid md:grid-cols-3 lg:grid-cols-4 gap-6">
+                  {products.map((product) => (
+                    <ProductCard key={product.id} product={product} />
+                  ))}
+                </div>
+                {nextPage && (
+                  <div className="text-center mt-10">
+                    <button
+                      onClick={loadMore}
+                      disabled={loadingMore}
+                      className="bg-blue-600 hover:bg-blue-700 disabled:opacity-50 text-white px-6 py-2 rounded-lg transition-colors"
+                    >
+                      {loadingMore ? "Loading..." : "Load More"}
+                    </button>
+                  </div>
+                )}
+              </>
             ) : (
               <div className="text-center py-20">
                 <div className="bg-gray-100 rounded-full w-16 h-16 flex items-center justify-center mx-auto mb-4">
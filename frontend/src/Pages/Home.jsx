@@ -7,7 +7,7 @@ import { Link } from "react-router-dom";
 import ProductCard from '../assets/Components/ProductCard';
 
 //Mock API
-import { getHeroSlides, getFeaturedProducts, getCategories } from "../API/api";
+import { getHomeBundle } from "../API/api";
 
 
 const HomePage = () => {
@@ -30,16 +30,12 @@ const HomePage = () => {
         setLoading(true);
         setError(null);
 
-        // Fetch all data in parallel
-        const [heroResponse, productsResponse, categoriesResponse] = await Promise.all([
-          getHeroSlides(),
-          getFeaturedProducts(),
-          getCategories()
-        ]);
+        // Fetch all sections in a single request
+        const response = await getHomeBundle();
 
-        setHeroSlides(heroResponse.data);
-        setFeaturedProducts(productsResponse.data);
-        setCategories(categoriesResponse.data);
+        setHeroSlides(response.data.hero_slides || []);
+        setFeaturedProducts(response.data.featured_products || []);
+        setCategories(response.data.categories || []);
       } catch (err) {
         console.error('Error fetching data:', err);
         setError('Failed to load data. Please try again later.');
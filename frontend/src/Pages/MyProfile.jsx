@@ -32,15 +32,31 @@ const menuItems = [
 // Content Components
 const OrdersContent = () => {
   const [orders, setOrders] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await getMyOrders(nextPage);
+      setOrders((previous) => [...previous, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (err) {
+      console.error("Error loading more orders:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     const fetchOrders = async () => {
       try {
         setLoading(true);
         const response = await getMyOrders();
-        setOrders(response.data);
+        setOrders(response.data.results);
+        setNextPage(response.data.next);
       } catch (err) {
         setError(err.response?.data?.error || err.response?.data?.message || "Failed to load orders");
         console.error("Error fetching orders:", err);
@@ -97,6 +113,7 @@ const OrdersContent = () => {
                 order.status === "Shipped" ? "bg-blue-100 text-blue-700" :
                 order.status === "Processing" ? "bg-yellow-100 text-yellow-700" :
                 order.status === "Awaiting Payment" ? "bg-orange-100 text-orange-700" :
+                order.status === "Needs Refund" ? "bg-red-100 text-red-700" :
                 "bg-gray-100 text-gray-700"
               }`}>
                 {order.status}
@@ -140,6 +157,17 @@ const OrdersContent = () => {
           </div>
         ))}
       </div>
+      {nextPage && (
+        <div className="text-center mt-6">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-blue-600 hover:bg-blue-700 disabled:opacity-50 text-white px-6 py-2 rounded-lg transition-colors"
+          >
+            {loadingMore ? "Loading..." : "Load More"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -18,7 +18,7 @@ const SearchResults = () => {
       setLoading(true);
       try {
         const response = await searchProducts(query); // Axios call
-        setProducts(response.data); // Axios stores result in `data`
+        setProducts(response.data.results || []); // Axios stores result in `data`
       } catch (error) {
         console.error("Error fetching search results:", error);
         setProducts([]);
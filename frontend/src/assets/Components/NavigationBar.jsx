@@ -46,7 +46,7 @@ useEffect(() => {
   const timer = setTimeout(async () => {
     try {
       const response = await searchProducts(searchQuery);
-      setSearchResults(response.data); // Axios stores JSON in `data`
+      setSearchResults(response.data.results || []); // Axios stores JSON in `data`
       setShowSearchDropdown(true);
       setIsSearching(false);
     } catch (error) {